@@ -1,5 +1,4 @@
 import time
-import math
 import platform
 import subprocess
 import tempfile
@@ -74,57 +73,49 @@ class AlertManager:
         return mapping.get(label)
 
     def percent_change_over(self, pair_l: str, seconds: int) -> float | None:
-        dq = self.w._price_ts.get(pair_l)
-        if not dq or len(dq) < 2:
-            return None
-        now = time.time()
-        cutoff = now - float(seconds)
-        base_price = None
-        for (ts, pr) in dq:
-            if ts >= cutoff:
-                base_price = pr
-                break
-        if base_price is None:
-            base_price = dq[0][1]
-        last_price = dq[-1][1]
-        if base_price <= 0:
+        store = self.w.feed.store
+        cutoff = time.time() - float(seconds)
+        with self.w.feed.lock:
+            if store.count(pair_l) < 2:
+                return None
+            base_price = store.price_at_or_after(pair_l, cutoff)
+            last_price = store.last(pair_l)[1]
+        if base_price is None or base_price <= 0:
             return None
         return (last_price - base_price) / base_price * 100.0
 
     def volatility_stats(self, pair_l: str):
         try:
-            prices = self.w._price_series[pair_l]
-            if len(prices) < max(3, int(self.w.vol_window_samples)):
-                return None, None
             N = int(self.w.vol_window_samples)
-            seq = list(prices)[-N:]
-            rets = []
-            for i in range(1, len(seq)):
-                if seq[i - 1] > 0:
-                    rets.append((seq[i] - seq[i - 1]) / seq[i - 1])
+            with self.w.feed.lock:
+                _, prices, _ = self.w.feed.store.window(pair_l, N)
+                prices = prices.copy()
+            if len(prices) < max(3, N):
+                return None, None
+            prev, cur = prices[:-1], prices[1:]
+            ok = prev > 0
+            rets = (cur[ok] - prev[ok]) / prev[ok]
             if len(rets) < 2:
                 return None, None
-            mean = sum(rets) / len(rets)
-            var = sum((r - mean) ** 2 for r in rets) / (len(rets) - 1)
-            std = math.sqrt(var)
-            last_ret = rets[-1]
+            std = float(rets.std(ddof=1))
+            last_ret = float(rets[-1])
             return std, last_ret
         except Exception:
             return None, None
 
     def volume_zscore(self, pair_l: str):
         try:
-            vols = self.w._vol_series[pair_l]
-            if len(vols) < max(5, int(self.w.volume_window_samples)):
-                return None
             N = int(self.w.volume_window_samples)
-            seq = list(vols)[-N:]
-            mean = sum(seq) / len(seq)
-            var = sum((v - mean) ** 2 for v in seq) / (len(seq) - 1)
-            std = math.sqrt(var) if var > 0 else 0.0
+            with self.w.feed.lock:
+                _, _, vols = self.w.feed.store.window(pair_l, N)
+                seq = vols.copy()
+            if len(seq) < max(5, N):
+                return None
+            mean = float(seq.mean())
+            std = float(seq.std(ddof=1))
             if std == 0:
                 return None
-            z = (seq[-1] - mean) / std
+            z = (float(seq[-1]) - mean) / std
             return z
         except Exception:
             return None
@@ -243,6 +234,28 @@ class AlertManager:
         th = threading.Thread(target=_worker_seq, daemon=True)
         th.start()
 
+    def rsi_style_name(self, rsi) -> str | None:
+        """Preset name apply_rsi_style would use for this RSI (None = plain style)."""
+        strong = STYLE_RSI_LEVELS_STRONG
+        weak = STYLE_RSI_LEVELS_WEAK
+        if rsi >= strong[0]:
+            if rsi >= strong[3]:
+                return STYLE_LEVEL_MAP_STRONG[3]
+            if rsi >= strong[2]:
+                return STYLE_LEVEL_MAP_STRONG[2]
+            if rsi >= strong[1]:
+                return STYLE_LEVEL_MAP_STRONG[1]
+            return STYLE_LEVEL_MAP_STRONG[0]
+        if rsi <= weak[0]:
+            if rsi <= weak[3]:
+                return STYLE_LEVEL_MAP_WEAK[3]
+            if rsi <= weak[2]:
+                return STYLE_LEVEL_MAP_WEAK[2]
+            if rsi <= weak[1]:
+                return STYLE_LEVEL_MAP_WEAK[1]
+            return STYLE_LEVEL_MAP_WEAK[0]
+        return None
+
     def apply_rsi_style(self, label, rsi):
         label.setStyleSheet("color: #111827; font-weight: normal;")
         for animation in label.findChildren(QtCore.QPropertyAnimation):
@@ -250,26 +263,9 @@ class AlertManager:
             animation.deleteLater()
         if label.graphicsEffect() is not None:
             label.setGraphicsEffect(None)
-        strong = STYLE_RSI_LEVELS_STRONG
-        weak = STYLE_RSI_LEVELS_WEAK
-        if rsi >= strong[0]:
-            if rsi >= strong[3]:
-                self._apply_style_preset(label, STYLE_LEVEL_MAP_STRONG[3])
-            elif rsi >= strong[2]:
-                self._apply_style_preset(label, STYLE_LEVEL_MAP_STRONG[2])
-            elif rsi >= strong[1]:
-                self._apply_style_preset(label, STYLE_LEVEL_MAP_STRONG[1])
-            else:
-                self._apply_style_preset(label, STYLE_LEVEL_MAP_STRONG[0])
-        elif rsi <= weak[0]:
-            if rsi <= weak[3]:
-                self._apply_style_preset(label, STYLE_LEVEL_MAP_WEAK[3])
-            elif rsi <= weak[2]:
-                self._apply_style_preset(label, STYLE_LEVEL_MAP_WEAK[2])
-            elif rsi <= weak[1]:
-                self._apply_style_preset(label, STYLE_LEVEL_MAP_WEAK[1])
-            else:
-                self._apply_style_preset(label, STYLE_LEVEL_MAP_WEAK[0])
+        name = self.rsi_style_name(rsi)
+        if name is not None:
+            self._apply_style_preset(label, name)
 
     def _apply_style_preset(self, label, name: str):
         preset = STYLE_PRESETS.get(name) or STYLE_PRESETS["normal"]
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多版本回测结果对比：自动发现 output/ 与 output_*/ 目录，并行加载成交表，不重新回测。
+
+- 每个目录读取 trades.parquet / trades.feather / trades.npz（若有）或 trades.csv（兼容新旧两种表头）
+- 按 UTC 日对齐各版本的已实现权益曲线，计算回撤、最大回撤与按月收益
+- 输出：comparison.csv（每版本一行：汇总指标 + 各月收益）、equity_aligned.csv（日度对齐权益）、
+  comparison.html（静态 SVG 权益/回撤曲线与月度收益表）
+
+使用示例：
+    python compare_outputs.py --root . --out-dir output_compare
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import html
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import strategy_pipeline as sp
+
+
+DAY_MS = 86_400_000
+COLUMNAR_FILES = ('trades.parquet', 'trades.feather', 'trades.npz')
+
+
+# ------------------------
+# 发现与加载
+# ------------------------
+
+def discover(root: Path) -> List[Path]:
+    dirs = [d for d in [root / 'output', *sorted(root.glob('output_*'))] if d.is_dir()]
+    return [d for d in dirs if any((d / f).exists() for f in ('trades.csv',) + COLUMNAR_FILES)]
+
+
+def _parse_time(v: str) -> int:
+    dt = datetime.strptime(v.strip(), '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def load_trade_table(d: Path) -> Dict[str, object]:
+    """读取单个目录的成交为列式表：exit_ts(int64)、pnl/pnl_pct(float64)、side(str 列表)，按平仓时间排序。"""
+    for name in COLUMNAR_FILES:
+        if (d / name).exists():
+            cols = sp.read_columnar(d / name)
+            exit_ts = [int(x) for x in cols['exit_ts']]
+            pnl = [float(x) for x in cols['pnl']]
+            pnl_pct = [float(x) for x in cols['pnl_pct']]
+            side = ['long' if str(x) == 'long' else 'short' for x in cols['side']]
+            break
+    else:
+        exit_ts, pnl, pnl_pct, side = [], [], [], []
+        with (d / 'trades.csv').open('r', encoding='utf-8') as f:
+            rdr = csv.reader(f)
+            header = next(rdr)
+            col = {h: i for i, h in enumerate(header)}
+            i_ts = col.get('平仓时间戳')
+            i_t, i_pnl, i_pct, i_side = col['平仓时间'], col['收益'], col['收益率'], col['方向']
+            for r in rdr:
+                if not r:
+                    continue
+                exit_ts.append(int(r[i_ts]) if i_ts is not None and r[i_ts] else _parse_time(r[i_t]))
+                pnl.append(float(r[i_pnl]))
+                pnl_pct.append(float(r[i_pct]))
+                side.append('long' if r[i_side] == '多' else 'short')
+    order = sorted(range(len(exit_ts)), key=exit_ts.__getitem__)
+    return {
+        'exit_ts': array('q', (exit_ts[k] for k in order)),
+        'pnl': array('d', (pnl[k] for k in order)),
+        'pnl_pct': array('d', (pnl_pct[k] for k in order)),
+        'side': [side[k] for k in order],
+    }
+
+
+def _load(d: Path) -> Tuple[str, Dict[str, object]]:
+    return d.name, load_trade_table(d)
+
+
+# ------------------------
+# 对齐与指标
+# ------------------------
+
+def align_daily(tables: Dict[str, Dict[str, object]], equity0: float) -> Tuple[List[int], Dict[str, List[float]]]:
+    """以 UTC 日为网格，对齐各版本的日末已实现权益（当日无成交则沿用前值）。"""
+    all_ts = [t['exit_ts'] for t in tables.values() if len(t['exit_ts'])]
+    if not all_ts:
+        return [], {k: [] for k in tables}
+    d0 = min(ts[0] for ts in all_ts) // DAY_MS
+    d1 = max(ts[-1] for ts in all_ts) // DAY_MS
+    days = list(range(d0, d1 + 1))
+    curves: Dict[str, List[float]] = {}
+    for name, t in tables.items():
+        ts, pnl = t['exit_ts'], t['pnl']
+        eq, k, out = equity0, 0, []
+        for d in days:
+            end = (d + 1) * DAY_MS
+            while k < len(ts) and ts[k] < end:
+                eq += pnl[k]
+                k += 1
+            out.append(eq)
+        curves[name] = out
+    return [d * DAY_MS for d in days], curves
+
+
+def drawdown(curve: List[float]) -> List[float]:
+    peak = None
+    out = []
+    for v in curve:
+        peak = v if peak is None or v > peak else peak
+        out.append(v / peak - 1.0 if peak and peak > 0 else 0.0)
+    return out
+
+
+def monthly_pnl(t: Dict[str, object]) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for ts, p in zip(t['exit_ts'], t['pnl']):
+        m = datetime.fromtimestamp(ts / 1000, tz=timezone.utc).strftime('%Y-%m')
+        out[m] = out.get(m, 0.0) + p
+    return out
+
+
+def summarize(t: Dict[str, object], curve: List[float], dd: List[float]) -> Dict[str, Optional[float]]:
+    n = len(t['pnl'])
+    wins = sum(1 for p in t['pnl'] if p > 0)
+    return {
+        'N': n,
+        'win_rate': wins / n if n else None,
+        'pnl_sum': sum(t['pnl']),
+        'roi_mean': sum(t['pnl_pct']) / n if n else None,
+        'final_equity': curve[-1] if curve else None,
+        'max_dd': min(dd) if dd else None,
+        'long_share': sum(1 for s in t['side'] if s == 'long') / n if n else None,
+    }
+
+
+# ------------------------
+# 报表
+# ------------------------
+
+def _f(v, nd=4) -> str:
+    return '' if v is None else f"{v:.{nd}f}"
+
+
+def write_csvs(out_dir: Path, names: List[str], summaries, months: List[str], monthly, days, curves) -> None:
+    with (out_dir / 'comparison.csv').open('w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['版本', '笔数', '胜率', '总收益', '收益率均值', '期末权益', '最大回撤', '多头占比'] + months)
+        for n in names:
+            s = summaries[n]
+            w.writerow([n, s['N'], _f(s['win_rate']), _f(s['pnl_sum'], 2), _f(s['roi_mean']),
+                        _f(s['final_equity'], 2), _f(s['max_dd']), _f(s['long_share'])]
+                       + [_f(monthly[n].get(m), 2) for m in months])
+    with (out_dir / 'equity_aligned.csv').open('w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['日期'] + names)
+        for i, d in enumerate(days):
+            w.writerow([datetime.fromtimestamp(d / 1000, tz=timezone.utc).strftime('%Y-%m-%d')]
+                       + [f"{curves[n][i]:.2f}" for n in names])
+
+
+_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b',
+           '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+
+
+def _svg_lines(series: Dict[str, List[float]], names: List[str], w: int = 960, h: int = 320, pct: bool = False) -> str:
+    vals = [v for n in names for v in series[n]]
+    if not vals:
+        return '<svg/>'
+    lo, hi = min(vals), max(vals)
+    if hi == lo:
+        hi = lo + 1.0
+    pad = 40
+    n_pts = max(len(series[n]) for n in names)
+    def xy(i, v):
+        x = pad + (w - 2 * pad) * (i / max(1, n_pts - 1))
+        y = h - pad - (h - 2 * pad) * ((v - lo) / (hi - lo))
+        return f"{x:.1f},{y:.1f}"
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{w}" height="{h}" style="background:#fff">',
+             f'<line x1="{pad}" y1="{h-pad}" x2="{w-pad}" y2="{h-pad}" stroke="#ccc"/>']
+    for y, v in ((pad, hi), (h - pad, lo)):
+        txt = f"{v*100:.1f}%" if pct else f"{v:,.0f}"
+        parts.append(f'<text x="2" y="{y}" font-size="11" fill="#666">{txt}</text>')
+    for k, n in enumerate(names):
+        pts = ' '.join(xy(i, v) for i, v in enumerate(series[n]))
+        parts.append(f'<polyline fill="none" stroke="{_COLORS[k % len(_COLORS)]}" stroke-width="1.5" points="{pts}"/>')
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def write_html(out_dir: Path, names: List[str], summaries, months, monthly, days, curves, dds) -> None:
+    legend = ' '.join(f'<span style="color:{_COLORS[k % len(_COLORS)]}">■ {html.escape(n)}</span>'
+                      for k, n in enumerate(names))
+    span = ''
+    if days:
+        fmt = lambda d: datetime.fromtimestamp(d / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+        span = f"{fmt(days[0])} → {fmt(days[-1])}"
+    rows = ''.join(
+        f"<tr><td>{html.escape(n)}</td><td>{summaries[n]['N']}</td><td>{_f(summaries[n]['win_rate'])}</td>"
+        f"<td>{_f(summaries[n]['pnl_sum'], 2)}</td><td>{_f(summaries[n]['final_equity'], 2)}</td>"
+        f"<td>{_f(summaries[n]['max_dd'])}</td></tr>" for n in names)
+    mrows = ''.join(
+        f"<tr><td>{html.escape(n)}</td>" + ''.join(
+            f"<td style='color:{'#080' if monthly[n].get(m, 0) >= 0 else '#c00'}'>{_f(monthly[n].get(m), 0)}</td>"
+            for m in months) + '</tr>' for n in names)
+    doc = f"""<!DOCTYPE html>
+<html lang="zh"><head><meta charset="utf-8"><title>回测版本对比</title>
+<style>body{{font-family:sans-serif;margin:20px}}table{{border-collapse:collapse;font-size:12px}}
+td,th{{border:1px solid #ddd;padding:3px 6px;text-align:right}}td:first-child{{text-align:left}}</style></head>
+<body>
+<h2>回测版本对比（{len(names)} 个版本，{span}）</h2>
+<p>{legend}</p>
+<h3>已实现权益（日度对齐）</h3>
+{_svg_lines(curves, names)}
+<h3>回撤</h3>
+{_svg_lines(dds, names, pct=True)}
+<h3>汇总</h3>
+<table><tr><th>版本</th><th>笔数</th><th>胜率</th><th>总收益</th><th>期末权益</th><th>最大回撤</th></tr>{rows}</table>
+<h3>按月收益</h3>
+<table><tr><th>版本</th>{''.join(f'<th>{m}</th>' for m in months)}</tr>{mrows}</table>
+</body></html>
+"""
+    (out_dir / 'comparison.html').write_text(doc, encoding='utf-8')
+
+
+def main():
+    p = argparse.ArgumentParser(description='多版本回测结果对比（不重新回测）')
+    p.add_argument('--root', '--根目录', dest='root', default='.', help='包含 output/ 与 output_*/ 的目录')
+    p.add_argument('--dirs', '--目录', dest='dirs', default=None, help='以逗号分隔的结果目录；省略则自动发现')
+    p.add_argument('--out-dir', '--输出目录', dest='out_dir', default='output_compare', help='对比报表输出目录')
+    p.add_argument('--initial-equity', '--初始资金', dest='initial_equity', type=float, default=10000.0, help='权益曲线起点')
+    p.add_argument('--workers', '--进程数', dest='workers', type=int, default=None, help='并行加载进程数')
+    args = p.parse_args()
+
+    root = Path(args.root)
+    out_dir = Path(args.out_dir)
+    if args.dirs:
+        dirs = [Path(s.strip()) for s in args.dirs.split(',') if s.strip()]
+    else:
+        dirs = [d for d in discover(root) if d.resolve() != out_dir.resolve()]
+    if not dirs:
+        raise SystemExit(f"未发现任何结果目录：{root}")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        tables = dict(ex.map(_load, dirs))
+    names = list(tables)
+
+    days, curves = align_daily(tables, args.initial_equity)
+    dds = {n: drawdown(curves[n]) for n in names}
+    summaries = {n: summarize(tables[n], curves[n], dds[n]) for n in names}
+    monthly = {n: monthly_pnl(tables[n]) for n in names}
+    months = sorted(set(m for n in names for m in monthly[n]))
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    write_csvs(out_dir, names, summaries, months, monthly, days, curves)
+    write_html(out_dir, names, summaries, months, monthly, days, curves, dds)
+    for n in names:
+        s = summaries[n]
+        print(f"{n:<24} N={s['N']:<5} PnL={s['pnl_sum']:>10.2f}  MaxDD={_f(s['max_dd'])}")
+    print(f"已写入: {out_dir / 'comparison.csv'}, {out_dir / 'equity_aligned.csv'}, {out_dir / 'comparison.html'}")
+
+
+if __name__ == '__main__':
+    main()
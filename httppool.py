@@ -0,0 +1,143 @@
+"""Shared HTTP plumbing: one keep-alive requests.Session per host and a bounded worker
+pool with per-host concurrency limits. Per-host limits are applied before a job reaches
+the executor (a waiting queue per host), so a worker is never parked on a busy host
+while jobs for other hosts wait; interactive jobs go to the front of their host's queue.
+Jobs submitted under a key supersede the previous job with that key: a queued one is
+cancelled, a running one is left to finish and its result should be ignored (see
+``is_latest``)."""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpPool:
+    def __init__(self, max_workers: int = 6, per_host: int = 3):
+        self.max_workers = max(1, int(max_workers))
+        self.per_host = max(1, int(per_host))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="http")
+        self._lock = threading.Lock()
+        self._sessions: dict[str, requests.Session] = {}
+        self._latest: dict[str, Future] = {}
+        # Host-limited jobs: running count and (future, fn, args, kwargs) waiting for a slot
+        self._active: dict[str, int] = {}
+        self._waiting: dict[str, deque] = {}
+
+    def _host(self, url: str) -> str:
+        return urlsplit(url).netloc.lower()
+
+    def session(self, url: str) -> requests.Session:
+        host = self._host(url)
+        with self._lock:
+            s = self._sessions.get(host)
+            if s is None:
+                s = requests.Session()
+                # Sized for every worker plus direct calls; concurrency is limited in submit()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                self._sessions[host] = s
+            return s
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET on the host's pooled keep-alive session."""
+        return self.session(url).get(url, **kwargs)
+
+    def submit(self, fn, *args, key: str | None = None, host: str | None = None,
+               interactive: bool = False, **kwargs) -> Future:
+        """Run ``fn`` on the pool. With ``host`` (a URL), at most ``per_host`` such jobs run at
+        once and the rest wait outside the executor; ``interactive`` jobs jump that queue."""
+        fut: Future = Future()
+        job = (fut, fn, args, kwargs)
+        h = self._host(host) if host else None
+        prev = None
+        with self._lock:
+            if key is not None:
+                prev = self._latest.get(key)
+                self._latest[key] = fut
+            run_now = h is None or self._active.get(h, 0) < self.per_host
+            if h is not None:
+                if run_now:
+                    self._active[h] = self._active.get(h, 0) + 1
+                else:
+                    q = self._waiting.setdefault(h, deque())
+                    if interactive:
+                        q.appendleft(job)
+                    else:
+                        q.append(job)
+        if prev is not None:
+            prev.cancel()
+        if run_now:
+            self._dispatch(job, h)
+        return fut
+
+    def _dispatch(self, job, host: str | None) -> None:
+        try:
+            self._executor.submit(self._run, job, host)
+        except RuntimeError:
+            # Pool already shut down
+            job[0].cancel()
+            if host is not None:
+                self._release(host)
+
+    def _run(self, job, host: str | None) -> None:
+        fut, fn, args, kwargs = job
+        try:
+            if fut.set_running_or_notify_cancel():
+                try:
+                    fut.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    fut.set_exception(e)
+        finally:
+            if host is not None:
+                self._release(host)
+
+    def _release(self, host: str) -> None:
+        # Hand the finished job's slot to the next live waiter, or free it
+        nxt = None
+        with self._lock:
+            q = self._waiting.get(host)
+            while q:
+                job = q.popleft()
+                if not job[0].cancelled():
+                    nxt = job
+                    break
+            if nxt is None:
+                self._active[host] -= 1
+        if nxt is not None:
+            self._dispatch(nxt, host)
+
+    def is_latest(self, key: str, fut: Future) -> bool:
+        with self._lock:
+            return self._latest.get(key) is fut
+
+    def cancel(self, key: str) -> None:
+        with self._lock:
+            fut = self._latest.pop(key, None)
+        if fut is not None:
+            fut.cancel()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            waiting = [job for q in self._waiting.values() for job in q]
+            self._waiting.clear()
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for job in waiting:
+            job[0].cancel()
+        for s in sessions:
+            try:
+                s.close()
+            except Exception:
+                pass
+
+
+# Process-wide pool shared by the fetcher, the feed warm-up and the UI
+HTTP = HttpPool()
@@ -1,282 +1,165 @@
-import numpy as np
-import matplotlib.pyplot as plt
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
 
-# ====== 输入原始数据 ======
-data_str = """
--3.76%
--0.97%
-1.35%
--3.16%
-1.92%
--2.49%
--3.00%
--2.87%
-0.54%
-0.22%
--2.01%
--4.91%
-4.01%
--2.45%
--1.85%
-14.25%
-1.34%
--2.33%
--1.10%
--2.65%
--3.08%
-3.18%
--4.19%
-2.72%
-14.28%
-6.14%
-2.55%
--4.30%
-4.87%
--2.76%
--2.47%
--4.58%
--0.63%
--1.48%
-10.88%
--4.31%
--4.03%
--0.99%
--1.00%
--0.85%
--0.47%
-8.65%
-0.53%
-3.75%
--3.30%
--4.38%
-3.17%
-7.39%
--0.65%
-1.47%
--0.07%
--1.73%
-1.43%
--2.99%
--3.92%
--1.25%
-6.74%
-3.23%
--3.17%
--1.18%
--1.35%
--2.56%
--0.13%
--4.60%
-12.57%
--1.93%
-12.19%
-16.59%
--2.07%
--2.68%
--0.71%
--2.41%
--2.58%
--1.70%
--1.88%
-13.50%
--2.60%
--4.76%
-8.16%
-8.21%
--2.37%
--9.97%
-13.05%
-0.35%
--1.76%
-5.20%
--1.24%
--0.66%
-0.79%
-17.33%
--2.59%
-8.28%
--1.98%
--0.94%
-4.51%
-5.04%
--2.47%
--0.79%
-1.09%
-7.45%
--1.68%
-8.94%
-13.05%
 """
-# -6.07%
-# -1.66%
-# 13.28%
-# -1.03%
-# -1.47%
-# -2.32%
-# -1.71%
-# 1.63%
-# -0.83%
-# 2.03%
-# 7.89%
-# 24.26%
-# 0.00%
-# -0.79%
-# -2.10%
-# -1.19%
-# -1.29%
-# 5.95%
-# -0.78%
-# -1.73%
-# 1.57%
-# -5.25%
-# -2.64%
-# -2.04%
-# -1.82%
-# -2.07%
-# 14.73%
-# -1.73%
-# -2.17%
-# 0.91%
-# -1.76%
-# -2.74%
-# -1.66%
-# -3.36%
-# -1.66%
-# 5.64%
-# -1.42%
-# -1.17%
-# -1.38%
-# 2.17%
-# 1.77%
-# 1.88%
-# 0.54%
-# -1.69%
-# 0.65%
-# -2.84%
-# -0.74%
-# 3.64%
-# 3.65%
-# -2.28%
-# 1.49%
-# -5.09%
-# -5.19%
-# 17.57%
-# 26.13%
-# -5.16%
-# -5.46%
-# -3.42%
-# 20.54%
-# 13.77%
-# 34.85%
-# -2.33%
-# -3.76%
-# -4.99%
-# -10.20%
-# 13.77%
-# 13.04%
-# -3.27%
-# 12.79%
-# 13.50%
-# -5.47%
-# -6.38%
-# -2.87%
-# -1.03%
-# -7.20%
-# -5.25%
-# -0.63%
-# -1.75%
-# -2.35%
-# 12.86%
-# -2.37%
-# -2.86%
-# -0.12%
-# -5.30%
-# -2.04%
-# -2.91%
-# -2.60%
-# -4.17%
-# -2.45%
-# -3.30%
-# 5.78%
-# 4.52%
-# -4.05%
-# -2.78%
-# -1.42%
-# 2.54%
-# -2.34%
-# -2.27%
-# 2.93%
-# -3.65%
-# 5.05%
-# 2.74%
-# 2.38%
-# 0.60%
-# 17.81%
-# 5.96%
-# 14.43%
-# -1.63%
-# -6.05%
-# """
+杠杆/复利分析：从任意 trades.csv（或 trades.npz / trades.parquet）读取逐笔收益率，
+对整条杠杆网格一次性做二维广播计算复利与非复利曲线。
+
+输出每个杠杆倍数的：
+- 最终权益倍数（复利）、最终累计收益（非复利，%）
+- 最大回撤（复利 %、非复利百分点）
+- 爆仓次数：单笔杠杆后亏损 ≥ 爆仓阈值（默认 100% 保证金）；复利曲线在爆仓处归零
+
+使用示例：
+    python output/comp1.py output_htf/trades.csv
+    python output/comp1.py output_htf/trades.csv --lev-min 0.5 --lev-max 10 --lev-step 0.25 --out lev_grid.csv
+    python output/comp1.py returns.txt --plot 1,2,3,4      # 每行一个百分比（如 -3.76%）的旧格式
+"""
+
+import argparse
+import csv
+from pathlib import Path
+
+import numpy as np
+
+
+# 逐笔最多这么多个元素一起广播（杠杆行数 × 成交笔数），超出则按杠杆分块，内存有界
+BLOCK_ELEMS = 8_000_000
+
+
+# ====== 读取逐笔收益率 ======
+def load_returns(path):
+    path = Path(path)
+    if path.suffix == '.npz':
+        with np.load(path, allow_pickle=False) as z:
+            return np.asarray(z['pnl_pct'], dtype=np.float64)
+    if path.suffix in ('.parquet', '.feather'):
+        import pyarrow.parquet as pq
+        import pyarrow.feather as pf
+        tbl = pq.read_table(path) if path.suffix == '.parquet' else pf.read_table(path)
+        return tbl.column('pnl_pct').to_numpy().astype(np.float64)
+    with path.open('r', encoding='utf-8') as f:
+        first = f.readline()
+        f.seek(0)
+        if '收益率' in first or 'pnl_pct' in first:
+            rdr = csv.DictReader(f)
+            key = '收益率' if '收益率' in rdr.fieldnames else 'pnl_pct'
+            return np.array([float(r[key]) for r in rdr if r[key] not in (None, '')], dtype=np.float64)
+        # 旧格式：每行一个百分比
+        return np.array([float(x.strip().replace('%', '')) / 100 for x in f if x.strip()], dtype=np.float64)
+
+
+# ====== 杠杆网格（二维广播） ======
+def analyze(returns, leverages, liq_threshold=1.0):
+    """returns: (N,)，leverages: (L,)；返回各杠杆的汇总指标数组字典（均为 (L,)）。"""
+    r = np.asarray(returns, dtype=np.float64)
+    lev = np.asarray(leverages, dtype=np.float64)
+    out = {k: np.empty(len(lev)) for k in ('final_comp', 'final_add', 'maxdd_comp', 'maxdd_add')}
+    out['liq_hits'] = np.zeros(len(lev), dtype=np.int64)
+    out['first_liq'] = np.full(len(lev), -1, dtype=np.int64)
+    if r.size == 0:
+        for k in ('final_add', 'maxdd_comp', 'maxdd_add'):
+            out[k][:] = 0.0
+        out['final_comp'][:] = 1.0
+        return out
+    rows = max(1, BLOCK_ELEMS // r.size)
+    for a in range(0, len(lev), rows):
+        b = min(len(lev), a + rows)
+        R = lev[a:b, None] * r[None, :]                     # (l, N) 杠杆后逐笔收益
+        liq = R <= -liq_threshold
+        # 非复利：逐笔累加（百分比），起点 0
+        add = np.cumsum(R, axis=1) * 100
+        add_peak = np.maximum(np.maximum.accumulate(add, axis=1), 0.0)
+        # 复利：连乘，爆仓后权益归零，起点 1
+        comp = np.cumprod(np.where(liq, 0.0, 1.0 + R), axis=1)
+        comp_peak = np.maximum(np.maximum.accumulate(comp, axis=1), 1.0)
+        out['final_add'][a:b] = add[:, -1]
+        out['final_comp'][a:b] = comp[:, -1]
+        out['maxdd_add'][a:b] = (add - add_peak).min(axis=1)
+        out['maxdd_comp'][a:b] = (comp / comp_peak - 1.0).min(axis=1)
+        out['liq_hits'][a:b] = liq.sum(axis=1)
+        any_liq = liq.any(axis=1)
+        out['first_liq'][a:b] = np.where(any_liq, liq.argmax(axis=1), -1)
+    return out
+
+
+def curves(returns, leverages, liq_threshold=1.0):
+    """绘图用：返回 (非复利 %, 复利倍数)，形状均为 (L, N)。"""
+    R = np.asarray(leverages, dtype=np.float64)[:, None] * np.asarray(returns, dtype=np.float64)[None, :]
+    return np.cumsum(R, axis=1) * 100, np.cumprod(np.where(R <= -liq_threshold, 0.0, 1.0 + R), axis=1)
+
+
+def plot(returns, leverages, liq_threshold=1.0):
+    import matplotlib.pyplot as plt
+    add, comp = curves(returns, leverages, liq_threshold)
+    plt.figure(figsize=(14, 6))  # 窗体矮一些，左右布局
+
+    # 左图：非复利
+    plt.subplot(1, 2, 1)
+    for lev, y in zip(leverages, add):
+        plt.plot(y, label=f"{lev:g}x")
+    plt.title("Non-Compounding Cumulative Returns")
+    plt.xlabel("Index")
+    plt.ylabel("Cumulative Return (%)")
+    plt.legend()
+    plt.grid(True)
 
-# 转换为浮点数组
-returns = np.array([float(x.strip().replace('%', ''))/100 for x in data_str.splitlines() if x.strip()])
+    # 右图：复利
+    plt.subplot(1, 2, 2)
+    for lev, y in zip(leverages, comp):
+        plt.plot(y, label=f"{lev:g}x")
+    plt.title("Compounded Equity Growth")
+    plt.xlabel("Index")
+    plt.ylabel("Equity (Growth Factor)")
+    plt.legend()
+    plt.grid(True)
 
-# ====== 计算函数 ======
-def calc_curves(returns, leverage=1):
-    r = returns * leverage
-    # 非复利：逐步累加（百分比）
-    equity_add = np.cumsum(r * 100)
-    # 复利：连乘
-    equity_comp = np.cumprod(1 + r)
-    return equity_add, equity_comp
+    plt.tight_layout()
+    plt.show()
 
-# 计算最大回撤
-def max_drawdown(series):
-    peak = np.maximum.accumulate(series)
-    dd = series - peak
-    return dd.min()  # 返回负值
 
-# 杠杆倍数列表
-leverage_list = [1, 2, 3, 4]
-results = {}
+def main():
+    p = argparse.ArgumentParser(description='杠杆/复利网格分析')
+    p.add_argument('trades', help='trades.csv / trades.npz / trades.parquet，或每行一个百分比的文本')
+    p.add_argument('--lev-min', '--最小杠杆', dest='lev_min', type=float, default=0.5, help='最小杠杆')
+    p.add_argument('--lev-max', '--最大杠杆', dest='lev_max', type=float, default=10.0, help='最大杠杆')
+    p.add_argument('--lev-step', '--杠杆步长', dest='lev_step', type=float, default=0.1, help='杠杆步长')
+    p.add_argument('--liq', '--爆仓阈值', dest='liq', type=float, default=1.0, help='爆仓阈值：单笔杠杆后亏损达到保证金的该比例即视为爆仓')
+    p.add_argument('--out', '--输出', dest='out', default=None, help='把网格结果写入 CSV')
+    p.add_argument('--show', '--显示行数', dest='show', type=int, default=20, help='终端最多打印的杠杆行数（均匀抽样）')
+    p.add_argument('--plot', '--绘图', dest='plot', default=None, help='以逗号分隔的杠杆列表绘制曲线，如 1,2,3,4')
+    args = p.parse_args()
 
-for lev in leverage_list:
-    results[lev] = calc_curves(returns, lev)
+    returns = load_returns(args.trades)
+    leverages = np.round(np.arange(args.lev_min, args.lev_max + args.lev_step / 2, args.lev_step), 10)
+    res = analyze(returns, leverages, args.liq)
 
-# ====== 绘图 ======
-plt.figure(figsize=(14,6))  # 窗体矮一些，左右布局
+    # ====== 输出结果 ======
+    header = ['杠杆', '最终权益倍数(复利)', '最终累计收益%(非复利)', '最大回撤%(复利)', '最大回撤pp(非复利)', '爆仓次数', '首次爆仓笔序']
+    rows = [[f"{lev:g}", f"{res['final_comp'][i]:.4f}", f"{res['final_add'][i]:.2f}",
+             f"{res['maxdd_comp'][i]*100:.2f}", f"{res['maxdd_add'][i]:.2f}",
+             int(res['liq_hits'][i]), int(res['first_liq'][i]) if res['first_liq'][i] >= 0 else '']
+            for i, lev in enumerate(leverages)]
+    print(f"{len(returns)} 笔成交，{len(leverages)} 个杠杆档位")
+    pick = np.unique(np.linspace(0, len(rows) - 1, min(args.show, len(rows))).astype(int)) if rows else []
+    widths = [max(len(h), 8) for h in header]
+    print('  '.join(h.rjust(w) for h, w in zip(header, widths)))
+    for i in pick:
+        print('  '.join(str(v).rjust(w) for v, w in zip(rows[i], widths)))
+    best = int(np.argmax(res['final_comp'])) if len(leverages) else None
+    if best is not None:
+        print(f"\n复利最优杠杆: {leverages[best]:g}x（权益倍数 {res['final_comp'][best]:.4f}）")
 
-# 左图：非复利
-plt.subplot(1,2,1)
-for lev in leverage_list:
-    plt.plot(results[lev][0], label=f"{lev}x")
-plt.title("Non-Compounding Cumulative Returns (1x~4x)")
-plt.xlabel("Index")
-plt.ylabel("Cumulative Return (%)")
-plt.legend()
-plt.grid(True)
+    if args.out:
+        with open(args.out, 'w', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            w.writerow(header)
+            w.writerows(rows)
+        print(f"已写入: {args.out}")
 
-# 右图：复利
-plt.subplot(1,2,2)
-for lev in leverage_list:
-    plt.plot(results[lev][1], label=f"{lev}x")
-plt.title("Compounded Equity Growth (1x~4x)")
-plt.xlabel("Index")
-plt.ylabel("Equity (Growth Factor)")
-plt.legend()
-plt.grid(True)
+    if args.plot:
+        plot(returns, [float(x) for x in args.plot.split(',') if x.strip()], args.liq)
 
-plt.tight_layout()
-plt.show()
 
-# ====== 输出最终结果 ======
-for lev in leverage_list:
-    equity_add, equity_comp = results[lev]
-    maxdd_add = max_drawdown(equity_add)
-    maxdd_comp = max_drawdown(equity_comp)
-    print(f"{lev}x 杠杆:")
-    print(f"  最终累计收益 (非复利): {equity_add[-1]:.2f}%")
-    print(f"  最终权益倍数 (复利): {equity_comp[-1]:.2f}x")
-    print(f"  最大回撤 (非复利): {maxdd_add:.2f}%")
-    print(f"  最大回撤 (复利): {maxdd_comp*100:.2f}%")
-    print()
+if __name__ == '__main__':
+    main()
@@ -1,82 +1,263 @@
+"""
+累计收益 / 回撤曲线：按块流式读取交易所导出的成交 CSV（date,time,...,pnl_usdt），内存占用与文件大小无关。
+
+- 每块只解析 date/time/pnl_usdt 三列，日期按固定格式解析，金额去掉 `$` 与千分位逗号；
+  不符合格式的行按通用格式重试，仍无法解析的行保留收益、排在最后（计数后提示）
+- 各块按开仓时间排序后落盘为紧凑的 (时间, 收益) 临时段；若整体已按时间有序则直接顺序消费，否则多路归并
+- 累计收益与历史高点跨块携带；曲线按桶保留最小/最大值降采样后再绘图
+
+使用示例：
+    python plot.py 1.csv
+    python plot.py big_export.csv --chunksize 200000 --points 3000 --no-plot
+"""
+
+import argparse
+import heapq
+import os
+import tempfile
+
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
-# 为了中文不变方块（Mac 示例，如果是 Windows，可用 SimHei 或 Microsoft YaHei）
-plt.rcParams['font.sans-serif'] = ['PingFang SC', 'STHeiti', 'SimHei']
-plt.rcParams['axes.unicode_minus'] = False
+DATETIME_FORMAT = '%Y-%m-%d %H:%M'
+RUN_DTYPE = np.dtype([('t', '<i8'), ('pnl', '<f8')])
+# 无法解析时间的行：排序键取 int64 最大值（排在最后），输出曲线时还原为 NaT
+T_UNPARSED = np.iinfo(np.int64).max
+
+
+# =========================
+# 分块解析
+# =========================
+def iter_chunks(path, chunksize, datetime_format=DATETIME_FORMAT, stats=None):
+    """逐块产出 (开仓时间 ns 的 int64 数组, 收益 float64 数组)，块内已按时间稳定排序。
 
-# 读取文件
-df = pd.read_csv("1.csv")
+    stats（可选 dict）累计 'fallback'（按通用格式解析的行数）与 'unparsed'（时间无法解析、排在最后的行数）。
+    """
+    reader = pd.read_csv(path, usecols=['date', 'time', 'pnl_usdt'], dtype=str, chunksize=chunksize)
+    for df in reader:
+        pnl = df['pnl_usdt'].str.replace('$', '', regex=False).str.replace(',', '', regex=False)
+        pnl = pd.to_numeric(pnl, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        pnl = np.nan_to_num(pnl)  # 无法解析的金额按 0 计
+        text = df['date'] + ' ' + df['time']
+        t = pd.to_datetime(text, format=datetime_format, errors='coerce')
+        miss = t.isna() & text.notna()
+        n_fallback = 0
+        if miss.any():
+            # 例如带秒的导出：逐行按通用格式重试
+            t[miss] = pd.to_datetime(text[miss], format='mixed', errors='coerce')
+            n_fallback = int((miss & t.notna()).sum())
+        ok = t.notna().to_numpy()
+        t = np.where(ok, t.to_numpy(dtype='datetime64[ns]').astype(np.int64), T_UNPARSED)
+        if stats is not None:
+            stats['fallback'] = stats.get('fallback', 0) + n_fallback
+            stats['unparsed'] = stats.get('unparsed', 0) + int((~ok).sum())
+        order = np.argsort(t, kind='stable')
+        yield t[order], pnl[order]
 
-# 数值处理
-df['pnl_usdt'] = df['pnl_usdt'].replace({'\$': '', ',': ''}, regex=True)
-df['pnl_usdt'] = pd.to_numeric(df['pnl_usdt'], errors='coerce')
 
-df['leverage'] = pd.to_numeric(df['leverage'], errors='coerce')
+def spill_runs(path, chunksize, tmp_dir, datetime_format=DATETIME_FORMAT, stats=None):
+    """把各块写成有序临时段；返回 (段文件列表, 是否整体已有序)。"""
+    runs, ordered, last = [], True, None
+    for i, (t, pnl) in enumerate(iter_chunks(path, chunksize, datetime_format, stats)):
+        if not len(t):
+            continue
+        if last is not None and t[0] < last:
+            ordered = False
+        last = t[-1] if last is None else max(last, t[-1])
+        rec = np.empty(len(t), dtype=RUN_DTYPE)
+        rec['t'], rec['pnl'] = t, pnl
+        fn = os.path.join(tmp_dir, f'run{i:06d}.npy')
+        np.save(fn, rec)
+        runs.append(fn)
+    return runs, ordered
 
-# 组合 date + time 为开仓时间
-df['open_time'] = pd.to_datetime(
-    df['date'].astype(str) + ' ' + df['time'].astype(str),
-    errors='coerce'
-)
 
-# 按时间排序
-df = df.sort_values(by='open_time').reset_index(drop=True)
+def _iter_run(fn, block=65536):
+    a = np.load(fn, mmap_mode='r')
+    for i in range(0, len(a), block):
+        b = a[i:i + block]
+        yield from zip(b['t'].tolist(), b['pnl'].tolist())
 
-# 累计收益（如果你想以“万 USDT”为单位，打开下面这一行，把 /10000 打开）
-df['cum_pnl'] = df['pnl_usdt'].cumsum()
-# df['cum_pnl'] = df['pnl_usdt'].cumsum() / 10000  # ← 用万 USDT 展示时用这一行
 
-# 最大回撤计算
-df['cum_pnl_peak'] = df['cum_pnl'].cummax()
-df['drawdown'] = df['cum_pnl_peak'] - df['cum_pnl']
-df['max_drawdown_pct'] = df['drawdown'] / df['cum_pnl_peak'].apply(lambda x: max(1, x)) * 100
+def iter_sorted_blocks(runs, ordered, chunksize):
+    """按时间顺序产出 (t, pnl) 块；无序时对各段做 k 路归并（稳定：同时刻按文件顺序）。"""
+    if ordered:
+        for fn in runs:
+            a = np.load(fn, mmap_mode='r')
+            for i in range(0, len(a), chunksize):
+                b = a[i:i + chunksize]
+                yield np.array(b['t']), np.array(b['pnl'])
+        return
+    buf_t, buf_p = [], []
+    for t, p in heapq.merge(*[_iter_run(fn) for fn in runs], key=lambda x: x[0]):
+        buf_t.append(t)
+        buf_p.append(p)
+        if len(buf_t) >= chunksize:
+            yield np.array(buf_t, dtype=np.int64), np.array(buf_p, dtype=np.float64)
+            buf_t, buf_p = [], []
+    if buf_t:
+        yield np.array(buf_t, dtype=np.int64), np.array(buf_p, dtype=np.float64)
 
-# 多空拆分（目前只用于后续扩展，可以先不用）
-df_long = df[df['side'] == '多']
-df_short = df[df['side'] == '空']
 
 # =========================
-# 图 1：累计收益曲线
+# 降采样：每桶保留最小/最大值点，桶数超限时两两合并（桶宽翻倍）
 # =========================
-fig1, ax1 = plt.subplots(figsize=(12, 6))
-ax1.plot(df['open_time'], df['cum_pnl'], label='累计收益 (USDT)', linewidth=2)
+class MinMaxDecimator:
+    def __init__(self, max_buckets=2000):
+        self.max_buckets = max_buckets
+        self.width = 1
+        self.lo_t = np.empty(0, np.int64)
+        self.lo_v = np.empty(0, np.float64)
+        self.hi_t = np.empty(0, np.int64)
+        self.hi_v = np.empty(0, np.float64)
+        self._rest_t = np.empty(0, np.int64)
+        self._rest_v = np.empty(0, np.float64)
+
+    def _append(self, t, v, width):
+        n = len(t) // width * width
+        if n:
+            tt, vv = t[:n].reshape(-1, width), v[:n].reshape(-1, width)
+            rows = np.arange(len(tt))
+            i_lo, i_hi = vv.argmin(axis=1), vv.argmax(axis=1)
+            self.lo_t = np.concatenate([self.lo_t, tt[rows, i_lo]])
+            self.lo_v = np.concatenate([self.lo_v, vv[rows, i_lo]])
+            self.hi_t = np.concatenate([self.hi_t, tt[rows, i_hi]])
+            self.hi_v = np.concatenate([self.hi_v, vv[rows, i_hi]])
+        return t[n:], v[n:]
 
-ax1.set_title('累计收益曲线 (Cumulative P&L)', fontsize=16)
-ax1.set_xlabel('开仓时间', fontsize=12)
-ax1.set_ylabel('累计收益 (USDT)', fontsize=12)
+    def _merge_pairs(self):
+        # 奇数个桶时最后一个桶原样保留（桶宽不齐不影响最小/最大值）
+        n = len(self.lo_v) // 2 * 2
+        lo_t, lo_v = self.lo_t[:n].reshape(-1, 2), self.lo_v[:n].reshape(-1, 2)
+        hi_t, hi_v = self.hi_t[:n].reshape(-1, 2), self.hi_v[:n].reshape(-1, 2)
+        rows = np.arange(n // 2)
+        i_lo, i_hi = lo_v.argmin(axis=1), hi_v.argmax(axis=1)
+        self.lo_t = np.concatenate([lo_t[rows, i_lo], self.lo_t[n:]])
+        self.lo_v = np.concatenate([lo_v[rows, i_lo], self.lo_v[n:]])
+        self.hi_t = np.concatenate([hi_t[rows, i_hi], self.hi_t[n:]])
+        self.hi_v = np.concatenate([hi_v[rows, i_hi], self.hi_v[n:]])
+        self.width *= 2
 
-# 关闭科学计数法显示
-ax1.ticklabel_format(style='plain', axis='y')
+    def add(self, t, v):
+        t = np.concatenate([self._rest_t, t])
+        v = np.concatenate([self._rest_v, v])
+        self._rest_t, self._rest_v = self._append(t, v, self.width)
+        while len(self.lo_v) > self.max_buckets:
+            self._merge_pairs()
+
+    def points(self):
+        """返回按时间排序的 (t, v)；末尾不满一桶的行作为最后一个桶。"""
+        lo_t, lo_v, hi_t, hi_v = self.lo_t, self.lo_v, self.hi_t, self.hi_v
+        if len(self._rest_v):
+            i_lo, i_hi = self._rest_v.argmin(), self._rest_v.argmax()
+            lo_t = np.append(lo_t, self._rest_t[i_lo])
+            lo_v = np.append(lo_v, self._rest_v[i_lo])
+            hi_t = np.append(hi_t, self._rest_t[i_hi])
+            hi_v = np.append(hi_v, self._rest_v[i_hi])
+        t = np.concatenate([lo_t, hi_t])
+        v = np.concatenate([lo_v, hi_v])
+        order = np.argsort(t, kind='stable')
+        t = t[order]
+        t[t == T_UNPARSED] = np.iinfo(np.int64).min  # NaT：保留在累计值中，但不画点
+        return t.astype('datetime64[ns]'), v[order]
 
-ax1.grid(True, linestyle='--', alpha=0.6)
-ax1.legend()
-plt.tight_layout()
 
 # =========================
-# 图 2：最大回撤百分比曲线
+# 累计收益与回撤（跨块携带累计值与历史高点）
 # =========================
-fig2, ax2 = plt.subplots(figsize=(12, 6))
-ax2.plot(df['open_time'], df['max_drawdown_pct'], label='最大回撤率 (%)', linewidth=2)
-ax2.fill_between(df['open_time'], df['max_drawdown_pct'], 0, alpha=0.3)
+def stream_curves(path, chunksize=100_000, points=2000, datetime_format=DATETIME_FORMAT):
+    cum_dec, dd_dec = MinMaxDecimator(points), MinMaxDecimator(points)
+    cum0, peak0, max_dd, n = 0.0, -np.inf, 0.0, 0
+    stats = {'fallback': 0, 'unparsed': 0}
+    with tempfile.TemporaryDirectory(prefix='plot_runs_') as tmp:
+        runs, ordered = spill_runs(path, chunksize, tmp, datetime_format, stats)
+        for t, pnl in iter_sorted_blocks(runs, ordered, chunksize):
+            cum = cum0 + np.cumsum(pnl)
+            peak = np.maximum(np.maximum.accumulate(cum), peak0)
+            dd_pct = (peak - cum) / np.maximum(peak, 1.0) * 100
+            cum_dec.add(t, cum)
+            dd_dec.add(t, dd_pct)
+            cum0, peak0 = float(cum[-1]), float(peak[-1])
+            max_dd = max(max_dd, float(dd_pct.max()))
+            n += len(t)
+    if n and stats['unparsed'] == n:
+        raise ValueError(f"{path}: date+time 均无法解析（格式 {datetime_format!r}），请用 --datetime-format 指定")
+    return {
+        'cum': cum_dec.points(), 'dd': dd_dec.points(),
+        'final_cum': cum0, 'max_dd_pct': max_dd, 'n': n, 'ordered': ordered,
+        'fallback': stats['fallback'], 'unparsed': stats['unparsed'],
+    }
 
-ax2.set_title('相对历史高点的最大回撤百分比曲线 (Maximum Drawdown %)', fontsize=16)
-ax2.set_xlabel('开仓时间', fontsize=12)
-ax2.set_ylabel('最大回撤率 (%)', fontsize=12)
 
-ax2.grid(True, linestyle='--', alpha=0.6)
-ax2.legend()
-plt.tight_layout()
+def plot(res):
+    import matplotlib.pyplot as plt
 
-plt.show()
+    # 为了中文不变方块（Mac 示例，如果是 Windows，可用 SimHei 或 Microsoft YaHei）
+    plt.rcParams['font.sans-serif'] = ['PingFang SC', 'STHeiti', 'SimHei']
+    plt.rcParams['axes.unicode_minus'] = False
+
+    # =========================
+    # 图 1：累计收益曲线
+    # =========================
+    t, v = res['cum']
+    fig1, ax1 = plt.subplots(figsize=(12, 6))
+    ax1.plot(t, v, label='累计收益 (USDT)', linewidth=2)
+
+    ax1.set_title('累计收益曲线 (Cumulative P&L)', fontsize=16)
+    ax1.set_xlabel('开仓时间', fontsize=12)
+    ax1.set_ylabel('累计收益 (USDT)', fontsize=12)
+
+    # 关闭科学计数法显示
+    ax1.ticklabel_format(style='plain', axis='y')
+
+    ax1.grid(True, linestyle='--', alpha=0.6)
+    ax1.legend()
+    plt.tight_layout()
+
+    # =========================
+    # 图 2：最大回撤百分比曲线
+    # =========================
+    t, v = res['dd']
+    fig2, ax2 = plt.subplots(figsize=(12, 6))
+    ax2.plot(t, v, label='最大回撤率 (%)', linewidth=2)
+    ax2.fill_between(t, v, 0, alpha=0.3)
+
+    ax2.set_title('相对历史高点的最大回撤百分比曲线 (Maximum Drawdown %)', fontsize=16)
+    ax2.set_xlabel('开仓时间', fontsize=12)
+    ax2.set_ylabel('最大回撤率 (%)', fontsize=12)
+
+    ax2.grid(True, linestyle='--', alpha=0.6)
+    ax2.legend()
+    plt.tight_layout()
+
+    plt.show()
+
+
+def main():
+    p = argparse.ArgumentParser(description='累计收益与回撤曲线（分块流式读取）')
+    p.add_argument('path', nargs='?', default='1.csv', help='成交 CSV（含 date,time,pnl_usdt 列）')
+    p.add_argument('--chunksize', '--块大小', dest='chunksize', type=int, default=100_000, help='每块行数')
+    p.add_argument('--points', '--点数', dest='points', type=int, default=2000, help='降采样后每条曲线的桶数上限')
+    p.add_argument('--datetime-format', '--时间格式', dest='datetime_format', default=DATETIME_FORMAT, help='date+time 拼接后的解析格式')
+    p.add_argument('--no-plot', dest='no_plot', action='store_true', help='只打印统计，不绘图')
+    args = p.parse_args()
+
+    res = stream_curves(args.path, args.chunksize, args.points, args.datetime_format)
+    if res['fallback']:
+        print(f"提示: {res['fallback']} 行时间不符合 {args.datetime_format!r}，已按通用格式解析")
+    if res['unparsed']:
+        print(f"警告: {res['unparsed']} 行时间无法解析，收益仍计入累计值并排在最后（曲线上不画点）")
+    if not args.no_plot:
+        plot(res)
+
+    # =========================
+    # 关键统计数据
+    # =========================
+    print("\n--- 关键统计数据 ---")
+    print(f"最终累计总收益: {res['final_cum']:,.2f} （单位与 cum_pnl 一致）")
+    print(f"历史最大回撤率: {res['max_dd_pct']:,.2f}% (相对历史高点)")
+    print(f"总交易笔数: {res['n']}")
 
-# =========================
-# 关键统计数据
-# =========================
-final_cumulative_profit = df['cum_pnl'].iloc[-1]
-max_drawdown = df['max_drawdown_pct'].max()
 
-print("\n--- 关键统计数据 ---")
-print(f"最终累计总收益: {final_cumulative_profit:,.2f} （单位与 cum_pnl 一致）")
-print(f"历史最大回撤率: {max_drawdown:,.2f}% (相对历史高点)")
-print(f"总交易笔数: {len(df)}")
+if __name__ == '__main__':
+    main()
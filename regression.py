@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+回归基准：用冻结的 data/ 快照跑所有 output/strategy_config.*.json，
+把 trades.csv / strategy_summary.csv 与存档的黄金输出逐格比对（浮点带容差），
+并记录每个配置的墙钟耗时与峰值内存（RSS），超出存档预算即判失败。
+
+- 每个配置在独立子进程中运行（峰值 RSS 互不干扰），标的按名称排序传入，保证结果确定
+- 黄金输出与预算保存在 <golden-dir>/manifest.json 及 <golden-dir>/<配置名>/ 下；
+  数据快照以逐文件 sha256 记录，数据变化时直接报错，需要显式 update
+- 退出码：0 全部通过；1 有输出漂移或超预算
+
+使用示例：
+    python regression.py update                 # 生成/刷新黄金输出与预算
+    python regression.py check                  # 比对并检查预算
+    python regression.py check --configs 'output/strategy_config.1h.json'
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+HERE = Path(__file__).resolve().parent
+OUTPUT_FILES = ('trades.csv', 'strategy_summary.csv')
+MANIFEST = 'manifest.json'
+
+
+# ------------------------
+# 数据快照
+# ------------------------
+
+def snapshot_data(data_dir: Path) -> Dict[str, str]:
+    """data/ 下每个 CSV 的 sha256（按文件名排序）。"""
+    out = {}
+    for p in sorted(data_dir.glob('*.csv')):
+        h = hashlib.sha256()
+        with p.open('rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        out[p.name] = h.hexdigest()
+    return out
+
+
+# ------------------------
+# 运行单个配置
+# ------------------------
+
+def run_config(config: Path, data_dir: Path, symbols: List[str], out_dir: Path) -> Tuple[float, int]:
+    """子进程运行回测，返回 (墙钟秒数, 峰值 RSS 字节)。"""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        sys.executable, str(HERE / 'strategy_pipeline.py'),
+        '--data-dir', str(data_dir), '--symbols', ','.join(symbols),
+        '--config', str(config), '--out-dir', str(out_dir),
+        '--format', 'csv', '--no-db',
+    ]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, status, ru = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    err = proc.stderr.read().decode('utf-8', 'replace')
+    proc.stderr.close()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{config.name} 运行失败（退出码 {proc.returncode}）：\n{err}")
+    # Linux 上 ru_maxrss 单位为 KB，macOS 为字节
+    rss = ru.ru_maxrss if sys.platform == 'darwin' else ru.ru_maxrss * 1024
+    return wall, rss
+
+
+# ------------------------
+# CSV 比对
+# ------------------------
+
+def _num(s: str) -> Optional[float]:
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def diff_csv(golden: Path, actual: Path, rtol: float, atol: float, limit: int = 5) -> List[str]:
+    """逐格比对，返回差异描述（最多 limit 条）；数值单元格按 rtol/atol 容差比较。"""
+    with golden.open(encoding='utf-8') as f:
+        g_rows = list(csv.reader(f))
+    with actual.open(encoding='utf-8') as f:
+        a_rows = list(csv.reader(f))
+    diffs = []
+    if len(g_rows) != len(a_rows):
+        diffs.append(f"{actual.name}: 行数 {len(a_rows)} ≠ 黄金 {len(g_rows)}")
+    header = g_rows[0] if g_rows else []
+    for i, (gr, ar) in enumerate(zip(g_rows, a_rows)):
+        if len(gr) != len(ar):
+            diffs.append(f"{actual.name}:{i + 1}: 列数 {len(ar)} ≠ 黄金 {len(gr)}")
+        for j, (gv, av) in enumerate(zip(gr, ar)):
+            if gv == av:
+                continue
+            gn, an = _num(gv), _num(av)
+            if gn is not None and an is not None and math.isclose(gn, an, rel_tol=rtol, abs_tol=atol):
+                continue
+            col = header[j] if i > 0 and j < len(header) else f"第{j + 1}列"
+            diffs.append(f"{actual.name}:{i + 1} [{col}] {av!r} ≠ 黄金 {gv!r}")
+        if len(diffs) >= limit:
+            diffs.append('…')
+            break
+    return diffs
+
+
+# ------------------------
+# update / check
+# ------------------------
+
+def _configs(pattern: str) -> List[Path]:
+    paths = sorted(Path(p) for p in glob.glob(pattern))
+    if not paths:
+        raise SystemExit(f"未找到配置文件：{pattern}")
+    return paths
+
+
+def _fmt_mb(b: float) -> str:
+    return f"{b / (1 << 20):.0f}MB"
+
+
+def cmd_update(args) -> int:
+    golden_dir, data_dir = Path(args.golden_dir), Path(args.data_dir)
+    data = snapshot_data(data_dir)
+    symbols = [Path(n).stem for n in data]
+    manifest = {'data': data, 'symbols': symbols, 'configs': {}}
+    for config in _configs(args.configs):
+        stem = config.stem
+        dst = golden_dir / stem
+        if dst.exists():
+            shutil.rmtree(dst)
+        wall, rss = run_config(config, data_dir, symbols, dst)
+        manifest['configs'][stem] = {
+            'config': os.path.relpath(config.resolve(), HERE),
+            'config_sha256': hashlib.sha256(config.read_bytes()).hexdigest(),
+            'wall_s': round(wall, 3),
+            'peak_rss': rss,
+            'budget_s': round(max(wall * args.time_factor, wall + args.time_slack), 3),
+            'budget_rss': int(rss * args.rss_factor),
+        }
+        print(f"{stem}: {wall:.2f}s, 峰值 {_fmt_mb(rss)}")
+    golden_dir.mkdir(parents=True, exist_ok=True)
+    with (golden_dir / MANIFEST).open('w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"已写入黄金输出: {golden_dir}")
+    return 0
+
+
+def cmd_check(args) -> int:
+    golden_dir, data_dir = Path(args.golden_dir), Path(args.data_dir)
+    mf = golden_dir / MANIFEST
+    if not mf.exists():
+        raise SystemExit(f"未找到 {mf}，请先运行: python regression.py update")
+    with mf.open(encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    data = snapshot_data(data_dir)
+    if data != manifest['data']:
+        changed = sorted(set(data.items()) ^ set(manifest['data'].items()))
+        names = sorted({n for n, _ in changed})
+        raise SystemExit(f"数据快照与黄金输出不一致（{len(names)} 个文件：{', '.join(names[:5])}），"
+                         f"确认后运行 update 重新生成")
+
+    wanted = {c.stem: c for c in _configs(args.configs)}
+    missing = sorted(set(wanted) - set(manifest['configs']))
+    if missing:
+        raise SystemExit(f"以下配置没有黄金输出：{', '.join(missing)}，请先运行 update")
+
+    failed = 0
+    report = []
+    with tempfile.TemporaryDirectory(prefix='regression_') as tmp:
+        for stem, config in wanted.items():
+            entry = manifest['configs'][stem]
+            problems = []
+            if hashlib.sha256(config.read_bytes()).hexdigest() != entry['config_sha256']:
+                problems.append('配置文件已修改')
+            out = Path(tmp) / stem
+            wall, rss = run_config(config, data_dir, manifest['symbols'], out)
+            for name in OUTPUT_FILES:
+                problems += diff_csv(golden_dir / stem / name, out / name, args.rtol, args.atol)
+            if wall > entry['budget_s']:
+                problems.append(f"耗时 {wall:.2f}s 超出预算 {entry['budget_s']:.2f}s")
+            if rss > entry['budget_rss']:
+                problems.append(f"峰值内存 {_fmt_mb(rss)} 超出预算 {_fmt_mb(entry['budget_rss'])}")
+            ok = not problems
+            failed += not ok
+            report.append([stem, 'OK' if ok else 'FAIL', f"{wall:.3f}", entry['budget_s'], rss, entry['budget_rss'],
+                           f"{wall / entry['wall_s']:.2f}" if entry['wall_s'] else ''])
+            print(f"{'OK  ' if ok else 'FAIL'} {stem}: {wall:.2f}s/{entry['budget_s']:.2f}s "
+                  f"(基线 {entry['wall_s']:.2f}s), 峰值 {_fmt_mb(rss)}/{_fmt_mb(entry['budget_rss'])}")
+            for msg in problems:
+                print(f"     {msg}")
+
+    if args.report:
+        with open(args.report, 'w', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            w.writerow(['配置', '结果', '耗时', '耗时预算', '峰值RSS', 'RSS预算', '相对基线'])
+            w.writerows(report)
+        print(f"已写入报告: {args.report}")
+    print(f"\n{len(report) - failed}/{len(report)} 通过")
+    return 1 if failed else 0
+
+
+def main():
+    p = argparse.ArgumentParser(description='黄金输出回归与耗时/内存预算检查')
+    sub = p.add_subparsers(dest='cmd', required=True)
+    for name in ('update', 'check'):
+        sp_ = sub.add_parser(name)
+        sp_.add_argument('--data-dir', '--数据目录', dest='data_dir', default=str(HERE / 'data'), help='冻结的数据目录')
+        sp_.add_argument('--golden-dir', '--黄金目录', dest='golden_dir', default=str(HERE / 'regression_golden'), help='黄金输出与预算目录')
+        sp_.add_argument('--configs', '--配置', dest='configs', default=str(HERE / 'output' / 'strategy_config.*.json'), help='配置文件 glob')
+    up = sub.choices['update']
+    up.add_argument('--time-factor', dest='time_factor', type=float, default=1.5, help='耗时预算 = max(基线 × 倍数, 基线 + 余量)')
+    up.add_argument('--time-slack', dest='time_slack', type=float, default=2.0, help='耗时预算的最小余量（秒）')
+    up.add_argument('--rss-factor', dest='rss_factor', type=float, default=1.3, help='峰值内存预算 = 基线 × 倍数')
+    ck = sub.choices['check']
+    ck.add_argument('--rtol', type=float, default=1e-9, help='数值单元格相对容差')
+    ck.add_argument('--atol', type=float, default=1e-6, help='数值单元格绝对容差')
+    ck.add_argument('--report', '--报告', dest='report', default=None, help='把逐配置结果写入 CSV')
+    args = p.parse_args()
+    sys.exit(cmd_update(args) if args.cmd == 'update' else cmd_check(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+回测结果库：把每次 Engine 运行（单次或参数扫描）写入本地 SQLite，便于横向比较。
+
+记录内容：
+- 配置（完整 JSON + 配置哈希）、数据指纹、标的列表、运行耗时
+- 汇总指标（笔数、胜率、总收益、收益率均值/波动、盈亏比、最大回撤、期末权益）
+- 全部成交明细（可原样导出回 trades.csv / strategy_summary.csv）
+
+查询示例：
+    python results_db.py list --sort pnl_sum --limit 20
+    python results_db.py list --config-hash 3f2a... --sort max_dd --asc
+    python results_db.py compare 12 15 18
+    python results_db.py export 12 --out-dir output_run12
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+import strategy_pipeline as sp
+
+
+DEFAULT_DB = Path('backtests.sqlite')
+
+# 可排序/可比较的汇总指标列（均建索引）
+METRIC_COLUMNS = (
+    'n_trades', 'win_rate', 'pnl_sum', 'pnl_mean', 'roi_mean', 'roi_std',
+    'payoff', 'max_dd', 'final_equity', 'runtime_s',
+)
+
+TRADE_COLUMNS = (
+    'symbol', 'side', 'entry_ts', 'entry_price', 'exit_ts', 'exit_price', 'qty',
+    'pnl', 'pnl_pct', 'fees', 'reason', 'equity_entry', 'exposure_notional',
+    'exposure_frac', 'adds_done', 'pnl_pct_raw',
+)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at   TEXT NOT NULL,
+    label        TEXT,
+    config_hash  TEXT NOT NULL,
+    config_json  TEXT NOT NULL,
+    data_fp      TEXT NOT NULL,
+    symbols      TEXT NOT NULL,
+    n_trades     INTEGER,
+    win_rate     REAL,
+    pnl_sum      REAL,
+    pnl_mean     REAL,
+    roi_mean     REAL,
+    roi_std      REAL,
+    payoff       REAL,
+    max_dd       REAL,
+    final_equity REAL,
+    runtime_s    REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_config_hash ON runs(config_hash);
+CREATE INDEX IF NOT EXISTS idx_runs_data_fp ON runs(data_fp);
+{''.join(f'CREATE INDEX IF NOT EXISTS idx_runs_{c} ON runs({c});' for c in METRIC_COLUMNS)}
+CREATE TABLE IF NOT EXISTS trades (
+    run_id            INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    seq               INTEGER NOT NULL,
+    symbol            TEXT,
+    side              TEXT,
+    entry_ts          INTEGER,
+    entry_price       REAL,
+    exit_ts           INTEGER,
+    exit_price        REAL,
+    qty               REAL,
+    pnl               REAL,
+    pnl_pct           REAL,
+    fees              REAL,
+    reason            TEXT,
+    equity_entry      REAL,
+    exposure_notional REAL,
+    exposure_frac     REAL,
+    adds_done         INTEGER,
+    pnl_pct_raw       REAL,
+    PRIMARY KEY (run_id, seq)
+);
+"""
+
+
+# ------------------------
+# 指纹与指标
+# ------------------------
+
+def config_hash(cfg: sp.Config) -> str:
+    raw = json.dumps(asdict(cfg), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+# 实现在 strategy_pipeline（断点快照键同样使用），此处保留原名供调用方使用
+data_fingerprint = sp.data_fingerprint
+
+
+def max_drawdown(equity_curve: Iterable) -> float:
+    peak = None
+    mdd = 0.0
+    for _, eq in equity_curve:
+        if peak is None or eq > peak:
+            peak = eq
+        if peak and peak > 0:
+            dd = eq / peak - 1.0
+            if dd < mdd:
+                mdd = dd
+    return mdd
+
+
+# ------------------------
+# 写入
+# ------------------------
+
+def connect(db_path: Path = DEFAULT_DB) -> sqlite3.Connection:
+    db_path = Path(db_path)
+    if db_path.parent != Path('.'):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def record_run(conn: sqlite3.Connection, engine: sp.Engine, runtime_s: float,
+               label: Optional[str] = None, data_fp: Optional[str] = None) -> int:
+    """记录一次已完成的 Engine 运行，返回 run_id。data_fp 可由调用方复用（参数扫描时同一份数据只算一次）。"""
+    return record_result(
+        conn, engine.cfg, engine.trades,
+        max_dd=max_drawdown(engine.equity_curve),
+        final_equity=engine.cash,
+        symbols=list(engine.data),
+        data_fp=data_fp or data_fingerprint(engine.data),
+        runtime_s=runtime_s,
+        label=label,
+    )
+
+
+def record_result(conn: sqlite3.Connection, cfg: sp.Config, trades: List[sp.Trade], max_dd: float,
+                  final_equity: float, symbols: Iterable[str], data_fp: str, runtime_s: float,
+                  label: Optional[str] = None) -> int:
+    """按已汇总的结果写入（供子进程回传结果的参数扫描使用，无需 Engine 对象）。"""
+    s = sp.compute_summary(trades)
+    row = {
+        'created_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        'label': label,
+        'config_hash': config_hash(cfg),
+        'config_json': json.dumps(asdict(cfg), sort_keys=True, ensure_ascii=False),
+        'data_fp': data_fp,
+        'symbols': ','.join(sorted(symbols)),
+        'n_trades': s['N'],
+        'win_rate': s['win_rate'],
+        'pnl_sum': s['pnl_sum'],
+        'pnl_mean': s['pnl_mean'],
+        'roi_mean': s['roi_mean'],
+        'roi_std': s['roi_std'],
+        'payoff': s['payoff'],
+        'max_dd': max_dd,
+        'final_equity': final_equity,
+        'runtime_s': runtime_s,
+    }
+    with conn:
+        cur = conn.execute(
+            f"INSERT INTO runs ({','.join(row)}) VALUES ({','.join('?' * len(row))})",
+            tuple(row.values()),
+        )
+        run_id = cur.lastrowid
+        conn.executemany(
+            f"INSERT INTO trades (run_id, seq, {','.join(TRADE_COLUMNS)}) "
+            f"VALUES (?, ?, {','.join('?' * len(TRADE_COLUMNS))})",
+            ((run_id, k, *(getattr(t, c) for c in TRADE_COLUMNS)) for k, t in enumerate(trades)),
+        )
+    return run_id
+
+
+# ------------------------
+# 查询与导出
+# ------------------------
+
+def query_runs(conn: sqlite3.Connection, sort: str = 'pnl_sum', asc: bool = False, limit: int = 20,
+               config_hash_prefix: Optional[str] = None, data_fp_prefix: Optional[str] = None,
+               label: Optional[str] = None) -> List[sqlite3.Row]:
+    if sort not in METRIC_COLUMNS + ('run_id',):
+        raise ValueError(f"unknown sort column: {sort}")
+    # NULL 指标不参与排名；过滤后 ORDER BY 可直接走该列索引
+    where, params = [f"{sort} IS NOT NULL"], []
+    if config_hash_prefix:
+        where.append("config_hash >= ? AND config_hash < ?")
+        params += [config_hash_prefix, config_hash_prefix + '\uffff']
+    if data_fp_prefix:
+        where.append("data_fp >= ? AND data_fp < ?")
+        params += [data_fp_prefix, data_fp_prefix + '\uffff']
+    if label:
+        where.append("label = ?")
+        params.append(label)
+    sql = (
+        "SELECT run_id, created_at, label, substr(config_hash,1,10) AS cfg, substr(data_fp,1,10) AS data, "
+        f"{','.join(METRIC_COLUMNS)} FROM runs"
+        + f" WHERE {' AND '.join(where)}"
+        + f" ORDER BY {sort} {'ASC' if asc else 'DESC'} LIMIT ?"
+    )
+    return conn.execute(sql, (*params, int(limit))).fetchall()
+
+
+def load_run(conn: sqlite3.Connection, run_id: int):
+    run = conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+    if run is None:
+        raise SystemExit(f"run_id 不存在：{run_id}")
+    rows = conn.execute(
+        f"SELECT {','.join(TRADE_COLUMNS)} FROM trades WHERE run_id = ? ORDER BY seq", (run_id,)
+    ).fetchall()
+    trades = [sp.Trade(**dict(zip(TRADE_COLUMNS, r))) for r in rows]
+    return run, trades
+
+
+def export_run(conn: sqlite3.Connection, run_id: int, out_dir: Path) -> None:
+    run, trades = load_run(conn, run_id)
+    sp.export_trades(trades, out_dir / 'trades.csv')
+    sp.export_summary(trades, out_dir / 'strategy_summary.csv')
+    (out_dir / 'strategy_config.json').write_text(run['config_json'], encoding='utf-8')
+
+
+def _fmt(v) -> str:
+    if v is None:
+        return '-'
+    if isinstance(v, float):
+        return f"{v:.4f}"
+    return str(v)
+
+
+def _print_table(header: Sequence[str], rows: Iterable[Sequence]) -> None:
+    rows = [[_fmt(v) for v in r] for r in rows]
+    widths = [max([len(h)] + [len(r[i]) for r in rows]) for i, h in enumerate(header)]
+    print('  '.join(h.ljust(w) for h, w in zip(header, widths)))
+    for r in rows:
+        print('  '.join(v.ljust(w) for v, w in zip(r, widths)))
+
+
+def compare_runs(conn: sqlite3.Connection, run_ids: Sequence[int]) -> None:
+    runs = [load_run(conn, rid)[0] for rid in run_ids]
+    # 指标对比
+    _print_table(['metric'] + [f"#{r['run_id']}" for r in runs],
+                 [[m] + [r[m] for r in runs] for m in METRIC_COLUMNS])
+    # 配置差异（仅列出不同的字段）
+    cfgs = [json.loads(r['config_json']) for r in runs]
+    keys = sorted(set().union(*cfgs))
+    diff = [[k] + [json.dumps(c.get(k), ensure_ascii=False) for c in cfgs]
+            for k in keys if len({json.dumps(c.get(k), sort_keys=True) for c in cfgs}) > 1]
+    print()
+    if diff:
+        _print_table(['config'] + [f"#{r['run_id']}" for r in runs], diff)
+    else:
+        print('配置完全一致')
+    if len({r['data_fp'] for r in runs}) > 1:
+        print('注意：数据指纹不同，结果不可直接比较')
+
+
+# ------------------------
+# 命令行接口
+# ------------------------
+
+def main():
+    p = argparse.ArgumentParser(description='回测结果库查询/比较/导出')
+    p.add_argument('--db', '--结果库', dest='db', default=str(DEFAULT_DB), help='SQLite 结果库路径')
+    sub = p.add_subparsers(dest='cmd', required=True)
+
+    q = sub.add_parser('list', help='按指标排序列出运行记录')
+    q.add_argument('--sort', default='pnl_sum', choices=METRIC_COLUMNS + ('run_id',), help='排序指标')
+    q.add_argument('--asc', action='store_true', help='升序（默认降序）')
+    q.add_argument('--limit', type=int, default=20, help='最多显示条数')
+    q.add_argument('--config-hash', dest='config_hash', default=None, help='按配置哈希前缀过滤')
+    q.add_argument('--data-fp', dest='data_fp', default=None, help='按数据指纹前缀过滤')
+    q.add_argument('--label', default=None, help='按标签过滤')
+
+    c = sub.add_parser('compare', help='并排比较多次运行的指标与配置差异')
+    c.add_argument('run_ids', type=int, nargs='+')
+
+    e = sub.add_parser('export', help='把某次运行导出为 trades.csv / strategy_summary.csv')
+    e.add_argument('run_id', type=int)
+    e.add_argument('--out-dir', '--输出目录', dest='out_dir', required=True, help='导出目录')
+
+    args = p.parse_args()
+    conn = connect(Path(args.db))
+    if args.cmd == 'list':
+        t0 = time.perf_counter()
+        rows = query_runs(conn, sort=args.sort, asc=args.asc, limit=args.limit,
+                          config_hash_prefix=args.config_hash, data_fp_prefix=args.data_fp, label=args.label)
+        dt = time.perf_counter() - t0
+        if rows:
+            _print_table(rows[0].keys(), rows)
+        print(f"\n{len(rows)} 条（查询耗时 {dt*1000:.1f} ms）")
+    elif args.cmd == 'compare':
+        compare_runs(conn, args.run_ids)
+    elif args.cmd == 'export':
+        out_dir = Path(args.out_dir)
+        export_run(conn, args.run_id, out_dir)
+        print(f"已导出 run #{args.run_id} 到: {out_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,16 +7,17 @@ import tempfile
 import json
 import subprocess
 import platform
-from collections import deque, defaultdict
+from collections import defaultdict
 import math
 import random
 from typing import List, Dict
-import requests
 
 from PySide6 import QtCore, QtGui, QtWidgets
 from PySide6.QtWebSockets import QWebSocket
 from PySide6.QtCore import QUrl
 from alert import AlertManager
+from tickstore import TickStore, BarBuilder, WilderRSI, TF_SECONDS
+from httppool import HTTP
 
 
 class CryptoDataFetcher:
@@ -40,7 +41,7 @@ class CryptoDataFetcher:
                 if self._now() - ts < ttl_sec:
                     return set(cached)
             url = "https://api.binance.com/api/v3/exchangeInfo"
-            resp = requests.get(url, timeout=10)
+            resp = HTTP.get(url, timeout=10)
             resp.raise_for_status()
             data = resp.json() or {}
             out: set[str] = set()
@@ -65,7 +66,7 @@ class CryptoDataFetcher:
                 if self._now() - ts < ttl_sec:
                     return set(cached)
             url = "https://fapi.binance.com/fapi/v1/exchangeInfo"
-            resp = requests.get(url, timeout=10)
+            resp = HTTP.get(url, timeout=10)
             resp.raise_for_status()
             data = resp.json() or {}
             out: set[str] = set()
@@ -95,7 +96,7 @@ class CryptoDataFetcher:
                 "sparkline": "false",
                 "price_change_percentage": "24h",
             }
-            resp = requests.get(url, params=params, timeout=10)
+            resp = HTTP.get(url, params=params, timeout=10)
             resp.raise_for_status()
             data = resp.json()
             return data
@@ -120,7 +121,7 @@ class CryptoDataFetcher:
                 "sparkline": "false",
                 "price_change_percentage": "24h",
             }
-            resp = requests.get(url, params=params, timeout=10)
+            resp = HTTP.get(url, params=params, timeout=10)
             resp.raise_for_status()
             return resp.json()
         except Exception:
@@ -136,83 +137,163 @@ class CryptoDataFetcher:
             return out
 
 
-class FetchThread(QtCore.QThread):
-    # Kept for optional HTTP fallback (unused by default)
-    data_ready = QtCore.Signal(list)
-
-    def __init__(self, fetcher: CryptoDataFetcher, ids: List[str]):
-        super().__init__()
-        self.fetcher = fetcher
-        self.ids = ids
-
-    def run(self):
-        data = self.fetcher.fetch_crypto_prices_for_ids(self.ids)
-        self.data_ready.emit(data)
-
-
 class PriceWS(QtCore.QObject):
     price_update = QtCore.Signal(str, float, float)  # pair, price, pct
 
+    URL_SPOT = "wss://stream.binance.com:9443"
+    URL_FUTURES = "wss://fstream.binance.com"
+    ALL_MARKET_STREAM = "!miniTicker@arr"
+    MARKETS = ("spot", "futures")
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.ws_spot: QWebSocket | None = None
         self.ws_futures: QWebSocket | None = None
         self.pairs_spot: list[str] = []
         self.pairs_futures: list[str] = []
+        # All-market mode: one !miniTicker@arr stream per market, filtered in-process
+        self.all_market: bool = False
+        self._watch: dict[str, set[str]] = {m: set() for m in self.MARKETS}
+        # Persistent sockets: streams live on each socket (URL + confirmed/pending SUBSCRIBE),
+        # whether it has finished connecting, and control requests awaiting a reply {id: (method, streams)}
+        self._subs: dict[str, set[str]] = {m: set() for m in self.MARKETS}
+        self._open_ok: dict[str, bool] = {m: False for m in self.MARKETS}
+        self._pending: dict[str, dict[int, tuple[str, list[str]]]] = {m: {} for m in self.MARKETS}
+        self._next_id = 1
         self._reconnect_timer = QtCore.QTimer(self)
         self._reconnect_timer.setSingleShot(True)
         self._reconnect_timer.timeout.connect(self._reconnect)
         self.last_quote_volume: dict[str, float] = {}
 
+    def set_all_market(self, enabled: bool):
+        # Takes effect on the next connect_pairs, which swaps streams via SUBSCRIBE/UNSUBSCRIBE
+        self.all_market = bool(enabled)
+
     def connect_pairs(self, spot_pairs: list[str], futures_pairs: list[str]):
         self.pairs_spot = [p.lower() for p in spot_pairs if isinstance(p, str) and p]
         self.pairs_futures = [p.lower() for p in futures_pairs if isinstance(p, str) and p]
-        self._open()
+        self._watch = {"spot": set(self.pairs_spot), "futures": set(self.pairs_futures)}
+        if not self.pairs_spot and not self.pairs_futures:
+            print("[WS] no pairs to subscribe")
+        for market in self.MARKETS:
+            self._sync(market)
 
     def close(self):
-        for attr in ("ws_spot", "ws_futures"):
-            ws = getattr(self, attr, None)
+        for market in self.MARKETS:
+            self._close_one(market)
+
+    def _attr(self, market: str) -> str:
+        return "ws_spot" if market == "spot" else "ws_futures"
+
+    def _desired(self, market: str) -> set[str]:
+        watch = self._watch[market]
+        if not watch:
+            return set()
+        if self.all_market:
+            return {self.ALL_MARKET_STREAM}
+        return {f"{p}@miniTicker" for p in watch}
+
+    def _close_one(self, market: str):
+        attr = self._attr(market)
+        ws = getattr(self, attr, None)
+        self._subs[market] = set()
+        self._open_ok[market] = False
+        self._pending[market] = {}
+        if ws is None:
+            return
+        try:
+            ws.disconnected.disconnect()
+        except Exception:
+            pass
+        try:
+            ws.close()
+        except Exception:
+            pass
+        try:
+            ws.deleteLater()
+        except Exception:
+            pass
+        setattr(self, attr, None)
+
+    def _open_one(self, market: str, streams: set[str]):
+        base = self.URL_SPOT if market == "spot" else self.URL_FUTURES
+        url = f"{base}/stream?streams=" + "/".join(sorted(streams))
+        ws = QWebSocket()
+        ws.textMessageReceived.connect(lambda m, mk=market: self._on_msg(m, mk))
+        ws.errorOccurred.connect(self._on_error)
+        ws.connected.connect(lambda mk=market: self._on_connected(mk))
+        ws.disconnected.connect(lambda mk=market: self._on_closed(mk))
+        # Streams in the URL count as subscribed; later changes are diffed once connected
+        self._subs[market] = set(streams)
+        self._open_ok[market] = False
+        self._pending[market] = {}
+        setattr(self, self._attr(market), ws)
+        print(f"[WS] opening {market.upper()} {url}")
+        ws.open(QUrl(url))
+
+    def _sync(self, market: str):
+        want = self._desired(market)
+        ws = getattr(self, self._attr(market))
+        if not want:
             if ws is not None:
-                try:
-                    ws.close()
-                except Exception:
-                    pass
-                try:
-                    ws.deleteLater()
-                except Exception:
-                    pass
-                setattr(self, attr, None)
-
-    def _open(self):
-        self.close()
-        if not self.pairs_spot and not self.pairs_futures:
-            print("[WS] no pairs to subscribe")
+                self._close_one(market)
+            return
+        if ws is None:
+            self._open_one(market, want)
+            return
+        if not self._open_ok[market]:
+            # Still handshaking; _on_connected re-runs the diff
+            return
+        have = self._subs[market]
+        drop = sorted(have - want)
+        add = sorted(want - have)
+        if drop:
+            self._send(market, "UNSUBSCRIBE", drop)
+        if add:
+            self._send(market, "SUBSCRIBE", add)
+        self._subs[market] = set(want)
+
+    def _send(self, market: str, method: str, streams: list[str]):
+        ws = getattr(self, self._attr(market))
+        req_id = self._next_id
+        self._next_id += 1
+        self._pending[market][req_id] = (method, streams)
+        print(f"[WS] {market.upper()} {method} #{req_id}: {', '.join(streams)}")
+        ws.sendTextMessage(json.dumps({"method": method, "params": streams, "id": req_id}))
+
+    def _on_control(self, market: str, obj: dict):
+        req = self._pending[market].pop(obj.get("id"), None)
+        if req is None:
             return
-        if self.pairs_spot:
-            url_spot = "wss://stream.binance.com:9443/stream?streams=" + "/".join(
-                f"{p}@miniTicker" for p in self.pairs_spot
-            )
-            self.ws_spot = QWebSocket()
-            self.ws_spot.textMessageReceived.connect(lambda m: self._on_msg(m))
-            self.ws_spot.errorOccurred.connect(self._on_error)
-            self.ws_spot.disconnected.connect(self._on_closed)
-            print(f"[WS] opening SPOT {url_spot}")
-            self.ws_spot.open(QUrl(url_spot))
-        if self.pairs_futures:
-            url_fut = "wss://fstream.binance.com/stream?streams=" + "/".join(
-                f"{p}@miniTicker" for p in self.pairs_futures
-            )
-            self.ws_futures = QWebSocket()
-            self.ws_futures.textMessageReceived.connect(lambda m: self._on_msg(m))
-            self.ws_futures.errorOccurred.connect(self._on_error)
-            self.ws_futures.disconnected.connect(self._on_closed)
-            print(f"[WS] opening FUTURES {url_fut}")
-            self.ws_futures.open(QUrl(url_fut))
+        method, streams = req
+        if obj.get("error"):
+            print(f"[WS] {market.upper()} {method} #{obj.get('id')} failed: {obj.get('error')}")
+            # Roll back so the next sync retries the diff
+            if method == "SUBSCRIBE":
+                self._subs[market].difference_update(streams)
+            else:
+                self._subs[market].update(streams)
+
+    def _on_connected(self, market: str):
+        self._open_ok[market] = True
+        self._sync(market)
 
     def _reconnect(self):
-        self._open()
+        # Reopen dropped sockets with the full desired stream set
+        for market in self.MARKETS:
+            self._sync(market)
 
-    def _on_closed(self):
+    def _on_closed(self, market: str = "spot"):
+        ws = getattr(self, self._attr(market), None)
+        if ws is not None:
+            try:
+                ws.deleteLater()
+            except Exception:
+                pass
+        setattr(self, self._attr(market), None)
+        self._subs[market] = set()
+        self._open_ok[market] = False
+        self._pending[market] = {}
         # try reconnect after short delay
         self._reconnect_timer.start(2000)
 
@@ -224,28 +305,43 @@ class PriceWS(QtCore.QObject):
             pass
         self._reconnect_timer.start(3000)
 
-    def _on_msg(self, msg: str):
+    def _on_msg(self, msg: str, market: str = "spot"):
         try:
             obj = json.loads(msg)
-            data = obj.get("data") or {}
-            sym = (data.get("s") or "").lower()
-            price_str = data.get("c") or data.get("p") or "0"
-            pct_str = data.get("P") or "0"
-            qvol_str = data.get("q") or "0"
-            price = float(price_str)
-            pct = float(pct_str)
-            try:
-                self.last_quote_volume[sym] = float(qvol_str)
-            except Exception:
-                pass
-            if sym:
-                self.price_update.emit(sym, price, pct)
+            if isinstance(obj, dict) and "id" in obj and "data" not in obj:
+                self._on_control(market, obj)
+                return
+            data = obj.get("data") if isinstance(obj, dict) else obj
+            if data is None:
+                return
+            # Ticks still in flight after UNSUBSCRIBE, and the rest of !miniTicker@arr, are dropped here
+            watch = self._watch.get(market) or set()
+            for item in (data if isinstance(data, list) else [data]):
+                sym = (item.get("s") or "").lower()
+                if sym in watch:
+                    self._emit_ticker(sym, item)
         except Exception:
             try:
                 print("[WS] message parse error")
             except Exception:
                 pass
 
+    def _emit_ticker(self, sym: str, data: dict):
+        price_str = data.get("c") or data.get("p") or "0"
+        pct_str = data.get("P") or "0"
+        qvol_str = data.get("q") or "0"
+        price = float(price_str)
+        try:
+            pct = float(pct_str)
+        except Exception:
+            pct = 0.0
+        try:
+            self.last_quote_volume[sym] = float(qvol_str)
+        except Exception:
+            pass
+        if sym:
+            self.price_update.emit(sym, price, pct)
+
     def get_quote_volume(self, pair: str) -> float:
         return float(self.last_quote_volume.get(pair.lower(), 0.0))
 
@@ -282,6 +378,9 @@ class PriceWSMock(QtCore.QObject):
             pass
         self._timer.start()
 
+    def set_all_market(self, enabled: bool):
+        pass
+
     def close(self):
         self._timer.stop()
 
@@ -299,6 +398,233 @@ class PriceWSMock(QtCore.QObject):
         return float(self.last_quote_volume.get(pair.lower(), 0.0))
 
 
+class FeedEngine(QtCore.QObject):
+    """Owns the price socket, tick parsing, series buffers and RSI state on a worker thread.
+
+    The GUI only receives coalesced frames (latest tick per pair plus changed RSI maps);
+    GUI-side readers of the series buffers must hold ``lock``.
+    """
+
+    # (ticks: {pair_l: (pair, price, pct)}, rsi: {pair_l: {tf: value}})
+    frame_ready = QtCore.Signal(dict, dict)
+    # Requests from the GUI thread, delivered to the worker as queued calls
+    _req_pairs = QtCore.Signal(list, list)
+    _req_all_market = QtCore.Signal(bool)
+    _req_close = QtCore.Signal()
+    _req_stop = QtCore.Signal()
+    # REST warm-up results (pair, tf, klines) from the pool, delivered on the worker
+    _warm_ready = QtCore.Signal(str, str, str, list)  # market, pair, tf, kline rows
+
+    KLINES_URL = {"spot": "https://api.binance.com/api/v3/klines", "futures": "https://fapi.binance.com/fapi/v1/klines"}
+    WARMUP_BARS = 100
+
+    def __init__(self, use_mock_ws: bool = False, ts_series_maxlen: int = 10000,
+                 rsi_timeframes: List[str] | None = None, rsi_period: int = 6, frame_interval_ms: int = 100):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.ws = PriceWSMock(self) if bool(use_mock_ws) else PriceWS(self)
+        self.ws.price_update.connect(self._on_tick)
+        # (ts, price, quote volume) per watched pair; alert windows are trailing views of it
+        self.store = TickStore(capacity=int(ts_series_maxlen))
+        # Rolling OHLCV bars per timeframe (thumbnails, RSI closes), exchange-aligned
+        self.bars = BarBuilder(TF_SECONDS)
+        # RSI calculation data (multi-timeframe)
+        self.rsi_timeframes: List[str] = list(rsi_timeframes or ["15m", "1h", "4h"])
+        self.rsi_period = int(rsi_period)
+        self.rsi_values_tf: dict[str, dict[str, float]] = defaultdict(dict)
+        # Wilder state per (pair, tf), stepped once per closed bar; values shown are provisional
+        # for the in-progress bar and refreshed on every tick
+        self._rsi_state: dict[str, dict[str, WilderRSI]] = defaultdict(dict)
+        # Fallback tick-based RSI (shown only until some timeframe is ready)
+        self._rsi_tick: dict[str, WilderRSI] = {}
+        # Frame coalescing: latest tick per pair and pairs whose RSI changed since the last frame
+        self._pending_ticks: dict[str, tuple[str, float, float]] = {}
+        self._dirty_rsi: set[str] = set()
+        self._frame_timer = QtCore.QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.setInterval(int(frame_interval_ms))
+        self._frame_timer.timeout.connect(self._emit_frame)
+        queued = QtCore.Qt.QueuedConnection
+        self._req_pairs.connect(self._connect_pairs, queued)
+        self._req_all_market.connect(self.ws.set_all_market, queued)
+        self._req_close.connect(self.ws.close, queued)
+        self._req_stop.connect(self._stop, queued)
+        self._warm_ready.connect(self._on_warm_ready, queued)
+        # Kline warm-up: pair -> market it was seeded from (re-seeded if the market changes)
+        self._warm_enabled = not bool(use_mock_ws)
+        self._warmed: dict[str, str] = {}
+        # In-flight warm-up requests; added on the worker, discarded from pool threads on completion
+        self._warm_futs: set = set()
+        self._warm_futs_lock = threading.Lock()
+        self.worker_thread = QtCore.QThread()
+        self.worker_thread.setObjectName("FeedEngine")
+        self.moveToThread(self.worker_thread)
+
+    # --- GUI-thread API (queued to the worker) ---
+    def start(self):
+        self.worker_thread.start()
+
+    def connect_pairs(self, spot_pairs: list[str], futures_pairs: list[str]):
+        self._req_pairs.emit(list(spot_pairs), list(futures_pairs))
+
+    def set_all_market(self, enabled: bool):
+        self._req_all_market.emit(bool(enabled))
+
+    def close(self):
+        self._req_close.emit()
+
+    def stop(self, timeout_ms: int = 2000):
+        self._req_stop.emit()
+        self.worker_thread.wait(int(timeout_ms))
+
+    # --- worker thread ---
+    def _stop(self):
+        self._frame_timer.stop()
+        with self._warm_futs_lock:
+            futs = list(self._warm_futs)
+        for fut in futs:
+            fut.cancel()
+        self.ws.close()
+        self.worker_thread.quit()
+
+    def _connect_pairs(self, spot_pairs: list, futures_pairs: list):
+        watched = {p.lower() for p in [*spot_pairs, *futures_pairs] if isinstance(p, str) and p}
+        # Evict buffers and indicator state of pairs that left the slots/watchlist
+        with self.lock:
+            self.bars.retain(watched)
+            self.store.retain(watched)
+            # Warm-up creates RSI state before a pair's first tick, so scan the RSI dicts
+            # themselves rather than the store's dropped list
+            for p in set(self._rsi_state) | set(self.rsi_values_tf) | set(self._rsi_tick):
+                if p not in watched:
+                    for d in (self.rsi_values_tf, self._rsi_state, self._rsi_tick):
+                        d.pop(p, None)
+        self.ws.connect_pairs(spot_pairs, futures_pairs)
+        self._warm_up(spot_pairs, futures_pairs)
+
+    # --- REST warm-up: seed exchange bars so RSI is available right after launch ---
+    def _warm_up(self, spot_pairs: list, futures_pairs: list):
+        for market, pairs in (("spot", spot_pairs), ("futures", futures_pairs)):
+            for p in pairs:
+                p = p.lower()
+                if self._warmed.get(p) == market:
+                    continue
+                self._warmed[p] = market
+                if not self._warm_enabled:
+                    continue
+                for tf in self.rsi_timeframes:
+                    if tf in TF_SECONDS:
+                        fut = HTTP.submit(self._fetch_warmup, market, p, tf, host=self.KLINES_URL[market])
+                        with self._warm_futs_lock:
+                            self._warm_futs.add(fut)
+                        fut.add_done_callback(self._warm_fut_done)
+        for p in [p for p in self._warmed if p not in {*spot_pairs, *futures_pairs}]:
+            del self._warmed[p]
+
+    def _warm_fut_done(self, fut):
+        # Runs on the pool thread that finished the request (or inline if already done)
+        with self._warm_futs_lock:
+            self._warm_futs.discard(fut)
+
+    def _fetch_warmup(self, market: str, pair_l: str, tf: str):
+        # Runs on the pool; hands parsed klines back to the worker thread
+        try:
+            params = {"symbol": pair_l.upper(), "interval": tf, "limit": int(self.WARMUP_BARS)}
+            resp = HTTP.get(self.KLINES_URL[market], params=params, timeout=10)
+            if resp.status_code != 200:
+                return
+            rows = []
+            for k in resp.json():
+                # k: [openTime, open, high, low, close, volume, closeTime, quoteVolume, ...]
+                rows.append((float(k[0]) / 1000.0, float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[7])))
+            if rows:
+                self._warm_ready.emit(market, pair_l, tf, rows)
+        except Exception:
+            try:
+                print(f"[WARMUP] {pair_l} {tf} failed")
+            except Exception:
+                pass
+
+    def _on_warm_ready(self, market: str, pair_l: str, tf: str, rows: list):
+        if self._warmed.get(pair_l) != market:
+            return  # evicted, or moved to the other market, while the request was in flight
+        with self.lock:
+            self.bars.seed(pair_l, tf, rows, time.time())
+            # Rebuild Wilder state from the seeded closed bars (oldest first)
+            st = self._rsi_state[pair_l][tf] = WilderRSI(self.rsi_period)
+            for b in self.bars.bars(pair_l, tf, include_current=False):
+                st.update(b[4])
+            cur = self.bars.current(pair_l, tf)
+            self._publish_rsi(pair_l, tf, st, cur[4] if cur is not None else None)
+        if self._dirty_rsi and not self._frame_timer.isActive():
+            self._frame_timer.start()
+
+    def _on_tick(self, pair: str, price: float, pct: float):
+        pair_l = pair.lower()
+        self._ingest_series(pair_l, price)
+        self._pending_ticks[pair_l] = (pair, float(price), float(pct))
+        if not self._frame_timer.isActive():
+            self._frame_timer.start()
+
+    def _emit_frame(self):
+        ticks, self._pending_ticks = self._pending_ticks, {}
+        dirty, self._dirty_rsi = self._dirty_rsi, set()
+        with self.lock:
+            rsi = {p: dict(self.rsi_values_tf[p]) for p in dirty}
+        if ticks or rsi:
+            self.frame_ready.emit(ticks, rsi)
+
+    def _ingest_series(self, p: str, price: float):
+        try:
+            with self.lock:
+                vol = float(self.ws.get_quote_volume(p)) if self.ws else 0.0
+                now = time.time()
+                self.store.append(p, now, float(price), vol)
+
+                # Multi-timeframe bars (exchange-aligned): step Wilder state on each close,
+                # then refresh the provisional RSI of the bar in progress
+                closed_tfs = self.bars.update(p, now, float(price), vol)
+                states = self._rsi_state[p]
+                for tf in self.rsi_timeframes:
+                    st = states.get(tf)
+                    if st is None:
+                        st = states[tf] = WilderRSI(self.rsi_period)
+                    if tf in closed_tfs:
+                        closed = self.bars.bars(p, tf, 1, include_current=False)
+                        if closed:
+                            st.update(closed[-1][4])
+                    self._publish_rsi(p, tf, st, float(price))
+
+                # Tick-based fallback until a timeframe has enough bars
+                vals = self.rsi_values_tf[p]
+                if any(tf in vals for tf in self.rsi_timeframes):
+                    vals.pop("tick", None)
+                else:
+                    tick = self._rsi_tick.get(p)
+                    if tick is None:
+                        tick = self._rsi_tick[p] = WilderRSI(self.rsi_period)
+                    rsi = tick.update(float(price))
+                    if rsi is not None:
+                        vals["tick"] = rsi
+                        self._dirty_rsi.add(p)
+        except Exception:
+            try:
+                print("[SERIES] ingest error")
+            except Exception:
+                pass
+
+    def _publish_rsi(self, p: str, tf: str, st: WilderRSI, price: float | None):
+        rsi = st.provisional(price) if price is not None else None
+        if rsi is None:
+            rsi = st.value()
+        if rsi is None:
+            return
+        vals = self.rsi_values_tf[p]
+        if vals.get(tf) != rsi:
+            vals[tf] = rsi
+            self._dirty_rsi.add(p)
+
+
 class PriceLabel(QtWidgets.QLabel):
     def __init__(self, owner: 'CryptoWidgetQt', index: int, parent=None):
         super().__init__(parent)
@@ -876,6 +1202,7 @@ class ThumbnailPopup(QtWidgets.QWidget):
 class CryptoWidgetQt(QtWidgets.QWidget):
     # Async thumbnail data ready: (pair_l, timeframe, ohlc_list)
     thumb_data_ready = QtCore.Signal(str, str, list)
+    audit_data_ready = QtCore.Signal(list)
     def __init__(self, use_mock_ws: bool = False):
         super().__init__()
         self.setObjectName("CryptoWidgetQt")
@@ -912,6 +1239,8 @@ class CryptoWidgetQt(QtWidgets.QWidget):
         self.prefer_price_source: str = str(cfg.get("prefer_price_source", "spot")).lower()
         if self.prefer_price_source not in ("spot", "futures"):
             self.prefer_price_source = "spot"
+        # Subscribe to the aggregated !miniTicker@arr stream per market instead of one stream per pair
+        self.ws_all_market: bool = bool(cfg.get("ws_all_market", False))
         # UI settings
         self.thumb_enabled: bool = bool(cfg.get("thumb_enabled", False))
         self.thumb_fetch_from_binance: bool = bool(cfg.get("thumb_fetch_from_binance", True))
@@ -1020,10 +1349,10 @@ class CryptoWidgetQt(QtWidgets.QWidget):
 
         # Data
         self.fetcher = CryptoDataFetcher()
-        self.worker: FetchThread | None = None
-        self.ws = PriceWSMock(self) if bool(use_mock_ws) else PriceWS(self)
-        self._price_signal_connected = False
+        self._use_mock_ws = bool(use_mock_ws)
         self.last_ws_price: dict[str, float] = {}
+        # RSI preset currently shown on each label: idx -> (pair, preset name)
+        self._rsi_style_shown: dict[int, tuple[str, str | None]] = {}
         # 新增：每个交易对的“昨日收盘价”
         self.prev_close: dict[str, float] = {}
 
@@ -1032,32 +1361,26 @@ class CryptoWidgetQt(QtWidgets.QWidget):
         self.audit_timer.setInterval(180_000)  # 3 minutes
         self.audit_timer.timeout.connect(self._start_http_audit)
         self.audit_timer.start()
-        self.audit_worker: FetchThread | None = None
+        self._audit_future = None
         self.last_alert_time: dict[str, float] = {}
         self._alert_cooldown_sec = 60.0
-        # Series buffers for volatility/volume detection
-        self._series_maxlen = max(self.vol_window_samples, self.volume_window_samples, 120)
-        self._price_series: dict[str, deque] = defaultdict(lambda: deque(maxlen=self._series_maxlen))
-        self._vol_series: dict[str, deque] = defaultdict(lambda: deque(maxlen=self._series_maxlen))
-        self._ts_series_maxlen = 10000
-        self._price_ts: dict[str, deque] = defaultdict(lambda: deque(maxlen=self._ts_series_maxlen))
-        self.alert = AlertManager(self)
-        
-        # RSI calculation data (multi-timeframe)
         self.rsi_timeframes: List[str] = cfg.get("rsi_timeframes") or ["15m", "1h", "4h"]
         self.rsi_period: int = int(cfg.get("rsi_period", 6))
-        self._tf_seconds: dict[str, int] = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600, "4h": 14400}
+        # Socket, parsing, series buffers and RSI run on the feed worker thread; the GUI gets
+        # coalesced frames. Tick history lives in feed.store (read under feed.lock).
+        self.feed = FeedEngine(
+            use_mock_ws=self._use_mock_ws,
+            rsi_timeframes=self.rsi_timeframes,
+            rsi_period=self.rsi_period,
+        )
+        self.feed.frame_ready.connect(self._on_frame, QtCore.Qt.QueuedConnection)
+        self.alert = AlertManager(self)
+        # Latest RSI maps received from the feed (GUI-thread copy)
         self._rsi_values_tf: dict[str, dict[str, float]] = defaultdict(dict)
-        self._rsi_closes_tf: dict[str, dict[str, deque]] = defaultdict(lambda: defaultdict(lambda: deque(maxlen=self.rsi_period + 1)))
-        self._rsi_last_bar_close_tf: dict[str, dict[str, float]] = defaultdict(dict)
-        self._rsi_last_bar_ts_tf: dict[str, dict[str, float]] = defaultdict(dict)
-        # Fallback tick-based buffers (unused for display when multi-TF is available)
-        self._rsi_gains: dict[str, deque] = defaultdict(lambda: deque(maxlen=self.rsi_period))
-        self._rsi_losses: dict[str, deque] = defaultdict(lambda: deque(maxlen=self.rsi_period))
-        self._rsi_timer = QtCore.QTimer(self)
-        self._rsi_timer.setInterval(60000)
-        self._rsi_timer.timeout.connect(self._update_rsi_values)
-        self._rsi_timer.start()
+        self.feed.start()
+        # Quit from the context menu bypasses closeEvent; stop the worker either way
+        QtWidgets.QApplication.instance().aboutToQuit.connect(lambda: self.feed.stop(), QtCore.Qt.DirectConnection)
+        QtWidgets.QApplication.instance().aboutToQuit.connect(HTTP.shutdown)
 
         # Alert indicator state: pair -> (level 1..3, expiry_ts)
         self._alert_indicator: dict[str, tuple[int, float]] = {}
@@ -1073,6 +1396,7 @@ class CryptoWidgetQt(QtWidgets.QWidget):
         self._thumb_ohlc_main: list[tuple[float, float, float, float]] | None = None
         self._thumb_ohlc_top: list[tuple[float, float, float, float]] | None = None
         self.thumb_data_ready.connect(self._on_thumb_data_ready)
+        self.audit_data_ready.connect(self._on_http_audit_result)
         # Quick-switch triangle hit areas (updated during render)
         self._last_sub_tri_rect: QtCore.QRect | None = None
         self._last_dual_sub_tri_rect: QtCore.QRect | None = None
@@ -1166,6 +1490,7 @@ class CryptoWidgetQt(QtWidgets.QWidget):
 
         # Create labels per slot with an indicator row (small dots under price)
         self.labels: List[PriceLabel] = []
+        self._rsi_style_shown = {}
         self.dot_labels: List[QtWidgets.QLabel] = []
         self.pair_index: dict[str, int] = {}
         # Hover thumbnail popup
@@ -1323,6 +1648,11 @@ class CryptoWidgetQt(QtWidgets.QWidget):
             act_src_spot.setChecked(True)
         sub_price.addAction(act_src_spot)
         sub_price.addAction(act_src_fut)
+        sub_price.addSeparator()
+        act_src_all = QtGui.QAction("All-Market Stream", sub_price)
+        act_src_all.setCheckable(True)
+        act_src_all.setChecked(bool(getattr(self, 'ws_all_market', False)))
+        sub_price.addAction(act_src_all)
         menu.addMenu(sub_price)
         # Font size submenu (four presets)
         sub_font = QtWidgets.QMenu("Font Size", menu)
@@ -1362,11 +1692,15 @@ class CryptoWidgetQt(QtWidgets.QWidget):
         elif chosen is act_src_spot:
             self.prefer_price_source = 'spot'
             self._save_config()
-            self._restart_ws()
+            self._start_ws()
         elif chosen is act_src_fut:
             self.prefer_price_source = 'futures'
             self._save_config()
-            self._restart_ws()
+            self._start_ws()
+        elif chosen is act_src_all:
+            self.ws_all_market = bool(act_src_all.isChecked())
+            self._save_config()
+            self._start_ws()
         elif chosen in (act_fs_s, act_fs_n, act_fs_l, act_fs_x):
             # Apply chosen preset
             if chosen is act_fs_s:
@@ -1478,51 +1812,19 @@ class CryptoWidgetQt(QtWidgets.QWidget):
                 data = self._fetch_klines_binance(pair_l, interval=tf, limit=int(bars))
                 if data:
                     return data
-            # Fallback: aggregate ticks by hour from local series
-            dq = self._price_ts.get(pair_l)
-            if not dq:
-                return []
-            # seconds per bucket
-            tf_map = {"1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "4h": 14400, "8h": 28800, "1d": 86400, "3d": 259200}
-            sec = tf_map.get((tf or "1h").lower(), 3600)
-            buckets: dict[int, list[float]] = {}
-            for ts, pr in dq:
-                h = int(ts // sec)
-                buckets.setdefault(h, []).append(float(pr))
-            hours = sorted(buckets.keys())[-int(bars):]
-            ohlc = []
-            for h in hours:
-                arr = buckets[h]
-                if not arr:
-                    continue
-                o_ = arr[0]
-                h_ = max(arr)
-                l_ = min(arr)
-                c_ = arr[-1]
-                ohlc.append((o_, h_, l_, c_))
-            return ohlc
+            # Fallback: bars built locally from ticks
+            return self._ohlc_from_local(pair_l, bars, tf)
         except Exception:
             return []
 
     def _ohlc_from_local(self, pair_l: str, bars: int, tf: str) -> list[tuple[float, float, float, float]]:
         try:
-            dq = self._price_ts.get(pair_l)
-            if not dq:
-                return []
-            tf_map = {"1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "4h": 14400, "8h": 28800, "1d": 86400, "3d": 259200}
-            sec = tf_map.get((tf or "1h").lower(), 3600)
-            buckets: dict[int, list[float]] = {}
-            for ts, pr in dq:
-                h = int(ts // sec)
-                buckets.setdefault(h, []).append(float(pr))
-            hours = sorted(buckets.keys())[-int(bars):]
-            out = []
-            for h in hours:
-                arr = buckets[h]
-                if not arr:
-                    continue
-                out.append((arr[0], max(arr), min(arr), arr[-1]))
-            return out
+            tf = (tf or "1h").lower()
+            if tf not in TF_SECONDS:
+                tf = "1h"
+            with self.feed.lock:
+                rows = self.feed.bars.bars(pair_l, tf, int(bars))
+            return [(o, h, l, c) for (_, o, h, l, c, _) in rows]
         except Exception:
             return []
 
@@ -1540,7 +1842,7 @@ class CryptoWidgetQt(QtWidgets.QWidget):
             url = "https://api.binance.com/api/v3/klines"
             params = {"symbol": sym, "interval": interval, "limit": int(limit)}
             try:
-                resp = requests.get(url, params=params, timeout=5)
+                resp = HTTP.get(url, params=params, timeout=5)
                 if resp.status_code != 200:
                     return []
                 arr = resp.json()
@@ -2301,25 +2603,27 @@ class CryptoWidgetQt(QtWidgets.QWidget):
             pass
         # Async fetch from Binance to update after show
         if bool(self.thumb_fetch_from_binance):
-            def _worker(pair_l_, bars_, tf_, dual_, bars2_, tf2_):
-                try:
-                    data = self._fetch_klines_binance(pair_l_, interval=tf_, limit=int(bars_))
-                    if data:
-                        try:
-                            self.thumb_data_ready.emit(pair_l_, tf_, data)
-                        except Exception:
-                            pass
-                    # Always fetch dual (top) in background as separate popup
-                        d2 = self._fetch_klines_binance(pair_l_, interval=tf2_, limit=int(bars2_))
-                        if d2:
-                            try:
-                                self.thumb_data_ready.emit(pair_l_, tf2_, d2)
-                            except Exception:
-                                pass
-                except Exception:
-                    pass
-            t = threading.Thread(target=_worker, args=(pair_l, bars, (self.thumb_tf or "1h"), bool(self.thumb_dual_enabled), int(self.thumb_bars2 or bars), (self.thumb_tf2 or "4h")), daemon=True)
-            t.start()
+            self._fetch_thumb_async("main", pair_l, (self.thumb_tf or "1h"), bars)
+            # Always fetch dual (top) in background as separate popup
+            self._fetch_thumb_async("dual", pair_l, (self.thumb_tf2 or "4h"), int(self.thumb_bars2 or bars))
+
+    def _fetch_thumb_async(self, which: str, pair_l: str, tf: str, limit: int):
+        # One request per popup in flight: a newer click/TF cycle cancels a queued fetch
+        # and the result of a superseded one is dropped
+        key = f"thumb:{which}"
+        fut = HTTP.submit(self._fetch_klines_binance, pair_l, tf, int(limit), key=key,
+                          host=FeedEngine.KLINES_URL["spot"], interactive=True)
+
+        def _done(f):
+            if f.cancelled() or not HTTP.is_latest(key, f):
+                return
+            try:
+                data = f.result()
+                if data:
+                    self.thumb_data_ready.emit(pair_l, tf, data)
+            except Exception:
+                pass
+        fut.add_done_callback(_done)
 
     @QtCore.Slot(str, str, list)
     def _on_thumb_data_ready(self, pair_l: str, tf: str, ohlc: list):
@@ -2464,8 +2768,7 @@ class CryptoWidgetQt(QtWidgets.QWidget):
             else:
                 if owner is not None:
                     label = (owner.thumb_tf if mode == 'main' else owner.thumb_tf2)
-            tf_map = getattr(self, '_tf_seconds', {"1m":60, "5m":300, "15m":900, "1h":3600, "4h":14400})
-            return int(tf_map.get(str(label).lower(), 3600))
+            return int(TF_SECONDS.get(str(label).lower(), 3600))
         except Exception:
             return 3600
 
@@ -2808,17 +3111,7 @@ class CryptoWidgetQt(QtWidgets.QWidget):
                         self._dual_popup.update()
                 # kick async refresh from exchange if enabled
                 if bool(self.thumb_fetch_from_binance) and pair_l:
-                    def _w2(pair_l_, tf_):
-                        try:
-                            d2 = self._fetch_klines_binance(pair_l_, interval=tf_, limit=int(self.thumb_bars2 or self.thumb_bars))
-                            if d2:
-                                try:
-                                    self.thumb_data_ready.emit(pair_l_, tf_, d2)
-                                except Exception:
-                                    pass
-                        except Exception:
-                            pass
-                    threading.Thread(target=_w2, args=(pair_l, new_tf), daemon=True).start()
+                    self._fetch_thumb_async("dual", pair_l, new_tf, int(self.thumb_bars2 or self.thumb_bars))
                 self._save_config()
             else:
                 cur = (self.thumb_tf or "1h")
@@ -2842,17 +3135,7 @@ class CryptoWidgetQt(QtWidgets.QWidget):
                         self._thumb_popup.update()
                 # async refresh main from exchange if enabled
                 if bool(self.thumb_fetch_from_binance) and pair_l:
-                    def _w1(pair_l_, tf_):
-                        try:
-                            d = self._fetch_klines_binance(pair_l_, interval=tf_, limit=int(self.thumb_bars or 50))
-                            if d:
-                                try:
-                                    self.thumb_data_ready.emit(pair_l_, tf_, d)
-                                except Exception:
-                                    pass
-                        except Exception:
-                            pass
-                    threading.Thread(target=_w1, args=(pair_l, new_tf), daemon=True).start()
+                    self._fetch_thumb_async("main", pair_l, new_tf, int(self.thumb_bars or 50))
                 self._save_config()
         except Exception:
             pass
@@ -2934,14 +3217,6 @@ class CryptoWidgetQt(QtWidgets.QWidget):
         pairs_slots = [self._slot_to_pair(s) for s in self.slots]
         pairs_watch = [self._slot_to_pair(s) for s in self.alert_watchlist]
         all_pairs = [p for p in set([*(p for p in pairs_slots if p), *(p for p in pairs_watch if p)])]
-        # Avoid duplicate connections; manage with a flag to skip noisy warnings
-        if self._price_signal_connected:
-            try:
-                self.ws.price_update.disconnect(self._on_price_update)
-            except Exception:
-                pass
-        self.ws.price_update.connect(self._on_price_update)
-        self._price_signal_connected = True
         try:
             if not all_pairs:
                 print("[WS] empty subscription from slots/watchlist")
@@ -2961,6 +3236,7 @@ class CryptoWidgetQt(QtWidgets.QWidget):
         except Exception:
             spot_set = set()
         pref = getattr(self, 'prefer_price_source', 'spot')
+        self.feed.set_all_market(bool(getattr(self, 'ws_all_market', False)))
         for p in all_pairs:
             pl = (p or '').lower()
             if pref == 'futures':
@@ -2978,13 +3254,15 @@ class CryptoWidgetQt(QtWidgets.QWidget):
             print("[WS] subscribe FUTURES:", ", ".join(futures_pairs) or "<none>")
         except Exception:
             pass
-        self.ws.connect_pairs(spot_pairs, futures_pairs)
+        self.feed.connect_pairs(spot_pairs, futures_pairs)
 
     def _restart_ws(self):
+        # Full reconnect (Refresh / audit drift); routine pair changes go through _start_ws,
+        # which only diffs the subscription on the live sockets.
         # Show placeholders while reconnecting
         self._show_placeholders()
         try:
-            self.ws.close()
+            self.feed.close()
         except Exception:
             pass
         self._start_ws()
@@ -3062,9 +3340,21 @@ class CryptoWidgetQt(QtWidgets.QWidget):
             else:
                 lbl.setToolTip("")
 
-    @QtCore.Slot(str, float, float)
-    def _on_price_update(self, pair: str, price: float, pct: float):
-        pair_l = pair.lower()
+    @QtCore.Slot(dict, dict)
+    def _on_frame(self, ticks: dict, rsi: dict):
+        # One coalesced frame from the feed worker: latest tick per pair + changed RSI maps
+        for pair_l, vals in rsi.items():
+            self._rsi_values_tf[pair_l] = vals
+            idx = self.pair_index.get(pair_l)
+            if idx is not None and idx < len(self.labels) and pair_l not in ticks:
+                sel = self.alert.pick_rsi_for_style(vals)
+                if sel is not None:
+                    self._apply_rsi_style_idx(idx, pair_l, sel)
+        for pair_l, (pair, price, pct) in ticks.items():
+            self.last_ws_price[pair_l] = float(price)
+            self._apply_tick(pair_l, pair, price, pct)
+
+    def _apply_tick(self, pair_l: str, pair: str, price: float, pct: float):
         idx = self.pair_index.get(pair_l)
         # Clear expired indicator for this pair if any
         try:
@@ -3078,9 +3368,7 @@ class CryptoWidgetQt(QtWidgets.QWidget):
         except Exception:
             pass
         if idx is None or idx >= len(self.labels):
-            # Not a visible pair; still record and maybe alert
-            self.last_ws_price[pair_l] = float(price)
-            self._ingest_series(pair, price)
+            # Not a visible pair; still maybe alert
             info = self._maybe_alert(pair, price, pct)
             if isinstance(info, dict) and info.get("period"):
                 self._set_indicator_for_pair(pair_l, info["period"])  # store/update for hidden pair
@@ -3099,17 +3387,23 @@ class CryptoWidgetQt(QtWidgets.QWidget):
         else:
             lbl.setToolTip("")
 
-        self.last_ws_price[pair_l] = float(price)
-        self._ingest_series(pair, price)
         info = self._maybe_alert(pair, price, pct)
         if isinstance(info, dict) and info.get("period"):
             self._set_indicator_for_pair(pair_l, info["period"])  # update visible
-        
+
         rsi_map = getattr(self, '_rsi_values_tf', {}).get(pair_l)
         if rsi_map:
             sel = self.alert.pick_rsi_for_style(rsi_map)
             if sel is not None:
-                self.alert.apply_rsi_style(lbl, sel)
+                self._apply_rsi_style_idx(idx, pair_l, sel)
+
+    def _apply_rsi_style_idx(self, idx: int, pair_l: str, rsi: float):
+        # Restyling resets the flash animation, so only touch the label when its preset changes
+        name = self.alert.rsi_style_name(rsi)
+        if self._rsi_style_shown.get(idx) == (pair_l, name):
+            return
+        self._rsi_style_shown[idx] = (pair_l, name)
+        self.alert.apply_rsi_style(self.labels[idx], rsi)
 
     # 统一的“昨日收盘价百分比”计算函数
     def _percent_from_prev_close(self, pair: str | None, price: float, fallback_pct: float) -> float:
@@ -3131,15 +3425,19 @@ class CryptoWidgetQt(QtWidgets.QWidget):
 
     # --- HTTP audit vs WS every 3 minutes ---
     def _start_http_audit(self):
-        if self.audit_worker is not None and self.audit_worker.isRunning():
+        if self._audit_future is not None and not self._audit_future.done():
             return
-        self.audit_worker = FetchThread(self.fetcher, self.slots)
-        try:
-            self.audit_worker.data_ready.disconnect(self._on_http_audit_result)
-        except Exception:
-            pass
-        self.audit_worker.data_ready.connect(self._on_http_audit_result)
-        self.audit_worker.start()
+        fut = self._audit_future = HTTP.submit(self.fetcher.fetch_crypto_prices_for_ids, list(self.slots), key="audit",
+                                               host="https://api.coingecko.com")
+
+        def _done(f):
+            if f.cancelled() or not HTTP.is_latest("audit", f):
+                return
+            try:
+                self.audit_data_ready.emit(f.result())
+            except Exception:
+                pass
+        fut.add_done_callback(_done)
 
     @QtCore.Slot(list)
     def _on_http_audit_result(self, data: List[Dict]):
@@ -3229,110 +3527,6 @@ class CryptoWidgetQt(QtWidgets.QWidget):
         except Exception:
             pass
 
-    def _ingest_series(self, pair: str, price: float):
-        try:
-            p = pair.lower()
-            prev_price = self._price_series[p][-1] if self._price_series[p] else None
-            self._price_series[p].append(float(price))
-            vol = float(self.ws.get_quote_volume(p)) if self.ws else 0.0
-            self._vol_series[p].append(vol)
-            now = time.time()
-            self._price_ts[p].append((now, float(price)))
-            
-            # Keep legacy tick-based buffers
-            if prev_price is not None:
-                change = float(price) - float(prev_price)
-                if change > 0:
-                    self._rsi_gains[p].append(change)
-                    self._rsi_losses[p].append(0.0)
-                else:
-                    self._rsi_gains[p].append(0.0)
-                    self._rsi_losses[p].append(abs(change))
-            
-            # Multi-timeframe bar closes
-            for tf in list(self.rsi_timeframes):
-                sec = self._tf_seconds.get(tf)
-                if not sec:
-                    continue
-                self._rsi_last_bar_close_tf[p][tf] = float(price)
-                last_ts = self._rsi_last_bar_ts_tf[p].get(tf, 0.0)
-                if now - last_ts >= float(sec):
-                    self._rsi_last_bar_ts_tf[p][tf] = now
-                    close = self._rsi_last_bar_close_tf[p].get(tf)
-                    if close is not None:
-                        self._rsi_closes_tf[p][tf].append(close)
-                        if len(self._rsi_closes_tf[p][tf]) >= self.rsi_period + 1:
-                            self._calculate_rsi_from_closes_tf(p, tf)
-        except Exception:
-            try:
-                print("[SERIES] ingest error")
-            except Exception:
-                pass
-            
-    def _calculate_rsi(self, pair: str):
-        """Calculate RSI-6 from tick-based buffers (fallback)."""
-        try:
-            p = pair.lower()
-            if len(self._rsi_gains[p]) < self.rsi_period or len(self._rsi_losses[p]) < self.rsi_period:
-                return
-                
-            avg_gain = sum(self._rsi_gains[p]) / self.rsi_period
-            avg_loss = sum(self._rsi_losses[p]) / self.rsi_period
-            
-            if avg_loss == 0:
-                rsi = 100
-            else:
-                rs = avg_gain / avg_loss
-                rsi = 100 - (100 / (1 + rs))
-                
-            self._rsi_values_tf[p]["tick"] = rsi
-            
-            # Update label style based on RSI
-            idx = self.pair_index.get(p)
-            if idx is not None and idx < len(self.labels):
-                sel = self.alert.pick_rsi_for_style(self._rsi_values_tf.get(p, {})) or rsi
-                self.alert.apply_rsi_style(self.labels[idx], sel)
-        except Exception:
-            pass
-
-    def _calculate_rsi_from_closes_tf(self, pair: str, tf: str):
-        try:
-            p = pair.lower()
-            closes = list(self._rsi_closes_tf[p][tf])
-            if len(closes) < self.rsi_period + 1:
-                return
-            gains, losses = [], []
-            for i in range(1, len(closes)):
-                ch = closes[i] - closes[i - 1]
-                gains.append(max(ch, 0.0))
-                losses.append(max(-ch, 0.0))
-            gains = gains[-self.rsi_period:]
-            losses = losses[-self.rsi_period:]
-            if len(gains) < self.rsi_period or len(losses) < self.rsi_period:
-                return
-            avg_gain = sum(gains) / float(self.rsi_period)
-            avg_loss = sum(losses) / float(self.rsi_period)
-            rsi = 100.0 if avg_loss == 0 else (100.0 - 100.0 / (1.0 + (avg_gain / avg_loss)))
-            self._rsi_values_tf[p][tf] = rsi
-            idx = self.pair_index.get(p)
-            if idx is not None and idx < len(self.labels):
-                sel = self.alert.pick_rsi_for_style(self._rsi_values_tf.get(p, {})) or rsi
-                self.alert.apply_rsi_style(self.labels[idx], sel)
-        except Exception:
-            pass
-            
-    def _update_rsi_values(self):
-        """Update RSI values for all pairs"""
-        for pair in list(self._price_series.keys()):
-            p = pair.lower()
-            done_any = False
-            for tf in list(self.rsi_timeframes):
-                if len(self._rsi_closes_tf[p][tf]) >= self.rsi_period + 1:
-                    self._calculate_rsi_from_closes_tf(p, tf)
-                    done_any = True
-            if not done_any:
-                self._calculate_rsi(p)
-
     def _volatility_stats(self, pair_l: str):
         return self.alert.volatility_stats(pair_l)
 
@@ -3518,10 +3712,6 @@ class CryptoWidgetQt(QtWidgets.QWidget):
             self.volume_threshold_sigma = float(sp_qs.value())
             self.bull_min_change_percent = float(sp_bull.value())
             self.bull_require_monotonic = bool(chk_mono.isChecked())
-            # reconfigure series buffers maxlen
-            self._series_maxlen = max(self.vol_window_samples, self.volume_window_samples, 120)
-            self._price_series = defaultdict(lambda: deque(maxlen=self._series_maxlen), self._price_series)
-            self._vol_series = defaultdict(lambda: deque(maxlen=self._series_maxlen), self._vol_series)
             # collect selected periods
             sel = [cb.text() for cb in cb_periods if cb.isChecked()]
             if not sel:
@@ -3532,8 +3722,8 @@ class CryptoWidgetQt(QtWidgets.QWidget):
             items = [t.strip().lower() for t in raw.replace("\n", ",").split(",")]
             self.alert_watchlist = [t for t in items if t]
             self._save_config()
-            # Rebuild WS to include updated watchlist (does not change UI slots)
-            self._restart_ws()
+            # Diff the WS subscription to include updated watchlist (does not change UI slots)
+            self._start_ws()
 
     # --- Announcer (Windows / edge-tts) ---
     def _open_announcer_settings(self):
@@ -4133,6 +4323,7 @@ class CryptoWidgetQt(QtWidgets.QWidget):
                 "geometry": [int(g.x()), int(g.y()), int(g.width()), int(g.height())],
                 "collapsed": bool(self._collapsed),
                 "prefer_price_source": str(getattr(self, 'prefer_price_source', 'spot')),
+                "ws_all_market": bool(getattr(self, 'ws_all_market', False)),
                 "base_font_px": int(getattr(self, '_base_font_px', 11)),
                 "ui_scale": float(self.ui_scale),
                 "thumb_enabled": bool(self.thumb_enabled),
@@ -4182,7 +4373,7 @@ class CryptoWidgetQt(QtWidgets.QWidget):
     def closeEvent(self, event: QtGui.QCloseEvent) -> None:
         self._save_config()
         try:
-            self.ws.close()
+            self.feed.stop()
         except Exception:
             pass
         return super().closeEvent(event)
@@ -4198,7 +4389,7 @@ class CryptoWidgetQt(QtWidgets.QWidget):
                 "page": 1,
                 "sparkline": "false",
             }
-            resp = requests.get(url, params=params, timeout=10)
+            resp = HTTP.get(url, params=params, timeout=10)
             resp.raise_for_status()
             data = resp.json() or []
             return [c.get("id") for c in data if c and c.get("id")]
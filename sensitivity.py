@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+参数敏感性分析：围绕基准配置，对每个数值型 Config 字段做 ±k 步扰动，并行回测并输出差值热力表。
+
+- 每步扰动幅度为基准值的 rel_step（整数字段至少 ±1，且保持 ≥1）
+- 各子进程只加载一次数据，并在进程内缓存特征：扰动字段不影响的特征直接复用（见 FEATURE_PARAMS）；
+  换到下一个扰动字段时丢弃非基准版本，缓存大小与字段数无关
+- 输出：sensitivity.csv（长表）与 sensitivity_heat.csv（参数 × 步数的 ΔPnL/Δ胜率/Δ回撤宽表），并在终端打印热力表
+
+使用示例：
+    python sensitivity.py --data-dir data --config output/strategy_config.1h.json \
+        --out-dir output_sensitivity --steps 2 --rel-step 0.1 \
+        --fields m1_init_sl_atr,m2_trail_sl_atr,theta_ret,donchian_n
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields, replace
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import strategy_pipeline as sp
+import results_db
+
+
+# 仅影响报表口径或整体缩放、不参与扰动的字段；标的池预筛在加载数据时按基准配置统一生效
+SKIP_FIELDS = ('initial_equity', 'report_leverage',
+               'universe_min_coverage', 'universe_min_quote_vol', 'universe_max_gap_frac')
+# 仅在启用市场过滤时生效的字段
+MARKET_FIELDS = ('market_L', 'market_theta')
+
+METRICS = ('pnl_sum', 'win_rate', 'max_dd')
+
+
+def numeric_fields(cfg: sp.Config) -> List[str]:
+    out = []
+    for f in fields(cfg):
+        v = getattr(cfg, f.name)
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            continue
+        if f.name in SKIP_FIELDS or (f.name in MARKET_FIELDS and not cfg.market_filter):
+            continue
+        out.append(f.name)
+    return out
+
+
+def perturb(base, j: int, rel_step: float):
+    """第 j 步扰动值；基准为 0 的浮点字段无相对尺度，返回 None。"""
+    if isinstance(base, int):
+        d = max(1, round(abs(base) * rel_step))
+        v = base + j * d
+        return v if v >= min(1, base) else None
+    if base == 0:
+        return None
+    v = base * (1.0 + j * rel_step)
+    return v if v >= 0 else None
+
+
+# ------------------------
+# 子进程
+# ------------------------
+
+_DATA: Dict[str, List[sp.Bar]] = {}
+_FEATURE_CACHE: Dict[str, Dict[tuple, list]] = {}
+_BASE_KEYS: set = set()  # 基准配置下各特征的缓存键
+_CACHE_FIELD: Optional[str] = None  # 缓存中非基准特征所属的扰动字段
+_DATA_FP: Optional[str] = None  # 数据指纹（写结果库时才计算，随结果回传，主进程无需重载数据）
+
+
+def _init_worker(data_dir: str, symbols: Optional[str], cfg: sp.Config, want_fp: bool = False) -> None:
+    global _DATA, _BASE_KEYS, _DATA_FP
+    _DATA = sp.load_universe(Path(data_dir), symbols, cfg)
+    _DATA_FP = sp.data_fingerprint(_DATA) if want_fp else None
+    _BASE_KEYS = {(n,) + tuple(getattr(cfg, k) for k in ps) for n, ps in sp.FEATURE_PARAMS.items()}
+
+
+def _trim_feature_cache(field: str) -> None:
+    """扰动字段变化时丢弃上一字段的非基准特征（build_tasks 已让同一字段的任务相邻）。"""
+    global _CACHE_FIELD
+    if field == _CACHE_FIELD:
+        return
+    _CACHE_FIELD = field
+    for cache in _FEATURE_CACHE.values():
+        for key in [k for k in cache if k not in _BASE_KEYS]:
+            del cache[key]
+
+
+def _run_one(task: Tuple[str, int, object, sp.Config]) -> dict:
+    name, j, value, cfg = task
+    _trim_feature_cache(name)
+    t0 = time.perf_counter()
+    engine = sp.Engine(_DATA, cfg, strategy=sp.TrendPyramidStrategy(cfg, feature_cache=_FEATURE_CACHE))
+    engine.run()
+    runtime_s = time.perf_counter() - t0
+    s = sp.compute_summary(engine.trades)
+    return {
+        'field': name, 'step': j, 'value': value, 'cfg': cfg,
+        'trades': engine.trades,
+        'pnl_sum': s['pnl_sum'], 'win_rate': s['win_rate'],
+        'max_dd': results_db.max_drawdown(engine.equity_curve),
+        'final_equity': engine.cash,
+        'runtime_s': runtime_s,
+        'symbols': list(_DATA), 'data_fp': _DATA_FP,
+    }
+
+
+# ------------------------
+# 调度与报表
+# ------------------------
+
+def build_tasks(base: sp.Config, names: List[str], k: int, rel_step: float) -> List[Tuple[str, int, object, sp.Config]]:
+    tasks = [('(base)', 0, None, base)]
+    for name in names:
+        b = getattr(base, name)
+        seen = {b}
+        for j in [x for x in range(-k, k + 1) if x != 0]:
+            v = perturb(b, j, rel_step)
+            if v is None or v in seen:
+                continue
+            seen.add(v)
+            tasks.append((name, j, v, replace(base, **{name: v})))
+    # 同一特征版本的任务相邻提交，提高进程内特征缓存命中
+    feat = {n for ps in sp.FEATURE_PARAMS.values() for n in ps}
+    tasks[1:] = sorted(tasks[1:], key=lambda t: (t[0] in feat, t[0], t[1]))
+    return tasks
+
+
+def _delta(v, b):
+    return None if v is None or b is None else v - b
+
+
+def write_reports(results: List[dict], base: dict, names: List[str], k: int, out_dir: Path) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with (out_dir / 'sensitivity.csv').open('w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['参数', '步', '取值', '总收益', '胜率', '最大回撤', 'Δ总收益', 'Δ胜率', 'Δ最大回撤', '耗时'])
+        for r in results:
+            w.writerow([
+                r['field'], r['step'], r['value'] if r['value'] is not None else '',
+                f"{r['pnl_sum']:.2f}",
+                f"{r['win_rate']:.4f}" if r['win_rate'] is not None else '',
+                f"{r['max_dd']:.4f}",
+                f"{r['pnl_sum'] - base['pnl_sum']:.2f}",
+                f"{_delta(r['win_rate'], base['win_rate']):.4f}" if _delta(r['win_rate'], base['win_rate']) is not None else '',
+                f"{r['max_dd'] - base['max_dd']:.4f}",
+                f"{r['runtime_s']:.2f}",
+            ])
+
+    grid = {(r['field'], r['step']): r for r in results}
+    steps = [j for j in range(-k, k + 1)]
+    with (out_dir / 'sensitivity_heat.csv').open('w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['参数', '指标'] + [f"{j:+d}" for j in steps])
+        for m in METRICS:
+            for name in names:
+                row = [name, 'Δ' + m]
+                for j in steps:
+                    r = base if j == 0 else grid.get((name, j))
+                    d = _delta(r[m], base[m]) if r is not None else None
+                    row.append(f"{d:.4f}" if d is not None else '')
+                w.writerow(row)
+
+    # 终端热力表：ΔPnL 绝对值，Δ胜率/Δ回撤以百分点显示
+    fmt = {
+        'pnl_sum': lambda d: f"{d:+.0f}",
+        'win_rate': lambda d: f"{d*100:+.1f}",
+        'max_dd': lambda d: f"{d*100:+.1f}",
+    }
+    title = {'pnl_sum': 'ΔPnL', 'win_rate': 'Δ胜率(pp)', 'max_dd': 'Δ最大回撤(pp)'}
+    width = max(len(n) for n in names) if names else 8
+    for m in METRICS:
+        print(f"\n== {title[m]}（基准 {base[m]:.4f}）" if base[m] is not None else f"\n== {title[m]}（基准 -）")
+        print(' ' * width + ''.join(f"{j:+d}".rjust(9) for j in steps))
+        for name in names:
+            cells = []
+            for j in steps:
+                r = base if j == 0 else grid.get((name, j))
+                d = _delta(r[m], base[m]) if r is not None else None
+                cells.append(('·' if j == 0 else fmt[m](d)) if d is not None else '-')
+            print(name.ljust(width) + ''.join(c.rjust(9) for c in cells))
+
+
+def main():
+    p = argparse.ArgumentParser(description='参数敏感性分析（并行）')
+    p.add_argument('--data-dir', '--数据目录', dest='data_dir', required=True, help='含各标的 OHLCV CSV 的目录')
+    p.add_argument('--symbols', '--标的', dest='symbols', required=False, help='以逗号分隔的符号列表；若省略，则自动扫描目录中所有 .csv 文件')
+    p.add_argument('--config', '--配置文件', dest='config', default=None, help='基准 JSON 配置文件')
+    p.add_argument('--out-dir', '--输出目录', dest='out_dir', default='output_sensitivity', help='报表输出目录')
+    p.add_argument('--fields', '--参数', dest='fields', default=None, help='以逗号分隔的待扰动字段；默认全部数值字段')
+    p.add_argument('--steps', '--步数', dest='steps', type=int, default=2, help='每个方向扰动的步数 k')
+    p.add_argument('--rel-step', '--相对步长', dest='rel_step', type=float, default=0.1, help='每步相对基准值的幅度')
+    p.add_argument('--workers', '--进程数', dest='workers', type=int, default=os.cpu_count() or 1, help='并行进程数')
+    p.add_argument('--results-db', '--结果库', dest='results_db', default='backtests.sqlite', help='SQLite 结果库路径')
+    p.add_argument('--no-db', dest='no_db', action='store_true', help='不写入结果库')
+    args = p.parse_args()
+
+    base_cfg = sp.load_config(Path(args.config) if args.config else None)
+    if args.fields:
+        names = [s.strip() for s in args.fields.split(',') if s.strip()]
+        bad = [n for n in names if not hasattr(base_cfg, n)]
+        if bad:
+            raise SystemExit(f"未知字段：{','.join(bad)}")
+    else:
+        names = numeric_fields(base_cfg)
+    tasks = build_tasks(base_cfg, names, args.steps, args.rel_step)
+    print(f"共 {len(tasks)} 次回测（{len(names)} 个参数 × ±{args.steps} 步），{args.workers} 进程")
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args.data_dir, args.symbols, base_cfg, not args.no_db)) as ex:
+        results = list(ex.map(_run_one, tasks))
+    wall = time.perf_counter() - t0
+    base = results[0]
+    results = results[1:]
+
+    out_dir = Path(args.out_dir)
+    write_reports(results, base, names, args.steps, out_dir)
+    print(f"\n总耗时 {wall:.1f}s（单次基准 {base['runtime_s']:.1f}s）")
+    print(f"已写入: {out_dir / 'sensitivity.csv'}, {out_dir / 'sensitivity_heat.csv'}")
+
+    if not args.no_db:
+        label = 'sensitivity:' + (Path(args.config).stem if args.config else 'default')
+        conn = results_db.connect(Path(args.results_db))
+        try:
+            for r in [base] + results:
+                results_db.record_result(
+                    conn, r['cfg'], r['trades'], max_dd=r['max_dd'], final_equity=r['final_equity'],
+                    symbols=r['symbols'], data_fp=r['data_fp'], runtime_s=r['runtime_s'],
+                    label=f"{label}:{r['field']}{r['step']:+d}",
+                )
+        finally:
+            conn.close()
+        print(f"已记录 {len(results) + 1} 次运行到结果库: {args.results_db}")
+
+
+if __name__ == '__main__':
+    main()
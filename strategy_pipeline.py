@@ -13,7 +13,7 @@ python strategy_pipeline.py --data-dir data --out-dir output --config output/str
 - 强制顺势对齐（交易方向与价格波幅符号一致）
 - 以 ATR 设初始止损与移动止盈，叠加时间止损
 - 约束组合暴露，实际杠杆 ≤ 配置上限（默认 ≈ 1）
-- 导出成交与汇总 CSV（便于复刻你现有分析）
+- 导出成交与权益曲线（列式 Parquet/npz，保留完整精度；--csv 另写成交 CSV）与汇总 CSV
 
 期望的单标 CSV 列（需要表头）：
     timestamp,open,high,low,close,volume
@@ -31,13 +31,22 @@ python strategy_pipeline.py --data-dir data --out-dir output --config output/str
 
 from __future__ import annotations
 
+import abc
 import argparse
 import csv
+import hashlib
+import heapq
 import json
 import math
+import mmap
 import os
+import pickle
+import struct
+import time
+from array import array
+from bisect import bisect_left
 from collections import defaultdict, deque
-from dataclasses import dataclass, field
+from dataclasses import asdict, astuple, dataclass, field, fields
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Iterable
@@ -153,6 +162,80 @@ def load_csv_ohlcv(path: Path) -> List[Bar]:
     return out
 
 
+def data_fingerprint(data: Dict[str, List[Bar]]) -> str:
+    """对全部 OHLCV 数值做内容哈希（与文件名/mtime 无关）；断点快照键与结果库共用。"""
+    h = hashlib.sha1()
+    for s in sorted(data):
+        bars = data[s]
+        h.update(f"{s}:{len(bars)};".encode('utf-8'))
+        h.update(array('d', [x for b in bars for x in (b.ts, b.o, b.h, b.l, b.c, b.v)]).tobytes())
+    return h.hexdigest()
+
+
+# ------------------------
+# 1m 子 bar 存储（可选，高精度止损模拟）
+# ------------------------
+
+SUB_BAR_MAGIC = b'SUBBAR1\0'
+SUB_BAR_COLS = ('ts', 'o', 'h', 'l', 'c', 'v')
+
+
+def write_sub_bar_file(bars: List[Bar], path: Path) -> None:
+    """写入列式 float64 文件：8 字节魔数 + 行数(uint64) + ts/o/h/l/c/v 六列依次排列。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('wb') as f:
+        f.write(SUB_BAR_MAGIC)
+        f.write(struct.pack('<Q', len(bars)))
+        for col in SUB_BAR_COLS:
+            f.write(array('d', [getattr(b, col) for b in bars]).tobytes())
+
+
+class SubBarStore:
+    """按标的懒加载的 1m 子 bar：mmap 只读映射 + 时间列二分定位，只触及被查询的分钟区间。
+
+    目录中优先读取 `<symbol>.f64`；若不存在但有 `<symbol>.csv`，首次访问时转换一次。
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._cols: Dict[str, Optional[Tuple[memoryview, ...]]] = {}
+        self._maps: List[mmap.mmap] = []
+
+    def _open(self, symbol: str) -> Optional[Tuple[memoryview, ...]]:
+        path = self.root / f"{symbol}.f64"
+        if not path.exists():
+            src = self.root / f"{symbol}.csv"
+            if not src.exists():
+                return None
+            write_sub_bar_file(load_csv_ohlcv(src), path)
+        with path.open('rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:8] != SUB_BAR_MAGIC:
+            mm.close()
+            raise RuntimeError(f"sub-bar file {path} has bad header")
+        n = struct.unpack_from('<Q', mm, 8)[0]
+        if n == 0:
+            mm.close()
+            return None
+        self._maps.append(mm)
+        flat = memoryview(mm)[16:16 + 8 * n * len(SUB_BAR_COLS)].cast('d')
+        return tuple(flat[k * n:(k + 1) * n] for k in range(len(SUB_BAR_COLS)))
+
+    def window(self, symbol: str, ts0: int, ts1: Optional[int]):
+        """返回 [ts0, ts1) 内的子 bar 列视图与下标区间 (cols, lo, hi)；无数据返回 None。"""
+        if symbol not in self._cols:
+            self._cols[symbol] = self._open(symbol)
+        cols = self._cols[symbol]
+        if cols is None:
+            return None
+        t = cols[0]
+        lo = bisect_left(t, ts0)
+        hi = len(t) if ts1 is None else bisect_left(t, ts1, lo)
+        if lo >= hi:
+            return None
+        return cols, lo, hi
+
+
 # ------------------------
 # 技术指标
 # ------------------------
@@ -266,6 +349,7 @@ class Config:
     # 市场过滤与动量阈值
     market_filter: bool = False      # 是否启用市场环境过滤
     market_symbol: str = 'BTC-USDT-SWAP'  # 市场基准符号
+    market_symbols: List[str] = field(default_factory=list)  # 多基准（如 BTC、ETH）；非空时取代 market_symbol，各基准方向一致才放行
     market_L: int = 24               # 市场 ret_L 窗口
     market_theta: float = 0.002      # 市场阈值（绝对值小于该阈值则不交易）
     momentum_gate: bool = False      # 动量闸门：做多要求 mom1>0 & mom2>0（做空对称）
@@ -295,6 +379,10 @@ class Config:
     # 收益率口径（仅用于报表展示，不影响PnL/仓位）
     roi_mode: str = 'notional'       # 'notional' | 'margin' | 'equity'
     report_leverage: float = 10.0    # 当 roi_mode='margin' 时用于放大收益率的名义杠杆
+    # 标的池预筛（基于数据目录下的元数据索引，见 load_symbol_index；0 表示不启用）
+    universe_min_coverage: float = 0.0    # 最小覆盖度：[首, 末] 时间跨度占全体跨度的比例
+    universe_min_quote_vol: float = 0.0   # 最小成交额中位数（close*volume，按 bar）
+    universe_max_gap_frac: float = 0.0    # 最大缺口比例：缺口数 / bar 数（0 表示不限制）
 
 
 @dataclass
@@ -342,10 +430,416 @@ def bps_to_price(price: float, bps: float) -> float:
     return price * (bps / 10000.0)
 
 
+def market_benchmarks(cfg: Config) -> List[str]:
+    """市场过滤使用的基准列表：market_symbols 非空时取之，否则为单一 market_symbol。"""
+    return list(cfg.market_symbols) if cfg.market_symbols else [cfg.market_symbol]
+
+
+# 特征名 -> 其依赖的 Config 字段（字段取值不变则特征不变，参数扫描时可跨配置复用）
+FEATURE_PARAMS: Dict[str, Tuple[str, ...]] = {
+    'ret_L': ('L_ret',),
+    'mom1': ('lookback_sma',),
+    'mom2': ('ema_fast', 'ema_slow'),
+    'don_hi': ('donchian_n',),
+    'don_lo': ('donchian_n',),
+    'atr': ('atr_n',),
+    'momL1': ('pool_mom_L1',),
+    'momL2': ('pool_mom_L2',),
+    'pool_mom': ('pool_mom_L1', 'pool_mom_L2'),
+}
+
+
+def _ret_over(c: List[float], L: int) -> List[Optional[float]]:
+    out: List[Optional[float]] = [None] * len(c)
+    for i in range(L, len(c)):
+        if c[i - L] != 0:
+            out[i] = c[i] / c[i - L] - 1.0
+    return out
+
+
+def compute_features(bars: List[Bar], cfg: Config,
+                     cache: Optional[Dict[tuple, List[Optional[float]]]] = None) -> Dict[str, List[Optional[float]]]:
+    """单标的内置特征（按自身 bar 对齐）。
+
+    cache 为该标的的可选缓存，键为 (特征名, *依赖字段取值)；同一份数据上多次运行时只重算参数变化的特征。
+    """
+    c = [b.c for b in bars]
+
+    def get(name, build):
+        if cache is None:
+            return build()
+        key = (name,) + tuple(getattr(cfg, k) for k in FEATURE_PARAMS[name])
+        v = cache.get(key)
+        if v is None:
+            v = cache[key] = build()
+        return v
+
+    def build_mom1():
+        sma_v = sma(c, cfg.lookback_sma)
+        return [None if sma_v[i] in (None, 0) else (c[i]/sma_v[i] - 1.0) for i in range(len(c))]
+
+    def build_mom2():
+        ema_f = ema(c, cfg.ema_fast)
+        ema_s = ema(c, cfg.ema_slow)
+        return [None if (ema_f[i] is None or ema_s[i] in (None, 0)) else (ema_f[i]/ema_s[i] - 1.0) for i in range(len(c))]
+
+    # 候选池动量（长周期）
+    L1 = max(1, int(cfg.pool_mom_L1)) if hasattr(cfg, 'pool_mom_L1') else 168
+    L2 = max(1, int(cfg.pool_mom_L2)) if hasattr(cfg, 'pool_mom_L2') else 336
+    momL1 = get('momL1', lambda: _ret_over(c, L1))
+    momL2 = get('momL2', lambda: _ret_over(c, L2))
+    # zscore 在 later 的横截面时点计算
+    return {
+        # 价格波幅收益 ret_L
+        'ret_L': get('ret_L', lambda: _ret_over(c, max(0, cfg.L_ret))),
+        'mom1': get('mom1', build_mom1),
+        'mom2': get('mom2', build_mom2),
+        'don_hi': get('don_hi', lambda: donchian_high(c, cfg.donchian_n)),
+        'don_lo': get('don_lo', lambda: donchian_low(c, cfg.donchian_n)),
+        'atr': get('atr', lambda: atr([b.h for b in bars], [b.l for b in bars], c, cfg.atr_n)),
+        'momL1': momL1,
+        'momL2': momL2,
+        # 候选池排序键 momL1+momL2（缺失按 0），调仓时直接按下标取值
+        'pool_mom': get('pool_mom', lambda: [(a if a is not None else 0.0) + (b if b is not None else 0.0)
+                                             for a, b in zip(momL1, momL2)]),
+    }
+
+
+# ------------------------
+# 策略接口
+# ------------------------
+
+@dataclass
+class StepContext:
+    """调仓步传给策略钩子的只读视图（均为 Engine 内部对象的引用，不做拷贝）。
+
+    features[s][name][idx[s]-1] 即标的 s 在当前时点的特征值；cur_bar[s] 为其最近一根 bar。
+    """
+    step: int
+    ts: int
+    syms: List[str]
+    idx: Dict[str, int]
+    cur_bar: Dict[str, Optional[Bar]]
+    features: Dict[str, Dict[str, List[Optional[float]]]]
+    position: Dict[str, Position]
+    cooldown: Dict[str, int]
+    market_on: bool = False
+    mkt_ret: Optional[float] = None   # 首个市场基准当前的 ret_L
+    market_gate: int = 0              # 市场闸门：+1 只允许做多，-1 只允许做空，0 不交易（仅 market_on 时有意义）
+
+
+class Strategy(abc.ABC):
+    """策略钩子。Engine 负责时间轴推进、移动止损、仓位规模与记账；策略只负责特征、打分、选择与持仓管理。
+
+    precompute_features 在 run 开始时调用一次，返回的每个标的特征表必须包含 'atr'（止损与仓位规模使用）；
+    其余钩子仅在调仓步各调用一次。precompute_features/score/select 为抽象方法，子类缺少任一钩子时构造即报错；
+    manage_positions 默认不平仓不加仓。
+    """
+
+    def __init__(self, cfg: Config):
+        self.cfg = cfg
+
+    @abc.abstractmethod
+    def precompute_features(self, data: Dict[str, List[Bar]]) -> Dict[str, Dict[str, List[Optional[float]]]]:
+        ...
+
+    @abc.abstractmethod
+    def score(self, ctx: StepContext) -> Dict[str, float]:
+        """返回当前时点可参与横截面比较的标的及其分数（保持插入顺序）。"""
+
+    @abc.abstractmethod
+    def select(self, ctx: StepContext, scores: Dict[str, float]) -> List[Tuple[str, int, float]]:
+        """返回按优先级排好序的入场候选 (symbol, side, rank_score)，Engine 按序开仓至 top_k。"""
+
+    def manage_positions(self, ctx: StepContext) -> Tuple[List[Tuple[str, str]], List[str]]:
+        """返回 (待平仓 [(symbol, reason)], 待加仓 [symbol])；加仓规模由 Engine 按风险与暴露约束计算。"""
+        return [], []
+
+
+class TrendPyramidStrategy(Strategy):
+    """内置策略：横截面 z 分数 + 候选池 + 唐奇安突破顺势入场，对齐失效平仓，顺势金字塔加仓。
+
+    feature_cache 可在多次运行间共享（{symbol: {特征键: 序列}}），见 compute_features。
+    """
+
+    def __init__(self, cfg: Config, feature_cache: Optional[Dict[str, Dict[tuple, List[Optional[float]]]]] = None):
+        super().__init__(cfg)
+        self.feature_cache = feature_cache
+
+    def precompute_features(self, data: Dict[str, List[Bar]]) -> Dict[str, Dict[str, List[Optional[float]]]]:
+        fc = self.feature_cache
+        return {s: compute_features(bars, self.cfg, None if fc is None else fc.setdefault(s, {}))
+                for s, bars in data.items()}
+
+    def score(self, ctx: StepContext) -> Dict[str, float]:
+        # 计算该时点 mom1/mom2 的横截面 zscore
+        mom1_vals: List[Optional[float]] = []
+        mom2_vals: List[Optional[float]] = []
+        val_syms: List[str] = []
+        for s in ctx.syms:
+            if ctx.cur_bar[s] is None:
+                continue
+            i = max(0, ctx.idx[s]-1)
+            f = ctx.features[s]
+            m1 = f['mom1'][i]
+            m2 = f['mom2'][i]
+            if m1 is None or m2 is None:
+                continue
+            mom1_vals.append(m1)
+            mom2_vals.append(m2)
+            val_syms.append(s)
+        z1 = zscore(mom1_vals)
+        z2 = zscore(mom2_vals)
+        return {s: (z1v or 0.0) + (z2v or 0.0) for s, z1v, z2v in zip(val_syms, z1, z2)}
+
+    def select(self, ctx: StepContext, scores: Dict[str, float]) -> List[Tuple[str, int, float]]:
+        cfg = self.cfg
+        # 候选池：按 momL1+momL2 取前 pool_size（部分选择 O(S log k)，同分按 scores 顺序，与完整稳定排序一致）
+        order = list(scores)
+        pool_vals = [ctx.features[s]['pool_mom'][max(0, ctx.idx[s]-1)] for s in order]
+        pool_k = max(1, int(getattr(cfg, 'pool_size', 12)))
+        pool = sorted(heapq.nlargest(pool_k, range(len(order)), key=pool_vals.__getitem__))
+
+        # 构建候选列表并做顺势对齐过滤（动量闸门、Z分数阈值、市场过滤、候选池、冷却）
+        # 市场过滤（若启用且市场方向/强度不足则本步不入场）
+        gate = ctx.market_gate
+        if ctx.market_on and gate == 0:
+            return []
+        candidates: List[Tuple[str, int, float]] = []  # (symbol, side, score)
+        for j in pool:
+            s = order[j]
+            score = scores[s]
+            if ctx.cooldown.get(s, 0) > 0:
+                continue
+            i = max(0, ctx.idx[s]-1)
+            f = ctx.features[s]
+            b = ctx.cur_bar[s]
+            if b is None:
+                continue
+            ret_L = f['ret_L'][i]
+            atr_v = f['atr'][i] or 0.0
+            don_hi = f['don_hi'][i]
+            don_lo = f['don_lo'][i]
+            if ret_L is None or atr_v is None:
+                continue
+            m1 = f['mom1'][i]
+            m2 = f['mom2'][i]
+            # 做多候选
+            long_ok = (
+                cfg.allow_long and ret_L > cfg.theta_ret and
+                don_hi is not None and b.c >= don_hi and
+                (not cfg.momentum_gate or (m1 is not None and m2 is not None and m1 > 0 and m2 > 0)) and
+                (cfg.z_score_thresh <= 0 or score >= cfg.z_score_thresh)
+            )
+            if ctx.market_on and long_ok:
+                long_ok = gate > 0
+            # 做空候选
+            short_ok = (
+                cfg.allow_short and ret_L < -cfg.theta_ret and
+                don_lo is not None and b.c <= don_lo and
+                (not cfg.momentum_gate or (m1 is not None and m2 is not None and m1 < 0 and m2 < 0)) and
+                (cfg.z_score_thresh <= 0 or -score >= cfg.z_score_thresh)
+            )
+            if ctx.market_on and short_ok:
+                short_ok = gate < 0
+            if long_ok:
+                candidates.append((s, +1, score))
+            elif short_ok:
+                candidates.append((s, -1, -score))
+
+        # 按分数排序（候选至多 pool_size 个），开仓至不超过 Top-K，且满足暴露约束
+        candidates.sort(key=lambda t: t[2], reverse=True)
+        return candidates
+
+    def manage_positions(self, ctx: StepContext) -> Tuple[List[Tuple[str, str]], List[str]]:
+        cfg = self.cfg
+        exits: List[Tuple[str, str]] = []
+        adds: List[str] = []
+        for s, pos in ctx.position.items():
+            i = max(0, ctx.idx[s]-1)
+            f = ctx.features[s]
+            ret_L = f['ret_L'][i]
+            if ret_L is None:
+                continue
+            # 对齐失效则平仓
+            if (pos.side > 0 and ret_L < 0) or (pos.side < 0 and ret_L > 0):
+                exits.append((s, 'alignment_lost'))
+                continue
+            # 现有持仓尝试“顺势加仓（金字塔）”
+            if pos.adds_done >= cfg.pyramid_max_adds:
+                continue
+            b = ctx.cur_bar.get(s)
+            if b is None:
+                continue
+            atr_v = f['atr'][i] or 0.0
+            if atr_v <= 0:
+                continue
+            don_hi = f['don_hi'][i]
+            don_lo = f['don_lo'][i]
+            # 仅顺势加仓且需满足突破方向条件
+            want_long = (pos.side > 0 and ret_L > cfg.theta_ret and don_hi is not None and b.c >= don_hi)
+            want_short = (pos.side < 0 and ret_L < -cfg.theta_ret and don_lo is not None and b.c <= don_lo)
+            if not (want_long or want_short):
+                continue
+            # 价格相对上次加仓/入场已推进 pyramid_step_atr * ATR
+            ref = pos.last_add_price or pos.entry_price
+            if pos.side > 0 and b.c >= ref + cfg.pyramid_step_atr * atr_v:
+                adds.append(s)
+            elif pos.side < 0 and b.c <= ref - cfg.pyramid_step_atr * atr_v:
+                adds.append(s)
+        return exits, adds
+
+
+def load_strategy(spec: str, cfg: Config) -> Strategy:
+    """按 'module:ClassName' 加载外部策略类，以 cfg 构造。"""
+    import importlib
+    mod_name, _, cls_name = spec.partition(':')
+    if not cls_name:
+        raise ValueError(f"strategy spec must be 'module:ClassName', got {spec!r}")
+    cls = getattr(importlib.import_module(mod_name), cls_name)
+    return cls(cfg)
+
+
+# 持仓簿不小于该值（top_k）且 numpy 可用时，auto 模式改用列式止损簿；小持仓簿上逐行标量循环更快
+STOP_BOOK_MIN_TOPK = 32
+
+
+def stop_book_enabled(mode: str = 'auto', top_k: int = 0) -> bool:
+    """解析止损簿实现：numpy 强制列式（缺 numpy 报错），scalar 逐持仓循环，auto 按 numpy 可用性与 top_k 选择。"""
+    if mode == 'scalar':
+        return False
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        if mode == 'numpy':
+            raise RuntimeError("stop book 'numpy' needs numpy")
+        return False
+    return mode == 'numpy' or top_k >= STOP_BOOK_MIN_TOPK
+
+
+class _StopBook:
+    """未平仓持仓的止损状态，按列存于 numpy 数组，行序与 Engine.position 的插入序一致。
+
+    价格一律乘以方向符号 side 存放（有利即更大、收紧即取 max），每个 bar 对全部持仓
+    做一次向量化的移动止损/保本/锁盈更新与触发判断；各标的 H/L/C/ATR 预先展平成列，
+    每步只按游标取数。持仓期间 max_fav_price 与 trail_stop 以本簿为准，读取 Position
+    上的值之前先 pull/sync 回写。
+    """
+
+    # 行：方向、入场价、止损 ATR 倍数、加仓次数、上次加仓价、最有利价、移动止损（价格列均已乘 side）
+    SIDE, ENTRY, ATR_MULT, ADDS, LAST_ADD, FAV, TRAIL = range(7)
+
+    def __init__(self, data: Dict[str, List[Bar]], features: Dict[str, dict]):
+        import numpy as np
+        self.np = np
+        # 全部标的的 bar 首尾相接：标的 s 的第 i 根 bar 位于 _off[s] + i
+        self._off: Dict[str, int] = {}
+        n_all = 0
+        for s, bars in data.items():
+            self._off[s] = n_all
+            n_all += len(bars)
+        self.H = np.fromiter((b.h for bars in data.values() for b in bars), np.float64, n_all)
+        self.L = np.fromiter((b.l for bars in data.values() for b in bars), np.float64, n_all)
+        self.C = np.fromiter((b.c for bars in data.values() for b in bars), np.float64, n_all)
+        self.ATR = np.fromiter(((a or 0.0) for s in data for a in features[s]['atr']), np.float64, n_all)
+        self.m = np.empty((7, 16))
+        self.off = np.empty(16, dtype=np.intp)
+        self.n = 0
+        self.syms: List[str] = []
+        self._row: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self.n
+
+    def add(self, pos: Position) -> None:
+        np = self.np
+        if self.n == len(self.off):
+            self.m = np.concatenate([self.m, np.empty_like(self.m)], axis=1)
+            self.off = np.concatenate([self.off, np.empty_like(self.off)])
+        self.off[self.n] = self._off[pos.symbol]
+        self._row[pos.symbol] = self.n
+        self.syms.append(pos.symbol)
+        self.n += 1
+        self.refresh(pos)
+        self.push_stops(pos)
+
+    def remove(self, symbol: str) -> None:
+        r = self._row.pop(symbol, None)
+        if r is None:
+            return
+        n = self.n
+        self.m[:, r:n-1] = self.m[:, r+1:n]
+        self.off[r:n-1] = self.off[r+1:n]
+        del self.syms[r]
+        for k in range(r, n - 1):
+            self._row[self.syms[k]] = k
+        self.n = n - 1
+
+    def refresh(self, pos: Position) -> None:
+        """写入入场/加仓相关的静态列（开仓、加仓后调用）。"""
+        r = self._row[pos.symbol]
+        side = float(pos.side)
+        m = self.m
+        m[self.SIDE, r] = side
+        m[self.ENTRY, r] = side * pos.entry_price
+        m[self.ATR_MULT, r] = pos.atr_mult
+        m[self.ADDS, r] = pos.adds_done
+        m[self.LAST_ADD, r] = side * pos.last_add_price
+
+    def push_stops(self, pos: Position) -> None:
+        r = self._row[pos.symbol]
+        side = float(pos.side)
+        self.m[self.FAV, r] = side * pos.max_fav_price
+        self.m[self.TRAIL, r] = side * pos.trail_stop
+
+    def pull(self, pos: Position) -> None:
+        r = self._row[pos.symbol]
+        side = self.m[self.SIDE, r]
+        pos.max_fav_price = float(side * self.m[self.FAV, r])
+        pos.trail_stop = float(side * self.m[self.TRAIL, r])
+
+    def sync(self, positions: Dict[str, Position]) -> None:
+        for pos in positions.values():
+            self.pull(pos)
+
+    def step(self, cursor, active, cfg: Config):
+        """按各行游标（已推进的 bar 数）对 active 行收紧止损，返回止损触发的布尔掩码。"""
+        np = self.np
+        side, entry, atr_mult, adds, last_add, fav, trail = self.m[:, :self.n]
+        k = self.off[:self.n] + np.maximum(cursor - 1, 0)
+        ATR = self.ATR[k]
+        sh, sl = side * self.H[k], side * self.L[k]
+        new_fav = np.maximum(fav, np.maximum(sh, sl))
+        new_trail = np.maximum(trail, new_fav - cfg.m2_trail_sl_atr * ATR)
+        # 保本/锁盈（仅在达到指定加仓次数后生效）
+        atr_on = ATR > 0
+        be = atr_on & (adds >= cfg.be_after_adds) & (side * self.C[k] - entry >= cfg.be_rr * atr_mult * ATR)
+        new_trail = np.where(be, np.maximum(new_trail, entry), new_trail)
+        lock = atr_on & (adds >= cfg.lock_after_adds) & (last_add != 0)
+        new_trail = np.where(lock, np.maximum(new_trail, last_add - cfg.lock_atr_mult * ATR), new_trail)
+        np.copyto(fav, new_fav, where=active)
+        np.copyto(trail, new_trail, where=active)
+        return active & (np.minimum(sh, sl) <= new_trail)
+
+
 class Engine:
-    def __init__(self, data: Dict[str, List[Bar]], cfg: Config, equity0: float = None):
+    def __init__(self, data: Dict[str, List[Bar]], cfg: Config, equity0: float = None,
+                 sub_bars: Optional[SubBarStore] = None, strategy: Optional[Strategy] = None,
+                 checkpoint: Optional[Path] = None, checkpoint_every_s: float = 60.0,
+                 stop_book: str = 'auto'):
         self.data = data
         self.cfg = cfg
+        # 止损簿：auto/numpy 时开放持仓的止损状态按列存放、每 bar 向量化更新；scalar 逐持仓循环
+        self.use_stop_book = stop_book_enabled(stop_book, cfg.top_k)
+        # 数据内容指纹：仅启用断点时在 run 中计算，供快照键与结果库复用（None 表示未计算）
+        self.data_fp: Optional[str] = None
+        self._book: Optional[_StopBook] = None
+        self.strategy = strategy if strategy is not None else TrendPyramidStrategy(cfg)
+        # 可选：按墙钟间隔把循环状态快照到磁盘，run(resume=True) 从快照继续
+        self.checkpoint = Path(checkpoint) if checkpoint else None
+        self.checkpoint_every_s = checkpoint_every_s
+        # 可选：持仓期间用 1m 子 bar 逐分钟推进止损并按止损价成交
+        self.sub_bars = sub_bars
         eq0 = cfg.initial_equity if equity0 is None else equity0
         self.equity = eq0
         self.cash = eq0
@@ -354,6 +848,36 @@ class Engine:
         self.equity_curve: List[Tuple[int, float]] = []
         self._last_mtm: float = eq0
 
+    def _align_market(self, all_ts: List[int], benchmarks: List[str]) -> Tuple[List[Optional[float]], array]:
+        """把各基准的 ret_L（market_L 窗口）按 as-of（ts ≤ 时点的最近 bar）对齐到全局时间轴。
+
+        返回 (首个基准的对齐 ret_L, 闸门序列)；闸门为 +1/-1 当所有基准都 > market_theta / < -market_theta，否则 0。
+        """
+        n = len(all_ts)
+        theta = self.cfg.market_theta
+        gate = array('b', [0]) * n
+        first: List[Optional[float]] = [None] * n
+        for k, m in enumerate(benchmarks):
+            m_bars = self.data[m]
+            m_close = [b.c for b in m_bars]
+            L = self.cfg.market_L
+            aligned: List[Optional[float]] = [None] * n
+            r: Optional[float] = None
+            ptr = 0
+            for step, ts in enumerate(all_ts):
+                while ptr < len(m_bars) and m_bars[ptr].ts <= ts:
+                    j = ptr - L
+                    r = m_close[ptr] / m_close[j] - 1.0 if j >= 0 and m_close[j] != 0 else None
+                    ptr += 1
+                aligned[step] = r
+            g = [0 if v is None else (1 if v > theta else (-1 if v < -theta else 0)) for v in aligned]
+            if k == 0:
+                first = aligned
+                gate = array('b', g)
+            else:
+                gate = array('b', (a if a == b else 0 for a, b in zip(gate, g)))
+        return first, gate
+
     def _compute_mtm(self, cur_bar: Dict[str, Optional[Bar]]) -> float:
         mtm = self.cash
         for s, pos in self.position.items():
@@ -364,68 +888,18 @@ class Engine:
             mtm += dir * pos.qty * (b.c - pos.entry_price)
         return mtm
 
-    def run(self) -> None:
+    def run(self, resume: bool = False) -> None:
         # 构建全局时间轴与每个标的的游标
         syms = list(self.data.keys())
         all_ts = sorted(set(ts for s in syms for ts in (b.ts for b in self.data[s])))
         idx = {s: 0 for s in syms}
-        # 市场基准（可选）
-        m_ret_series: List[Tuple[int, Optional[float]]] = []
-        m_ptr = 0
-        mkt_ret_cur: Optional[float] = None
-        if self.cfg.market_filter and self.cfg.market_symbol in self.data:
-            m_bars = self.data[self.cfg.market_symbol]
-            m_close = [b.c for b in m_bars]
-            for i in range(len(m_bars)):
-                j = i - self.cfg.market_L
-                r = None
-                if j >= 0 and m_close[j] != 0:
-                    r = m_close[i] / m_close[j] - 1.0
-                m_ret_series.append((m_bars[i].ts, r))
-        # 预计算各标的指标（按各自 bar 对齐）
-        features: Dict[str, Dict[str, List[Optional[float]]]] = {}
-        for s in syms:
-            bars = self.data[s]
-            c = [b.c for b in bars]
-            h = [b.h for b in bars]
-            l = [b.l for b in bars]
-            # 价格波幅收益 ret_L
-            ret_L: List[Optional[float]] = [None] * len(c)
-            for i in range(len(c)):
-                j = i - self.cfg.L_ret
-                if j >= 0 and c[j] != 0:
-                    ret_L[i] = c[i] / c[j] - 1.0
-            sma_v = sma(c, self.cfg.lookback_sma)
-            ema_f = ema(c, self.cfg.ema_fast)
-            ema_s = ema(c, self.cfg.ema_slow)
-            don_hi = donchian_high(c, self.cfg.donchian_n)
-            don_lo = donchian_low(c, self.cfg.donchian_n)
-            atr_v = atr(h, l, c, self.cfg.atr_n)
-            mom1: List[Optional[float]] = [None if sma_v[i] in (None, 0) else (c[i]/sma_v[i] - 1.0) for i in range(len(c))]
-            mom2: List[Optional[float]] = [None if (ema_f[i] is None or ema_s[i] in (None, 0)) else (ema_f[i]/ema_s[i] - 1.0) for i in range(len(c))]
-            # 候选池动量（长周期）
-            L1 = max(1, int(self.cfg.pool_mom_L1)) if hasattr(self.cfg, 'pool_mom_L1') else 168
-            L2 = max(1, int(self.cfg.pool_mom_L2)) if hasattr(self.cfg, 'pool_mom_L2') else 336
-            momL1: List[Optional[float]] = [None]*len(c)
-            momL2: List[Optional[float]] = [None]*len(c)
-            for i in range(len(c)):
-                j1 = i - L1
-                j2 = i - L2
-                if j1 >= 0 and c[j1] != 0:
-                    momL1[i] = c[i]/c[j1] - 1.0
-                if j2 >= 0 and c[j2] != 0:
-                    momL2[i] = c[i]/c[j2] - 1.0
-            # zscore 在 later 的横截面时点计算
-            features[s] = {
-                'ret_L': ret_L,
-                'mom1': mom1,
-                'mom2': mom2,
-                'don_hi': don_hi,
-                'don_lo': don_lo,
-                'atr': atr_v,
-                'momL1': momL1,
-                'momL2': momL2,
-            }
+        # 市场基准（可选）：对齐阶段一次性把各基准 ret_L 与闸门映射到全局时间轴，步进时按 step 直接读取
+        benchmarks = [m for m in market_benchmarks(self.cfg) if m in self.data] if self.cfg.market_filter else []
+        market_on = bool(benchmarks)
+        mkt_ret_at, mkt_gate_at = self._align_market(all_ts, benchmarks)
+        # 预计算各标的指标（按各自 bar 对齐），由策略钩子提供
+        strategy = self.strategy
+        features = strategy.precompute_features(self.data)
 
         last_rebalance_step = -10**9
         # 全局步进时点的最近 bar
@@ -433,7 +907,44 @@ class Engine:
         bars_since_entry: Dict[str, int] = defaultdict(int)
         cooldown: Dict[str, int] = defaultdict(int)  # 亏损后冷却计数
 
-        for step, ts in enumerate(all_ts):
+        n_steps = len(all_ts)
+        step = 0
+        ckpt_key = None
+        if self.checkpoint is not None:
+            if self.data_fp is None:
+                self.data_fp = data_fingerprint(self.data)
+            ckpt_key = self._checkpoint_key(syms, n_steps)
+        if resume and self.checkpoint is not None and self.checkpoint.exists():
+            st = self._load_checkpoint(ckpt_key)
+            step = st['step']
+            last_rebalance_step = st['last_rebalance_step']
+            idx.update(st['idx'])
+            for s in syms:
+                cur_bar[s] = self.data[s][idx[s]-1] if idx[s] > 0 else None
+            bars_since_entry.update(st['bars_since_entry'])
+            cooldown.update(st['cooldown'])
+        self._book = _StopBook(self.data, features) if self.use_stop_book else None
+        if self._book is not None:
+            for pos in self.position.values():
+                self._book.add(pos)
+        # 快照按墙钟间隔触发，开销只取决于间隔与状态大小
+        ckpt_next = time.monotonic() + self.checkpoint_every_s
+        while step < n_steps:
+            if self.checkpoint is not None and time.monotonic() >= ckpt_next:
+                if self._book is not None:
+                    self._book.sync(self.position)
+                self._save_checkpoint(ckpt_key, step, last_rebalance_step, idx, bars_since_entry, cooldown)
+                ckpt_next = time.monotonic() + self.checkpoint_every_s
+            # 空仓且非调仓步：无持仓可管理、也不会入场，权益恒等于现金；
+            # 直接快进到下一次调仓步，权益曲线批量补齐（游标在目标步一次性追上）
+            if not self.position:
+                next_step = min(n_steps, last_rebalance_step + self.cfg.rebalance_every)
+                if next_step > step:
+                    self.equity_curve.extend((t, self.cash) for t in all_ts[step:next_step])
+                    self._last_mtm = self.cash
+                    step = next_step
+                    continue
+            ts = all_ts[step]
             # advance bars for each symbol up to current ts
             for s in syms:
                 bars = self.data[s]
@@ -443,87 +954,78 @@ class Engine:
                 # update existing positions time-in-bar count
                 if s in self.position and cur_bar[s] is not None:
                     bars_since_entry[s] += 1
-            # 更新市场基准当前值
-            if m_ret_series:
-                while m_ptr < len(m_ret_series) and m_ret_series[m_ptr][0] <= ts:
-                    mkt_ret_cur = m_ret_series[m_ptr][1]
-                    m_ptr += 1
 
             # 更新移动止盈/止损并检查平仓
+            # 多空统一按方向符号 side 处理：价格乘以 side 后，“更有利”即“更大”，
+            # 止损只能向有利方向收紧（取 better），触发条件为不利价穿越止损。
             to_close: List[Tuple[str, str]] = []  # (symbol, reason)
-            for s, pos in list(self.position.items()):
-                b = cur_bar.get(s)
-                if b is None:
-                    continue
-                f = features[s]
-                i = max(0, idx[s]-1)  # current bar index
-                # update trailing based on max favorable price
-                if pos.side > 0:
-                    pos.max_fav_price = max(pos.max_fav_price, b.h)
-                    atr_i = (f['atr'][i] or 0.0)
-                    trail = pos.max_fav_price - self.cfg.m2_trail_sl_atr * atr_i
-                    pos.trail_stop = max(pos.trail_stop, trail)
+            sub_fill: Dict[str, Tuple[int, float]] = {}  # 子 bar 触发的 (成交时点, 止损成交价)
+            if self._book is not None:
+                self._book_exits(self._book, idx, bars_since_entry, to_close, sub_fill)
+            else:
+                m2_atr = self.cfg.m2_trail_sl_atr
+                be_after, be_rr = self.cfg.be_after_adds, self.cfg.be_rr
+                lock_after, lock_mult = self.cfg.lock_after_adds, self.cfg.lock_atr_mult
+                time_stop = self.cfg.time_stop_bars
+                for s, pos in list(self.position.items()):
+                    b = cur_bar.get(s)
+                    if b is None:
+                        continue
+                    i = max(0, idx[s]-1)  # current bar index
+                    atr_i = (features[s]['atr'][i] or 0.0)
+                    if self.sub_bars is not None:
+                        bars = self.data[s]
+                        bar_end = bars[idx[s]].ts if idx[s] < len(bars) else None
+                        scanned, fill = self._scan_sub_bars(pos, b.ts, bar_end, atr_i)
+                        if scanned:
+                            if fill is not None:
+                                sub_fill[s] = fill
+                                to_close.append((s, 'trail_stop'))
+                            elif bars_since_entry[s] >= time_stop:
+                                to_close.append((s, 'time_stop'))
+                            continue
+                    side = pos.side
+                    if side > 0:
+                        better, fav_px, adv_px = max, b.h, b.l
+                    else:
+                        better, fav_px, adv_px = min, b.l, b.h
+                    # update trailing based on max favorable price
+                    pos.max_fav_price = better(pos.max_fav_price, fav_px)
+                    pos.trail_stop = better(pos.trail_stop, pos.max_fav_price - side * m2_atr * atr_i)
                     # 保本/锁盈（仅在达到指定加仓次数后生效）
-                    if pos.adds_done >= self.cfg.be_after_adds and atr_i > 0:
-                        r_move = b.c - pos.entry_price
-                        if r_move >= self.cfg.be_rr * pos.atr_mult * atr_i:
-                            pos.trail_stop = max(pos.trail_stop, pos.entry_price)
-                    if pos.adds_done >= self.cfg.lock_after_adds and atr_i > 0 and pos.last_add_price:
-                        lock_stop = pos.last_add_price - self.cfg.lock_atr_mult * atr_i
-                        pos.trail_stop = max(pos.trail_stop, lock_stop)
+                    if atr_i > 0:
+                        if pos.adds_done >= be_after:
+                            r_move = side * (b.c - pos.entry_price)
+                            if r_move >= be_rr * pos.atr_mult * atr_i:
+                                pos.trail_stop = better(pos.trail_stop, pos.entry_price)
+                        if pos.adds_done >= lock_after and pos.last_add_price:
+                            lock_stop = pos.last_add_price - side * lock_mult * atr_i
+                            pos.trail_stop = better(pos.trail_stop, lock_stop)
                     # 触发止盈/止损
-                    if b.l <= pos.trail_stop:
+                    if side * adv_px <= side * pos.trail_stop:
                         to_close.append((s, 'trail_stop'))
-                    elif (bars_since_entry[s] >= self.cfg.time_stop_bars):
-                        to_close.append((s, 'time_stop'))
-                else:  # short
-                    pos.max_fav_price = min(pos.max_fav_price, b.l)
-                    atr_i = (f['atr'][i] or 0.0)
-                    trail = pos.max_fav_price + self.cfg.m2_trail_sl_atr * atr_i
-                    pos.trail_stop = min(pos.trail_stop, trail)
-                    if pos.adds_done >= self.cfg.be_after_adds and atr_i > 0:
-                        r_move = pos.entry_price - b.c
-                        if r_move >= self.cfg.be_rr * pos.atr_mult * atr_i:
-                            pos.trail_stop = min(pos.trail_stop, pos.entry_price)
-                    if pos.adds_done >= self.cfg.lock_after_adds and atr_i > 0 and pos.last_add_price:
-                        lock_stop = pos.last_add_price + self.cfg.lock_atr_mult * atr_i
-                        pos.trail_stop = min(pos.trail_stop, lock_stop)
-                    if b.h >= pos.trail_stop:
-                        to_close.append((s, 'trail_stop'))
-                    elif (bars_since_entry[s] >= self.cfg.time_stop_bars):
+                    elif bars_since_entry[s] >= time_stop:
                         to_close.append((s, 'time_stop'))
 
             for s, reason in to_close:
                 # 关闭并判断是否亏损以设置冷却
-                self._exit_position(s, cur_bar[s], reason)
+                self._exit_position(s, cur_bar[s], reason, fill=sub_fill.get(s))
                 if self.trades and self.trades[-1].symbol == s and self.trades[-1].pnl < 0:
                     cooldown[s] = max(cooldown.get(s, 0), getattr(self.cfg, 'cooldown_bars', 0))
                 bars_since_entry.pop(s, None)
 
-            # 调仓与入场
+            # 调仓与入场：策略钩子每个调仓步各调用一次（而非逐标的逐步调用）
             if step - last_rebalance_step >= self.cfg.rebalance_every:
                 last_rebalance_step = step
-
-                # 计算该时点 mom1/mom2 的横截面 zscore
-                mom1_vals: List[Optional[float]] = []
-                mom2_vals: List[Optional[float]] = []
-                val_syms: List[str] = []
-                val_idx: Dict[str, int] = {}
-                for s in syms:
-                    i = max(0, idx[s]-1)
-                    if cur_bar[s] is None:
-                        continue
-                    f = features[s]
-                    m1 = f['mom1'][i]
-                    m2 = f['mom2'][i]
-                    if m1 is None or m2 is None:
-                        continue
-                    mom1_vals.append(m1)
-                    mom2_vals.append(m2)
-                    val_syms.append(s)
-                    val_idx[s] = i
-                z1 = zscore(mom1_vals)
-                z2 = zscore(mom2_vals)
+                if self._book is not None:
+                    self._book.sync(self.position)  # 外部策略可能读取持仓止损
+                ctx = StepContext(
+                    step=step, ts=ts, syms=syms, idx=idx, cur_bar=cur_bar, features=features,
+                    position=self.position, cooldown=cooldown,
+                    market_on=market_on, mkt_ret=mkt_ret_at[step] if market_on else None,
+                    market_gate=mkt_gate_at[step] if market_on else 0,
+                )
+                scores = strategy.score(ctx)
 
                 # 冷却递减
                 for k in list(cooldown.keys()):
@@ -532,147 +1034,15 @@ class Engine:
                     else:
                         cooldown[k] -= 1
 
-                # 候选池：按 momL1+momL2 排序取前 pool_size
-                pool_scores: List[Tuple[str, float]] = []
-                for s in val_syms:
-                    i = val_idx[s]
-                    f = features[s]
-                    ml1 = f.get('momL1', [None])[i]
-                    ml2 = f.get('momL2', [None])[i]
-                    sc = (ml1 if ml1 is not None else 0.0) + (ml2 if ml2 is not None else 0.0)
-                    pool_scores.append((s, sc))
-                pool_scores.sort(key=lambda t: t[1], reverse=True)
-                pool_k = max(1, int(getattr(self.cfg, 'pool_size', 12)))
-                pool_set = set(s for s,_ in pool_scores[:pool_k])
-
-                # 构建候选列表并做顺势对齐过滤（动量闸门、Z分数阈值、市场过滤、候选池、冷却）
-                candidates: List[Tuple[str, int, float]] = []  # (symbol, side, score)
-                for (s, z1v, z2v) in zip(val_syms, z1, z2):
-                    if s not in pool_set or cooldown.get(s, 0) > 0:
-                        continue
-                    i = val_idx[s]
-                    f = features[s]
-                    b = cur_bar[s]
-                    if b is None:
-                        continue
-                    ret_L = f['ret_L'][i]
-                    atr_v = f['atr'][i] or 0.0
-                    don_hi = f['don_hi'][i]
-                    don_lo = f['don_lo'][i]
-                    if ret_L is None or atr_v is None:
-                        continue
-                    score = (z1v or 0.0) + (z2v or 0.0)
-                    m1 = f['mom1'][i]
-                    m2 = f['mom2'][i]
-                    # 市场过滤（若启用且市场方向/强度不足则跳过）
-                    if m_ret_series:
-                        if mkt_ret_cur is None or abs(mkt_ret_cur) < self.cfg.market_theta:
-                            continue
-                    # 做多候选
-                    long_ok = (
-                        self.cfg.allow_long and ret_L > self.cfg.theta_ret and
-                        don_hi is not None and b.c >= don_hi and
-                        (not self.cfg.momentum_gate or (m1 is not None and m2 is not None and m1 > 0 and m2 > 0)) and
-                        (self.cfg.z_score_thresh <= 0 or score >= self.cfg.z_score_thresh)
-                    )
-                    if m_ret_series and long_ok:
-                        long_ok = long_ok and (mkt_ret_cur is not None and mkt_ret_cur > self.cfg.market_theta)
-                    # 做空候选
-                    short_ok = (
-                        self.cfg.allow_short and ret_L < -self.cfg.theta_ret and
-                        don_lo is not None and b.c <= don_lo and
-                        (not self.cfg.momentum_gate or (m1 is not None and m2 is not None and m1 < 0 and m2 < 0)) and
-                        (self.cfg.z_score_thresh <= 0 or -score >= self.cfg.z_score_thresh)
-                    )
-                    if m_ret_series and short_ok:
-                        short_ok = short_ok and (mkt_ret_cur is not None and mkt_ret_cur < -self.cfg.market_theta)
-                    if long_ok:
-                        candidates.append((s, +1, score))
-                    elif short_ok:
-                        candidates.append((s, -1, -score))
-
-                # 按分数排序，开仓至不超过 Top-K，且满足暴露约束
-                candidates.sort(key=lambda t: t[2], reverse=True)
-                # 对齐失效则平仓
-                for s, pos in list(self.position.items()):
-                    i = max(0, idx[s]-1)
-                    f = features[s]
-                    ret_L = f['ret_L'][i]
-                    if ret_L is None:
-                        continue
-                    if (pos.side > 0 and ret_L < 0) or (pos.side < 0 and ret_L > 0):
-                        self._exit_position(s, cur_bar[s], 'alignment_lost')
-                        bars_since_entry.pop(s, None)
-
-                # 现有持仓尝试“顺势加仓（金字塔）”
-                for s, pos in list(self.position.items()):
-                    if pos.adds_done >= self.cfg.pyramid_max_adds:
-                        continue
-                    b = cur_bar.get(s)
-                    if b is None:
-                        continue
-                    f = features[s]
-                    i = max(0, idx[s]-1)
-                    atr_v = f['atr'][i] or 0.0
-                    if atr_v <= 0:
-                        continue
-                    don_hi = f['don_hi'][i]
-                    don_lo = f['don_lo'][i]
-                    ret_L = f['ret_L'][i]
-                    if ret_L is None:
-                        continue
-                    # 仅顺势加仓且需满足突破方向条件
-                    want_long = (pos.side > 0 and ret_L > self.cfg.theta_ret and don_hi is not None and b.c >= don_hi)
-                    want_short = (pos.side < 0 and ret_L < -self.cfg.theta_ret and don_lo is not None and b.c <= don_lo)
-                    if not (want_long or want_short):
-                        continue
-                    # 价格相对上次加仓/入场已推进 pyramid_step_atr * ATR
-                    step_ok = False
-                    if pos.side > 0 and b.c >= (pos.last_add_price or pos.entry_price) + self.cfg.pyramid_step_atr * atr_v:
-                        step_ok = True
-                    if pos.side < 0 and b.c <= (pos.last_add_price or pos.entry_price) - self.cfg.pyramid_step_atr * atr_v:
-                        step_ok = True
-                    if not step_ok:
-                        continue
-                    # 资金与暴露约束
-                    mtm_now = self._compute_mtm(cur_bar)
-                    exposure_cur = sum(abs(p.qty * cur_bar[s2].c) for s2, p in self.position.items() if cur_bar.get(s2))
-                    total_cap = self.cfg.max_actual_leverage * mtm_now
-                    headroom = max(0.0, total_cap - exposure_cur)
-                    per_symbol_cap = self.cfg.per_symbol_exposure_max * mtm_now
-                    # 本次加仓的风险额度
-                    mult_list = self.cfg.pyramid_risk_multipliers or [1.0]
-                    mult = mult_list[min(pos.adds_done, len(mult_list)-1)]
-                    risk_amount = mtm_now * self.cfg.risk_per_trade * mult
-                    stop_dist = self.cfg.m1_init_sl_atr * atr_v
-                    if risk_amount <= 0 or stop_dist <= 0:
-                        continue
-                    base_qty = risk_amount / stop_dist
-                    add_notional = abs(base_qty * b.c)
-                    # 受最小实际杠杆下限影响：若下限更大，则抬升到该下限的一部分（这里只针对新增）
-                    min_notional = self.cfg.min_actual_leverage * mtm_now if self.cfg.min_actual_leverage > 0 else 0.0
-                    desired_notional = max(add_notional, min_notional - exposure_cur)
-                    allowed = min(headroom, per_symbol_cap - abs(pos.qty * b.c))
-                    if allowed <= 0:
-                        continue
-                    final_notional = min(desired_notional, allowed)
-                    if final_notional <= 0:
-                        continue
-                    add_qty = final_notional / max(b.c, 1e-9)
-                    # 应用滑点
-                    slip = bps_to_price(b.c, self.cfg.slippage_bps)
-                    add_price = b.c + (slip if pos.side > 0 else -slip)
-                    # 重新加权平均持仓
-                    new_qty = pos.qty + add_qty
-                    if new_qty <= 0:
-                        continue
-                    pos.entry_price = (pos.entry_price * pos.qty + add_price * add_qty) / new_qty
-                    pos.qty = new_qty
-                    pos.exposure_notional = abs(pos.qty * add_price)
-                    pos.exposure_frac = pos.exposure_notional / max(mtm_now, 1e-9)
-                    pos.adds_done += 1
-                    pos.last_add_price = add_price
-                    pos.acc_entry_notional += abs(add_qty * add_price)
+                candidates = strategy.select(ctx, scores)
+                exits, adds = strategy.manage_positions(ctx)
+                for s, reason in exits:
+                    self._exit_position(s, cur_bar[s], reason)
+                    bars_since_entry.pop(s, None)
+                for s in adds:
+                    pos = self.position.get(s)
+                    if pos is not None:
+                        self._add_to_position(pos, cur_bar, features[s]['atr'][max(0, idx[s]-1)] or 0.0)
 
                 for s, side, score in candidates:
                     if len(self.position) >= self.cfg.top_k:
@@ -680,71 +1050,247 @@ class Engine:
                     if s in self.position:
                         continue
                     b = cur_bar[s]
-                    i = max(0, idx[s]-1)
-                    f = features[s]
-                    atr_v = f['atr'][i] or 0.0
+                    atr_v = features[s]['atr'][max(0, idx[s]-1)] or 0.0
                     if b is None or atr_v <= 0:
                         continue
-                    # 头寸规模：按单笔风险与止损距离（m1*ATR）
-                    stop_dist = self.cfg.m1_init_sl_atr * atr_v
-                    # approximate contract as linear: qty * price exposure
-                    # risk = stop_dist * qty => qty = risk / stop_dist
-                    # 使用当前权益（含未实现盈亏）
-                    mtm_now = self._compute_mtm(cur_bar)
-                    risk_amount = mtm_now * self.cfg.risk_per_trade
-                    if risk_amount <= 0:
-                        continue
-                    qty = risk_amount / max(stop_dist, 1e-9)
-                    # 组合/单标暴露约束（实际杠杆与单标上限）
-                    exposure_cur = sum(abs(p.qty * cur_bar[s2].c) for s2, p in self.position.items() if cur_bar.get(s2))
-                    total_cap = self.cfg.max_actual_leverage * mtm_now
-                    headroom = max(0.0, total_cap - exposure_cur)
-                    # 应用“最小实际杠杆”下限（可选）
-                    notional_risk = abs(qty * b.c)
-                    min_notional = self.cfg.min_actual_leverage * mtm_now if self.cfg.min_actual_leverage > 0 else 0.0
-                    desired_notional = max(notional_risk, min_notional)
-                    per_symbol_cap = self.cfg.per_symbol_exposure_max * mtm_now
-                    allowed_notional = min(per_symbol_cap, headroom)
-                    if allowed_notional <= 0:
-                        continue
-                    final_notional = min(desired_notional, allowed_notional)
-                    if final_notional <= 0:
-                        continue
-                    qty = final_notional / max(b.c, 1e-9)
-                    # 建立仓位，入场考虑滑点
-                    slip = bps_to_price(b.c, self.cfg.slippage_bps)
-                    entry_price = b.c + (slip if side > 0 else -slip)
-                    init_stop = entry_price - side * stop_dist
-                    trail = init_stop
-                    max_fav = b.h if side > 0 else b.l
-                    exposure_notional = abs(qty * entry_price)
-                    exposure_frac = exposure_notional / max(mtm_now, 1e-9)
-                    self.position[s] = Position(
-                        symbol=s, side=side, entry_ts=b.ts, entry_price=entry_price,
-                        qty=qty, init_stop=init_stop, trail_stop=trail, atr_mult=self.cfg.m1_init_sl_atr,
-                        max_fav_price=max_fav, reason='entry', equity_entry=mtm_now,
-                        exposure_notional=exposure_notional, exposure_frac=exposure_frac,
-                        adds_done=0, last_add_price=entry_price, acc_entry_notional=exposure_notional,
-                        init_stop_dist=stop_dist
-                    )
-                    bars_since_entry[s] = 0
+                    if self._open_position(s, side, cur_bar, atr_v):
+                        bars_since_entry[s] = 0
 
             # 记录权益曲线（按收盘价盯市）
             mtm = self._compute_mtm(cur_bar)
             self.equity_curve.append((ts, mtm))
             self._last_mtm = mtm
+            step += 1
 
         # 收盘清算剩余持仓
         for s in list(self.position.keys()):
             self._exit_position(s, cur_bar.get(s), 'eod')
-
-    def _exit_position(self, symbol: str, bar: Optional[Bar], reason: str) -> None:
+        if self.checkpoint is not None and self.checkpoint.exists():
+            self.checkpoint.unlink()
+
+    # ------------------------
+    # 断点快照：pickle 容器 + 紧凑数组（持仓/成交按字段元组存放，不依赖类的模块路径）
+    # ------------------------
+
+    def _checkpoint_key(self, syms: List[str], n_steps: int) -> str:
+        # 含数据内容哈希：CSV 被改写/重新下载但行数不变时，旧快照的游标与持仓不可复用
+        raw = json.dumps([asdict(self.cfg), syms, n_steps, type(self.strategy).__name__, self.data_fp],
+                         sort_keys=True)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _save_checkpoint(self, key: str, step: int, last_rebalance_step: int, idx: Dict[str, int],
+                         bars_since_entry: Dict[str, int], cooldown: Dict[str, int]) -> None:
+        eq_ts = array('q', (t for t, _ in self.equity_curve))
+        eq_v = array('d', (v for _, v in self.equity_curve))
+        state = {
+            'key': key,
+            'step': step,
+            'last_rebalance_step': last_rebalance_step,
+            'idx': dict(idx),
+            'bars_since_entry': dict(bars_since_entry),
+            'cooldown': dict(cooldown),
+            'cash': self.cash,
+            'equity': self.equity,
+            'last_mtm': self._last_mtm,
+            'positions': [astuple(p) for p in self.position.values()],
+            'trades': [astuple(t) for t in self.trades],
+            'eq_ts': eq_ts.tobytes(),
+            'eq_v': eq_v.tobytes(),
+        }
+        tmp = self.checkpoint.with_name(self.checkpoint.name + '.tmp')
+        tmp.parent.mkdir(parents=True, exist_ok=True)
+        with tmp.open('wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.checkpoint)
+
+    def _load_checkpoint(self, key: str) -> dict:
+        with self.checkpoint.open('rb') as f:
+            st = pickle.load(f)
+        if st.get('key') != key:
+            raise RuntimeError(f"checkpoint {self.checkpoint} does not match this config/data")
+        self.cash = st['cash']
+        self.equity = st['equity']
+        self._last_mtm = st['last_mtm']
+        self.position = {p[0]: Position(*p) for p in st['positions']}
+        self.trades = [Trade(*t) for t in st['trades']]
+        eq_ts = array('q'); eq_ts.frombytes(st['eq_ts'])
+        eq_v = array('d'); eq_v.frombytes(st['eq_v'])
+        self.equity_curve = list(zip(eq_ts, eq_v))
+        return st
+
+    def _add_to_position(self, pos: Position, cur_bar: Dict[str, Optional[Bar]], atr_v: float) -> None:
+        """顺势加仓：按本次风险乘数计算规模，受组合/单标暴露约束。"""
+        b = cur_bar.get(pos.symbol)
+        if b is None:
+            return
+        # 资金与暴露约束
+        mtm_now = self._compute_mtm(cur_bar)
+        exposure_cur = sum(abs(p.qty * cur_bar[s2].c) for s2, p in self.position.items() if cur_bar.get(s2))
+        total_cap = self.cfg.max_actual_leverage * mtm_now
+        headroom = max(0.0, total_cap - exposure_cur)
+        per_symbol_cap = self.cfg.per_symbol_exposure_max * mtm_now
+        # 本次加仓的风险额度
+        mult_list = self.cfg.pyramid_risk_multipliers or [1.0]
+        mult = mult_list[min(pos.adds_done, len(mult_list)-1)]
+        risk_amount = mtm_now * self.cfg.risk_per_trade * mult
+        stop_dist = self.cfg.m1_init_sl_atr * atr_v
+        if risk_amount <= 0 or stop_dist <= 0:
+            return
+        base_qty = risk_amount / stop_dist
+        add_notional = abs(base_qty * b.c)
+        # 受最小实际杠杆下限影响：若下限更大，则抬升到该下限的一部分（这里只针对新增）
+        min_notional = self.cfg.min_actual_leverage * mtm_now if self.cfg.min_actual_leverage > 0 else 0.0
+        desired_notional = max(add_notional, min_notional - exposure_cur)
+        allowed = min(headroom, per_symbol_cap - abs(pos.qty * b.c))
+        if allowed <= 0:
+            return
+        final_notional = min(desired_notional, allowed)
+        if final_notional <= 0:
+            return
+        add_qty = final_notional / max(b.c, 1e-9)
+        # 应用滑点
+        slip = bps_to_price(b.c, self.cfg.slippage_bps)
+        add_price = b.c + (slip if pos.side > 0 else -slip)
+        # 重新加权平均持仓
+        new_qty = pos.qty + add_qty
+        if new_qty <= 0:
+            return
+        pos.entry_price = (pos.entry_price * pos.qty + add_price * add_qty) / new_qty
+        pos.qty = new_qty
+        pos.exposure_notional = abs(pos.qty * add_price)
+        pos.exposure_frac = pos.exposure_notional / max(mtm_now, 1e-9)
+        pos.adds_done += 1
+        pos.last_add_price = add_price
+        pos.acc_entry_notional += abs(add_qty * add_price)
+        if self._book is not None:
+            self._book.refresh(pos)
+
+    def _open_position(self, s: str, side: int, cur_bar: Dict[str, Optional[Bar]], atr_v: float) -> bool:
+        """按单笔风险与止损距离（m1*ATR）开仓；受暴露约束无法开仓时返回 False。"""
+        b = cur_bar[s]
+        # 头寸规模：按单笔风险与止损距离（m1*ATR）
+        stop_dist = self.cfg.m1_init_sl_atr * atr_v
+        # approximate contract as linear: qty * price exposure
+        # risk = stop_dist * qty => qty = risk / stop_dist
+        # 使用当前权益（含未实现盈亏）
+        mtm_now = self._compute_mtm(cur_bar)
+        risk_amount = mtm_now * self.cfg.risk_per_trade
+        if risk_amount <= 0:
+            return False
+        qty = risk_amount / max(stop_dist, 1e-9)
+        # 组合/单标暴露约束（实际杠杆与单标上限）
+        exposure_cur = sum(abs(p.qty * cur_bar[s2].c) for s2, p in self.position.items() if cur_bar.get(s2))
+        total_cap = self.cfg.max_actual_leverage * mtm_now
+        headroom = max(0.0, total_cap - exposure_cur)
+        # 应用“最小实际杠杆”下限（可选）
+        notional_risk = abs(qty * b.c)
+        min_notional = self.cfg.min_actual_leverage * mtm_now if self.cfg.min_actual_leverage > 0 else 0.0
+        desired_notional = max(notional_risk, min_notional)
+        per_symbol_cap = self.cfg.per_symbol_exposure_max * mtm_now
+        allowed_notional = min(per_symbol_cap, headroom)
+        if allowed_notional <= 0:
+            return False
+        final_notional = min(desired_notional, allowed_notional)
+        if final_notional <= 0:
+            return False
+        qty = final_notional / max(b.c, 1e-9)
+        # 建立仓位，入场考虑滑点
+        slip = bps_to_price(b.c, self.cfg.slippage_bps)
+        entry_price = b.c + (slip if side > 0 else -slip)
+        init_stop = entry_price - side * stop_dist
+        trail = init_stop
+        max_fav = b.h if side > 0 else b.l
+        exposure_notional = abs(qty * entry_price)
+        exposure_frac = exposure_notional / max(mtm_now, 1e-9)
+        self.position[s] = Position(
+            symbol=s, side=side, entry_ts=b.ts, entry_price=entry_price,
+            qty=qty, init_stop=init_stop, trail_stop=trail, atr_mult=self.cfg.m1_init_sl_atr,
+            max_fav_price=max_fav, reason='entry', equity_entry=mtm_now,
+            exposure_notional=exposure_notional, exposure_frac=exposure_frac,
+            adds_done=0, last_add_price=entry_price, acc_entry_notional=exposure_notional,
+            init_stop_dist=stop_dist
+        )
+        if self._book is not None:
+            self._book.add(self.position[s])
+        return True
+
+    def _book_exits(self, book: _StopBook, idx: Dict[str, int], bars_since_entry: Dict[str, int],
+                    to_close: List[Tuple[str, str]], sub_fill: Dict[str, Tuple[int, float]]) -> None:
+        """列式止损簿上的平仓检查：按游标一次向量化更新全部持仓，按持仓顺序追加到 to_close。
+
+        有 1m 子 bar 的持仓仍逐分钟标量推进（先回写再扫描，扫描后写回止损簿）。
+        """
+        np = book.np
+        n = len(book)
+        time_stop = self.cfg.time_stop_bars
+        cursor = np.fromiter((idx[s] for s in book.syms), np.intp, n)
+        held = np.fromiter((bars_since_entry[s] for s in book.syms), np.int64, n)
+        active = cursor > 0  # 尚无 bar 的标的不更新
+        code = np.zeros(n, dtype=np.int8)  # 0 不平仓，1 trail_stop，2 time_stop
+        if self.sub_bars is not None:
+            for r in np.flatnonzero(active):
+                s = book.syms[r]
+                pos = self.position[s]
+                bars = self.data[s]
+                i = idx[s]
+                bar_end = bars[i].ts if i < len(bars) else None
+                book.pull(pos)
+                scanned, fill = self._scan_sub_bars(pos, bars[i-1].ts, bar_end, float(book.ATR[book.off[r] + i - 1]))
+                if scanned:
+                    book.push_stops(pos)
+                    active[r] = False
+                    if fill is not None:
+                        sub_fill[s] = fill
+                        code[r] = 1
+                    elif held[r] >= time_stop:
+                        code[r] = 2
+        hit = book.step(cursor, active, self.cfg)
+        code[active & (held >= time_stop)] = 2
+        code[hit] = 1
+        for r in np.flatnonzero(code):
+            to_close.append((book.syms[r], 'trail_stop' if code[r] == 1 else 'time_stop'))
+
+    def _scan_sub_bars(self, pos: Position, ts0: int, ts1: Optional[int], atr_i: float) -> Tuple[bool, Optional[Tuple[int, float]]]:
+        """在 [ts0, ts1) 的 1m 子 bar 上按时间顺序推进移动止损。
+
+        每分钟先用进入该分钟前的止损检查触发（跳空越过止损则按开盘价成交），
+        再用该分钟的有利极值与收盘价收紧止损。返回 (是否有子 bar 数据, 触发时的 (ts, 成交价))；
+        无子 bar 数据时调用方回退到整 bar 逻辑。
+        """
+        win = self.sub_bars.window(pos.symbol, ts0, ts1)
+        if win is None:
+            return False, None
+        (T, O, H, L, C, _), lo, hi = win
+        cfg = self.cfg
+        side = pos.side
+        better = max if side > 0 else min
+        fav_col, adv_col = (H, L) if side > 0 else (L, H)
+        if atr_i > 0 and pos.adds_done >= cfg.lock_after_adds and pos.last_add_price:
+            pos.trail_stop = better(pos.trail_stop, pos.last_add_price - side * cfg.lock_atr_mult * atr_i)
+        be_on = atr_i > 0 and pos.adds_done >= cfg.be_after_adds
+        be_move = cfg.be_rr * pos.atr_mult * atr_i
+        trail_off = side * cfg.m2_trail_sl_atr * atr_i
+        for k in range(lo, hi):
+            if side * adv_col[k] <= side * pos.trail_stop:
+                o = O[k]
+                fill = o if side * o <= side * pos.trail_stop else pos.trail_stop
+                return True, (int(T[k]), fill)
+            pos.max_fav_price = better(pos.max_fav_price, fav_col[k])
+            pos.trail_stop = better(pos.trail_stop, pos.max_fav_price - trail_off)
+            if be_on and side * (C[k] - pos.entry_price) >= be_move:
+                pos.trail_stop = better(pos.trail_stop, pos.entry_price)
+        return True, None
+
+    def _exit_position(self, symbol: str, bar: Optional[Bar], reason: str,
+                       fill: Optional[Tuple[int, float]] = None) -> None:
         pos = self.position.get(symbol)
         if pos is None or bar is None:
             return
+        # 成交基准价：默认为 bar 收盘；子 bar 止损触发时为 (时点, 止损成交价)
+        exit_ts, px = fill if fill is not None else (bar.ts, bar.c)
         # 平仓考虑滑点
-        slip = bps_to_price(bar.c, self.cfg.slippage_bps)
-        exit_price = bar.c - (slip if pos.side > 0 else -slip)
+        slip = bps_to_price(px, self.cfg.slippage_bps)
+        exit_price = px - (slip if pos.side > 0 else -slip)
         dir = 1 if pos.side > 0 else -1
         gross = dir * pos.qty * (exit_price - pos.entry_price)
         notional_entry = pos.acc_entry_notional if hasattr(pos, 'acc_entry_notional') and pos.acc_entry_notional else abs(pos.qty * pos.entry_price)
@@ -764,7 +1310,7 @@ class Engine:
             side='long' if pos.side > 0 else 'short',
             entry_ts=pos.entry_ts,
             entry_price=pos.entry_price,
-            exit_ts=bar.ts,
+            exit_ts=exit_ts,
             exit_price=exit_price,
             qty=pos.qty,
             pnl=pnl,
@@ -777,6 +1323,8 @@ class Engine:
             adds_done=getattr(pos, 'adds_done', 0),
         ))
         del self.position[symbol]
+        if self._book is not None:
+            self._book.remove(symbol)
 
 
 # ------------------------
@@ -874,6 +1422,81 @@ def export_trades(trades: List[Trade], out_path: Path) -> None:
             ])
 
 
+# 列式二进制导出：字段名与 Trade 一致，数值保持 float64/int64 原精度
+COLUMNAR_EXT = {'parquet': '.parquet', 'feather': '.feather', 'npz': '.npz'}
+_STR_COLS = ('symbol', 'side', 'reason')
+_INT_COLS = ('entry_ts', 'exit_ts', 'adds_done')
+
+
+def _columns(trades: List[Trade], equity_curve: List[Tuple[int, float]]):
+    tcols = {f.name: [getattr(t, f.name) for t in trades] for f in fields(Trade)}
+    ecols = {'ts': [t for t, _ in equity_curve], 'equity': [v for _, v in equity_curve]}
+    return tcols, ecols
+
+
+def columnar_backend(fmt: str = 'auto') -> Optional[str]:
+    """解析可用的列式格式：auto 依次尝试 parquet(pyarrow) → npz(numpy)；均不可用时返回 None。"""
+    order = ('parquet', 'npz') if fmt == 'auto' else (fmt,)
+    for f in order:
+        try:
+            if f in ('parquet', 'feather'):
+                import pyarrow  # noqa: F401
+            else:
+                import numpy  # noqa: F401
+            return f
+        except ImportError:
+            continue
+    if fmt != 'auto':
+        raise RuntimeError(f"columnar format {fmt!r} needs {'pyarrow' if fmt != 'npz' else 'numpy'}")
+    return None
+
+
+def export_columnar(trades: List[Trade], equity_curve: List[Tuple[int, float]], out_dir: Path, fmt: str) -> List[Path]:
+    """写出 trades.<ext> 与 equity.<ext>，返回写出的路径。"""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tcols, ecols = _columns(trades, equity_curve)
+    paths = [out_dir / f"trades{COLUMNAR_EXT[fmt]}", out_dir / f"equity{COLUMNAR_EXT[fmt]}"]
+    if fmt in ('parquet', 'feather'):
+        import pyarrow as pa
+        def table(cols):
+            return pa.table({k: pa.array(v, type=pa.string() if k in _STR_COLS else
+                                         pa.int64() if k in _INT_COLS or k == 'ts' else pa.float64())
+                             for k, v in cols.items()})
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            for cols, path in zip((tcols, ecols), paths):
+                pq.write_table(table(cols), path)
+        else:
+            import pyarrow.feather as pf
+            for cols, path in zip((tcols, ecols), paths):
+                pf.write_feather(table(cols), path)
+    else:
+        import numpy as np
+        def arrays(cols):
+            return {k: (np.array(v, dtype=str) if k in _STR_COLS else
+                        np.array(v, dtype=np.int64 if k in _INT_COLS or k == 'ts' else np.float64))
+                    for k, v in cols.items()}
+        for cols, path in zip((tcols, ecols), paths):
+            np.savez(path, **arrays(cols))
+    return paths
+
+
+def read_columnar(path: Path):
+    """读取 export_columnar 的产物，返回 {列名: numpy 数组}。"""
+    path = Path(path)
+    if path.suffix == '.npz':
+        import numpy as np
+        with np.load(path, allow_pickle=False) as z:
+            return {k: z[k] for k in z.files}
+    if path.suffix == '.parquet':
+        import pyarrow.parquet as pq
+        tbl = pq.read_table(path)
+    else:
+        import pyarrow.feather as pf
+        tbl = pf.read_table(path)
+    return {k: tbl.column(k).to_numpy() for k in tbl.column_names}
+
+
 def export_summary(trades: List[Trade], out_path: Path) -> None:
     out_path.parent.mkdir(parents=True, exist_ok=True)
     labels = ['前期','中期','后期']
@@ -1019,6 +1642,95 @@ def export_summary(trades: List[Trade], out_path: Path) -> None:
             ])
 
 
+# ------------------------
+# 标的元数据索引（覆盖度/流动性），存放于数据目录，按文件大小/修改时间/内容摘要增量刷新
+# ------------------------
+
+SYMBOL_INDEX_FILE = '_symbol_index.json'
+SYMBOL_INDEX_VERSION = 1
+
+
+def symbol_meta(bars: List[Bar]) -> Dict[str, float]:
+    """单标的元数据：首末时间、bar 数、缺口数（间隔 > 1.5 倍中位间隔）、成交额中位数。"""
+    n = len(bars)
+    if n == 0:
+        return {'first_ts': None, 'last_ts': None, 'bars': 0, 'gaps': 0, 'median_quote_vol': 0.0}
+    diffs = sorted(bars[i].ts - bars[i-1].ts for i in range(1, n))
+    step = diffs[len(diffs) // 2] if diffs else 0
+    gaps = sum(1 for d in diffs if step > 0 and d > 1.5 * step)
+    qv = sorted(b.c * b.v for b in bars)
+    mid = n // 2
+    median_qv = qv[mid] if n % 2 else (qv[mid-1] + qv[mid]) / 2
+    return {'first_ts': bars[0].ts, 'last_ts': bars[-1].ts, 'bars': n, 'gaps': gaps,
+            'median_quote_vol': median_qv}
+
+
+def load_symbol_index(data_dir: Path, refresh: bool = False) -> Dict[str, Dict[str, float]]:
+    """读取 <data_dir>/_symbol_index.json；新增或内容变化的 CSV 才重新解析，有更新时写回。"""
+    path = data_dir / SYMBOL_INDEX_FILE
+    entries: Dict[str, dict] = {}
+    if path.exists() and not refresh:
+        try:
+            with path.open('r', encoding='utf-8') as f:
+                raw = json.load(f)
+            if raw.get('version') == SYMBOL_INDEX_VERSION:
+                entries = raw.get('symbols', {})
+        except (OSError, ValueError):
+            entries = {}
+    out: Dict[str, dict] = {}
+    dirty = refresh
+    for p in sorted(data_dir.glob('*.csv')):
+        st = p.stat()
+        e = entries.get(p.stem)
+        if e is None or e.get('size') != st.st_size or e.get('mtime_ns') != st.st_mtime_ns:
+            # mtime 变化但内容未变（如重新检出）时只更新 mtime，不重新解析
+            digest = hashlib.sha1(p.read_bytes()).hexdigest()
+            if e is None or e.get('sha1') != digest:
+                e = dict(symbol_meta(load_csv_ohlcv(p)), sha1=digest)
+            e = dict(e, size=st.st_size, mtime_ns=st.st_mtime_ns)
+            dirty = True
+        out[p.stem] = e
+    if dirty or set(out) != set(entries):
+        tmp = path.with_name(path.name + '.tmp')
+        with tmp.open('w', encoding='utf-8') as f:
+            json.dump({'version': SYMBOL_INDEX_VERSION, 'symbols': out}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+    return out
+
+
+def universe_filter_enabled(cfg: Config) -> bool:
+    return cfg.universe_min_coverage > 0 or cfg.universe_min_quote_vol > 0 or cfg.universe_max_gap_frac > 0
+
+
+def filter_universe(index: Dict[str, Dict[str, float]], symbols: List[str],
+                    cfg: Config) -> Tuple[List[str], Dict[str, str]]:
+    """按覆盖度/成交额/缺口比例筛选，返回 (保留的标的, {剔除标的: 原因})；市场基准始终保留。"""
+    metas = {s: index[s] for s in symbols if s in index and index[s]['bars']}
+    if not metas:
+        return list(symbols), {}
+    t0 = min(m['first_ts'] for m in metas.values())
+    t1 = max(m['last_ts'] for m in metas.values())
+    span = max(t1 - t0, 1)
+    kept: List[str] = []
+    dropped: Dict[str, str] = {}
+    for s in symbols:
+        m = metas.get(s)
+        if m is None or (cfg.market_filter and s in market_benchmarks(cfg)):
+            kept.append(s)
+            continue
+        cov = (m['last_ts'] - m['first_ts']) / span
+        gap_frac = m['gaps'] / m['bars']
+        if cfg.universe_min_coverage > 0 and cov < cfg.universe_min_coverage:
+            dropped[s] = f"覆盖度 {cov:.2f} < {cfg.universe_min_coverage}"
+        elif cfg.universe_min_quote_vol > 0 and m['median_quote_vol'] < cfg.universe_min_quote_vol:
+            dropped[s] = f"成交额中位数 {m['median_quote_vol']:.0f} < {cfg.universe_min_quote_vol:g}"
+        elif cfg.universe_max_gap_frac > 0 and gap_frac > cfg.universe_max_gap_frac:
+            dropped[s] = f"缺口比例 {gap_frac:.3f} > {cfg.universe_max_gap_frac}"
+        else:
+            kept.append(s)
+    return kept, dropped
+
+
 # ------------------------
 # 命令行接口（支持中文参数名）
 # ------------------------
@@ -1052,6 +1764,7 @@ def load_config(path: Optional[Path]) -> Config:
         '允许做空': 'allow_short',
         '市场过滤': 'market_filter',
         '市场基准': 'market_symbol',
+        '市场基准列表': 'market_symbols',
         '市场窗口': 'market_L',
         '市场阈值': 'market_theta',
         '动量闸门': 'momentum_gate',
@@ -1068,7 +1781,10 @@ def load_config(path: Optional[Path]) -> Config:
         '保本加仓次数': 'be_after_adds',
         '保本R阈值': 'be_rr',
         '锁盈加仓次数': 'lock_after_adds',
-        '锁盈ATR倍数': 'lock_atr_mult'
+        '锁盈ATR倍数': 'lock_atr_mult',
+        '最小覆盖度': 'universe_min_coverage',
+        '最小成交额中位数': 'universe_min_quote_vol',
+        '最大缺口比例': 'universe_max_gap_frac'
     }
     cfg = Config()
     for k, v in raw.items():
@@ -1078,25 +1794,24 @@ def load_config(path: Optional[Path]) -> Config:
     return cfg
 
 
-def main():
-    p = argparse.ArgumentParser(description='横截面趋势流水线回测')
-    # 同时支持英文与中文参数名
-    p.add_argument('--data-dir', '--数据目录', dest='data_dir', required=True, help='含各标的 OHLCV CSV 的目录')
-    p.add_argument('--symbols', '--标的', dest='symbols', required=False, help='以逗号分隔的符号列表；若省略，则自动扫描目录中所有 .csv 文件')
-    p.add_argument('--out-dir', '--输出目录', dest='out_dir', default='output', help='成交与汇总 CSV 输出目录')
-    p.add_argument('--config', '--配置文件', dest='config', default=None, help='JSON 配置文件路径（可选，支持中文键名）')
-    args = p.parse_args()
+def load_universe(data_dir: Path, symbols: Optional[str] = None,
+                  cfg: Optional[Config] = None) -> Dict[str, List[Bar]]:
+    """按逗号分隔的符号列表加载数据；symbols 为空时扫描目录中所有 .csv。
 
-    data_dir = Path(args.data_dir)
-    out_dir = Path(args.out_dir)
-    if args.symbols:
-        sym_list = [s.strip() for s in args.symbols.split(',') if s.strip()]
+    传入 cfg 且启用了 universe_* 预筛时，先按元数据索引剔除覆盖度/流动性不足的标的，被剔除的文件不再解析。
+    """
+    if symbols:
+        sym_list = [s.strip() for s in symbols.split(',') if s.strip()]
     else:
         sym_list = [p.stem for p in data_dir.glob('*.csv')]
         if not sym_list:
             raise SystemExit(f"数据目录中未发现任何 CSV：{data_dir}")
-    cfg = load_config(Path(args.config) if args.config else None)
-
+    if cfg is not None and universe_filter_enabled(cfg):
+        sym_list, dropped = filter_universe(load_symbol_index(data_dir), sym_list, cfg)
+        for s, why in dropped.items():
+            print(f"预筛剔除 {s}: {why}")
+        if not sym_list:
+            raise SystemExit("预筛后没有剩余标的，请放宽 universe_* 阈值")
     data: Dict[str, List[Bar]] = {}
     for s in sym_list:
         path = data_dir / f"{s}.csv"
@@ -1105,18 +1820,84 @@ def main():
         data[s] = load_csv_ohlcv(path)
         if not data[s]:
             raise SystemExit(f"No valid rows in: {path}")
+    return data
 
-    engine = Engine(data, cfg)
-    engine.run()
 
-    trades_path = out_dir / 'trades.csv'
+def main():
+    p = argparse.ArgumentParser(description='横截面趋势流水线回测')
+    # 同时支持英文与中文参数名
+    p.add_argument('--data-dir', '--数据目录', dest='data_dir', required=True, help='含各标的 OHLCV CSV 的目录')
+    p.add_argument('--symbols', '--标的', dest='symbols', required=False, help='以逗号分隔的符号列表；若省略，则自动扫描目录中所有 .csv 文件')
+    p.add_argument('--out-dir', '--输出目录', dest='out_dir', default='output', help='成交与汇总 CSV 输出目录')
+    p.add_argument('--config', '--配置文件', dest='config', default=None, help='JSON 配置文件路径（可选，支持中文键名）')
+    p.add_argument('--sub-bar-dir', '--子bar目录', dest='sub_bar_dir', default=None, help='1m 子 bar 目录（<标的>.f64 或 .csv）；指定后持仓期间按分钟模拟止损触发与成交价')
+    p.add_argument('--strategy', '--策略', dest='strategy', default=None, help="外部策略类 'module:ClassName'（默认内置趋势/金字塔策略）")
+    p.add_argument('--checkpoint', '--断点文件', dest='checkpoint', default=None, help='断点快照路径（默认 <输出目录>/engine.ckpt，仅在 --resume 或 --checkpoint-every 时启用）')
+    p.add_argument('--checkpoint-every', '--断点间隔', dest='checkpoint_every', type=float, default=None, help='快照间隔（秒，默认 60）')
+    p.add_argument('--resume', '--续跑', dest='resume', action='store_true', help='从断点快照继续运行')
+    p.add_argument('--stop-book', '--止损簿', dest='stop_book', default='auto', choices=['auto', 'numpy', 'scalar'],
+                   help=f'持仓止损更新方式：numpy 列式向量化，scalar 逐持仓循环；auto 在 numpy 可用且 top_k ≥ {STOP_BOOK_MIN_TOPK} 时用 numpy')
+    p.add_argument('--format', '--格式', dest='format', default='auto', choices=['auto', 'parquet', 'feather', 'npz', 'csv'],
+                   help='成交/权益曲线输出格式；auto 依次尝试 parquet→npz，均不可用时写 CSV')
+    p.add_argument('--csv', dest='csv', action='store_true', help='额外写出 trades.csv（列式格式下为可选项）')
+    p.add_argument('--results-db', '--结果库', dest='results_db', default='backtests.sqlite', help='记录本次运行的 SQLite 结果库路径（见 results_db.py）')
+    p.add_argument('--no-db', dest='no_db', action='store_true', help='不写入结果库')
+    p.add_argument('--label', '--标签', dest='label', default=None, help='结果库中的运行标签（默认取配置文件名）')
+    p.add_argument('--build-index', '--重建索引', dest='build_index', action='store_true', help='重建数据目录下的标的元数据索引（覆盖度/缺口/成交额）并打印后退出')
+    args = p.parse_args()
+
+    out_dir = Path(args.out_dir)
+    cfg = load_config(Path(args.config) if args.config else None)
+    if args.build_index:
+        index = load_symbol_index(Path(args.data_dir), refresh=True)
+        print(f"{'标的':<20}{'首 bar':>18}{'末 bar':>18}{'bar数':>8}{'缺口':>6}{'成交额中位数':>16}")
+        for s, m in index.items():
+            if not m['bars']:
+                print(f"{s:<20}{'-':>18}{'-':>18}{0:>8}")
+                continue
+            first = datetime.fromtimestamp(m['first_ts'] / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+            last = datetime.fromtimestamp(m['last_ts'] / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+            print(f"{s:<20}{first:>18}{last:>18}{m['bars']:>8}{m['gaps']:>6}{m['median_quote_vol']:>16,.0f}")
+        print(f"已写入: {Path(args.data_dir) / SYMBOL_INDEX_FILE}")
+        return
+    data = load_universe(Path(args.data_dir), args.symbols, cfg)
+
+    sub_bars = SubBarStore(Path(args.sub_bar_dir)) if args.sub_bar_dir else None
+    strategy = load_strategy(args.strategy, cfg) if args.strategy else None
+    ckpt = None
+    if args.checkpoint or args.resume or args.checkpoint_every is not None:
+        ckpt = Path(args.checkpoint) if args.checkpoint else out_dir / 'engine.ckpt'
+        if args.resume and not ckpt.exists():
+            print(f"未找到断点快照，从头运行: {ckpt}")
+    engine = Engine(data, cfg, sub_bars=sub_bars, strategy=strategy, checkpoint=ckpt,
+                    checkpoint_every_s=args.checkpoint_every if args.checkpoint_every is not None else 60.0,
+                    stop_book=args.stop_book)
+    t0 = time.perf_counter()
+    engine.run(resume=args.resume)
+    runtime_s = time.perf_counter() - t0
+
+    fmt = None if args.format == 'csv' else columnar_backend(args.format)
+    if fmt is not None:
+        for path in export_columnar(engine.trades, engine.equity_curve, out_dir, fmt):
+            print(f"已写入: {path}")
+    if fmt is None or args.csv:
+        trades_path = out_dir / 'trades.csv'
+        export_trades(engine.trades, trades_path)
+        print(f"已写入成交: {trades_path}")
     summary_path = out_dir / 'strategy_summary.csv'
-    export_trades(engine.trades, trades_path)
     export_summary(engine.trades, summary_path)
-
-    print(f"已写入成交: {trades_path}")
     print(f"已写入汇总: {summary_path}")
 
+    if not args.no_db:
+        import results_db
+        label = args.label or (Path(args.config).stem if args.config else 'default')
+        conn = results_db.connect(Path(args.results_db))
+        try:
+            run_id = results_db.record_run(conn, engine, runtime_s, label=label, data_fp=engine.data_fp)
+        finally:
+            conn.close()
+        print(f"已记录到结果库: {args.results_db} (run #{run_id})")
+
 
 if __name__ == '__main__':
     main()
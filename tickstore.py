@@ -0,0 +1,279 @@
+"""Per-pair tick store: float64 (ts, price, quote volume) buffers with amortised O(1)
+append and zero-copy trailing-window views, plus rolling multi-timeframe OHLCV bars
+and incremental Wilder RSI. Views alias live memory; copy them under the owner's lock
+before using them on another thread."""
+
+from __future__ import annotations
+
+from collections import deque
+
+import numpy as np
+
+_INITIAL = 64
+
+# Bar lengths in seconds; bars open on UTC epoch multiples, like Binance klines
+TF_SECONDS = {"1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "4h": 14400, "8h": 28800, "1d": 86400, "3d": 259200}
+
+
+class _Ring:
+    __slots__ = ("ts", "price", "qvol", "start", "end")
+
+    def __init__(self, size: int):
+        self.ts = np.empty(size, dtype=np.float64)
+        self.price = np.empty(size, dtype=np.float64)
+        self.qvol = np.empty(size, dtype=np.float64)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def nbytes(self) -> int:
+        return self.ts.nbytes + self.price.nbytes + self.qvol.nbytes
+
+
+class TickStore:
+    def __init__(self, capacity: int = 10000, slack: float = 0.25):
+        self.capacity = max(2, int(capacity))
+        # Extra room past capacity before the live ticks are compacted back to the front
+        self._full_size = self.capacity + max(64, int(self.capacity * float(slack)))
+        self._rings: dict[str, _Ring] = {}
+
+    def __contains__(self, pair: str) -> bool:
+        return pair in self._rings
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def pairs(self) -> list[str]:
+        return list(self._rings)
+
+    def count(self, pair: str) -> int:
+        r = self._rings.get(pair)
+        return len(r) if r is not None else 0
+
+    def nbytes(self) -> int:
+        return sum(r.nbytes() for r in self._rings.values())
+
+    def append(self, pair: str, ts: float, price: float, qvol: float = 0.0) -> None:
+        r = self._rings.get(pair)
+        if r is None:
+            r = self._rings[pair] = _Ring(min(_INITIAL, self._full_size))
+        if r.end == len(r.ts):
+            self._make_room(r)
+        i = r.end
+        if i > r.start and ts < r.ts[i - 1]:
+            # Keep timestamps non-decreasing (wall-clock steps back) so lookups can bisect
+            ts = r.ts[i - 1]
+        r.ts[i] = ts
+        r.price[i] = price
+        r.qvol[i] = qvol
+        r.end = i + 1
+        if r.end - r.start > self.capacity:
+            r.start += 1
+
+    def _make_room(self, r: _Ring) -> None:
+        n = r.end - r.start
+        size = len(r.ts)
+        if size < self._full_size:
+            # Still growing: reallocate larger and copy the live ticks to the front
+            new_size = min(self._full_size, size * 2)
+            for name in ("ts", "price", "qvol"):
+                old = getattr(r, name)
+                arr = np.empty(new_size, dtype=np.float64)
+                arr[:n] = old[r.start:r.end]
+                setattr(r, name, arr)
+        else:
+            for arr in (r.ts, r.price, r.qvol):
+                arr[:n] = arr[r.start:r.end]
+        r.start, r.end = 0, n
+
+    def window(self, pair: str, n: int | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Zero-copy (ts, price, qvol) views of the last ``n`` ticks (all retained ticks if None)."""
+        r = self._rings.get(pair)
+        if r is None:
+            empty = np.empty(0, dtype=np.float64)
+            return empty, empty, empty
+        lo = r.start if n is None else max(r.start, r.end - int(n))
+        return r.ts[lo:r.end], r.price[lo:r.end], r.qvol[lo:r.end]
+
+    def last(self, pair: str) -> tuple[float, float] | None:
+        """(ts, price) of the newest tick, or None."""
+        r = self._rings.get(pair)
+        if r is None or r.end == r.start:
+            return None
+        i = r.end - 1
+        return float(r.ts[i]), float(r.price[i])
+
+    def price_at_or_after(self, pair: str, t: float) -> float | None:
+        """Price of the first retained tick with ts >= t (the oldest tick if none is that recent)."""
+        r = self._rings.get(pair)
+        if r is None or r.end == r.start:
+            return None
+        i = r.start + int(np.searchsorted(r.ts[r.start:r.end], t, side="left"))
+        if i >= r.end:
+            i = r.start
+        return float(r.price[i])
+
+    def evict(self, pair: str) -> None:
+        self._rings.pop(pair, None)
+
+    def retain(self, keep) -> list[str]:
+        """Drop every pair not in ``keep``; returns the evicted pairs."""
+        keep = set(keep)
+        dropped = [p for p in self._rings if p not in keep]
+        for p in dropped:
+            del self._rings[p]
+        return dropped
+
+
+class BarBuilder:
+    """Rolling OHLCV bars per (pair, timeframe), updated in O(1) per tick and timeframe.
+
+    Bars are (open_ts, open, high, low, close, volume) tuples. Volume is the sum of
+    positive increments of the stream's rolling 24h quote volume, i.e. an estimate.
+    """
+
+    def __init__(self, timeframes=None, max_bars: int = 200):
+        self.tf_seconds = {tf: TF_SECONDS[tf] for tf in (timeframes or TF_SECONDS) if tf in TF_SECONDS}
+        self.max_bars = int(max_bars)
+        self._closed: dict[str, dict[str, deque]] = {}
+        self._cur: dict[str, dict[str, list]] = {}
+        self._last_q: dict[str, float] = {}
+
+    def update(self, pair: str, ts: float, price: float, qvol: float = 0.0) -> list[str]:
+        """Fold one tick into every timeframe; returns the timeframes whose bar just closed."""
+        prev_q = self._last_q.get(pair)
+        self._last_q[pair] = qvol
+        dv = qvol - prev_q if prev_q is not None and qvol > prev_q else 0.0
+        cur = self._cur.setdefault(pair, {})
+        closed_tfs = []
+        for tf, sec in self.tf_seconds.items():
+            start = float(int(ts // sec) * sec)
+            bar = cur.get(tf)
+            if bar is None or start > bar[0]:
+                if bar is not None:
+                    self._closed_bars(pair, tf).append(tuple(bar))
+                    closed_tfs.append(tf)
+                cur[tf] = [start, price, price, price, price, dv]
+            else:
+                if price > bar[2]:
+                    bar[2] = price
+                if price < bar[3]:
+                    bar[3] = price
+                bar[4] = price
+                bar[5] += dv
+        return closed_tfs
+
+    def seed(self, pair: str, tf: str, rows, now: float) -> None:
+        """Replace the closed history with exchange klines ``rows`` [(open_ts, o, h, l, c, v), ...].
+
+        A still-open last kline becomes the current bar, merged with any live bar of
+        the same period (live ticks keep the latest close and widen the range).
+        """
+        sec = self.tf_seconds.get(tf)
+        if sec is None:
+            return
+        rows = sorted(rows)
+        closed = [tuple(r) for r in rows if r[0] + sec <= now]
+        opened = [list(r) for r in rows if r[0] + sec > now]
+        cur = self._cur.setdefault(pair, {})
+        live = cur.get(tf)
+        if opened:
+            bar = opened[-1]
+            if live is not None and live[0] == bar[0]:
+                bar[2] = max(bar[2], live[2])
+                bar[3] = min(bar[3], live[3])
+                bar[4] = live[4]
+                bar[5] = max(bar[5], live[5])
+            elif live is not None and live[0] > bar[0]:
+                closed.append(tuple(bar))
+                bar = live
+            cur[tf] = bar
+        elif live is not None and closed and live[0] <= closed[-1][0]:
+            del cur[tf]
+        dq = self._closed_bars(pair, tf)
+        dq.clear()
+        dq.extend(closed[-self.max_bars:])
+
+    def _closed_bars(self, pair: str, tf: str) -> deque:
+        per = self._closed.setdefault(pair, {})
+        dq = per.get(tf)
+        if dq is None:
+            dq = per[tf] = deque(maxlen=self.max_bars)
+        return dq
+
+    def bars(self, pair: str, tf: str, n: int | None = None, include_current: bool = True) -> list[tuple]:
+        """Last ``n`` bars, oldest first; the in-progress bar is last when ``include_current``."""
+        if tf not in self.tf_seconds:
+            return []
+        out = list(self._closed.get(pair, {}).get(tf, ()))
+        cur = self._cur.get(pair, {}).get(tf)
+        if include_current and cur is not None:
+            out.append(tuple(cur))
+        return out[-int(n):] if n else out
+
+    def current(self, pair: str, tf: str) -> tuple | None:
+        cur = self._cur.get(pair, {}).get(tf)
+        return tuple(cur) if cur is not None else None
+
+    def evict(self, pair: str) -> None:
+        self._closed.pop(pair, None)
+        self._cur.pop(pair, None)
+        self._last_q.pop(pair, None)
+
+    def retain(self, keep) -> list[str]:
+        keep = set(keep)
+        dropped = [p for p in set(self._cur) | set(self._closed) if p not in keep]
+        for p in dropped:
+            self.evict(p)
+        return dropped
+
+
+class WilderRSI:
+    """Running Wilder RSI over closes: O(1) per closed bar, O(1) provisional value for the open bar."""
+
+    __slots__ = ("period", "avg_gain", "avg_loss", "prev_close", "n")
+
+    def __init__(self, period: int = 6):
+        self.period = max(1, int(period))
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.prev_close: float | None = None
+        self.n = 0  # changes seen; averages are simple means until n reaches period
+
+    @property
+    def ready(self) -> bool:
+        return self.n >= self.period
+
+    def _step(self, gain: float, loss: float) -> tuple[float, float]:
+        if self.n < self.period:
+            k = self.n + 1
+            return self.avg_gain + (gain - self.avg_gain) / k, self.avg_loss + (loss - self.avg_loss) / k
+        p = self.period
+        return (self.avg_gain * (p - 1) + gain) / p, (self.avg_loss * (p - 1) + loss) / p
+
+    @staticmethod
+    def _rsi(avg_gain: float, avg_loss: float) -> float:
+        if avg_loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    def update(self, close: float) -> float | None:
+        """Fold in a closed bar's close; returns the RSI once ``period`` changes have been seen."""
+        if self.prev_close is not None:
+            ch = close - self.prev_close
+            self.avg_gain, self.avg_loss = self._step(max(ch, 0.0), max(-ch, 0.0))
+            self.n += 1
+        self.prev_close = close
+        return self.value()
+
+    def value(self) -> float | None:
+        return self._rsi(self.avg_gain, self.avg_loss) if self.ready else None
+
+    def provisional(self, price: float) -> float | None:
+        """RSI as if the in-progress bar closed at ``price`` (state is not modified)."""
+        if self.prev_close is None or self.n + 1 < self.period:
+            return None
+        ch = price - self.prev_close
+        return self._rsi(*self._step(max(ch, 0.0), max(-ch, 0.0)))